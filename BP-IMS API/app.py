@@ -10,6 +10,11 @@ import socketService
 import warehouseService
 import stockService
 import centralService
+import cacheService
+import cartService
+import searchService
+import codeService
+import pagination
 from db import DATABASE_CONFIG
 import asyncio
 import uvicorn
@@ -30,6 +35,9 @@ async def init():
 @app.before_serving
 async def startup():
     await init()
+    await searchService.build()
+    await codeService.build()
+    cartService.startReconciler()
 
 """ GET METHODS """        
 
@@ -40,7 +48,11 @@ async def get_products():
     page = request.args.get('page')
     search = request.args.get('search')
     branchId = request.args.get('branchId')
-    response = await itemService.get_products(int(categoryId), int(branchId), int(page), search) 
+    hotDays = request.args.get('hotDays')
+    cursor = request.args.get('cursor')
+    countMode = pagination.countMode(request.args.get('countMode'))
+    fuzzy = searchService.isFuzzy(request.args.get('fuzzy'))
+    response = await itemService.get_products(int(categoryId), int(branchId), int(page) if page else 1, search, int(hotDays) if hotDays else itemService.HOT_ITEMS_DAYS, cursor, countMode, fuzzy) 
     return response
 
 @app.route('/getCategories', methods=['GET'])
@@ -81,7 +93,9 @@ async def getBranchStocks():
     page = request.args.get('page')
     search = request.args.get('search')
     branchId = request.args.get('branchId')
-    response = await itemService.getBranchStocks(int(categoryId), int(branchId), int(page), search) 
+    cursor = request.args.get('cursor')
+    countMode = pagination.countMode(request.args.get('countMode'))
+    response = await itemService.getBranchStocks(int(categoryId), int(branchId), int(page) if page else 1, search, cursor, countMode) 
     return response
 
 @app.route('/getStockHistory', methods=['GET'])
@@ -136,7 +150,10 @@ async def getProductsHQ():
     categoryId = request.args.get('categoryId')
     page = request.args.get('page')
     search = request.args.get('search')
-    response = await itemService.getProductsHQ(int(categoryId), int(page), search) 
+    cursor = request.args.get('cursor')
+    countMode = pagination.countMode(request.args.get('countMode'))
+    fuzzy = searchService.isFuzzy(request.args.get('fuzzy'))
+    response = await itemService.getProductsHQ(int(categoryId), int(page) if page else 1, search, cursor, countMode, fuzzy) 
     return response
 
 @app.route('/getCategoriesHQ', methods=['GET'])
@@ -152,6 +169,18 @@ async def getProductHQ():
     response = await itemService.getProductHQ(itemId) 
     return response
 
+@app.route('/getCacheStats', methods=['GET'])
+@token_required
+async def getCacheStats():
+    response = cacheService.getCacheStats()
+    return response
+
+@app.route('/getCartReconcileStats', methods=['GET'])
+@token_required
+async def getCartReconcileStats():
+    response = cartService.getReconcileStats()
+    return response
+
 @app.route('/getItemImage', methods=['GET'])
 async def getItemImage():
     fileName = request.args.get('fileName')
@@ -171,7 +200,8 @@ async def getStocksMonitor():
     categoryId = request.args.get('categoryId')
     page = request.args.get('page')
     search = request.args.get('search')
-    response = await itemService.getStocksMonitor(int(categoryId), int(page), search) 
+    cursor = request.args.get('cursor')
+    response = await itemService.getStocksMonitor(int(categoryId), int(page) if page else 1, search, cursor) 
     return response
 
 @app.route('/getWHStocksMonitor', methods=['GET'])
@@ -196,7 +226,9 @@ async def getWHStocks():
     categoryId = request.args.get('categoryId')
     page = request.args.get('page')
     search = request.args.get('search')
-    response = await warehouseService.getWHStocks(int(categoryId), int(page), search) 
+    cursor = request.args.get('cursor')
+    countMode = pagination.countMode(request.args.get('countMode'))
+    response = await warehouseService.getWHStocks(int(categoryId), int(page) if page else 1, search, cursor, countMode) 
     return response
 
 @app.route('/getWHStockHistory', methods=['GET'])
@@ -219,7 +251,8 @@ async def getAllTransactionsAsync():
     branchId = request.args.get('branchId')
     page = request.args.get('page')
     search = request.args.get('search')
-    response = await transactionService.getAllTransactionsAsync(int(branchId), int(page), search) 
+    cursor = request.args.get('cursor')
+    response = await transactionService.getAllTransactionsAsync(int(branchId), int(page) if page else 1, search, cursor) 
     return response
 
 @app.route('/getAllCentralTransactions', methods=['GET'])
@@ -238,7 +271,8 @@ async def getAllTransactionsAsyncHQ():
     branchId = request.args.get('branchId')
     page = request.args.get('page')
     search = request.args.get('search')
-    response = await transactionService.getAllTransactionsAsyncHQ(branchId, int(page), search) 
+    cursor = request.args.get('cursor')
+    response = await transactionService.getAllTransactionsAsyncHQ(branchId, int(page) if page else 1, search, cursor) 
     return response
 
 @app.route('/getSupplierList', methods=['GET'])
@@ -308,7 +342,9 @@ async def getCentralProducts():
     categoryId = request.args.get('categoryId')
     page = request.args.get('page')
     search = request.args.get('search')
-    response = await centralService.getCentralProducts(int(categoryId), int(page), search) 
+    countMode = pagination.countMode(request.args.get('countMode'))
+    fuzzy = searchService.isFuzzy(request.args.get('fuzzy'))
+    response = await centralService.getCentralProducts(int(categoryId), int(page), search, countMode, fuzzy) 
     return response
 
 @app.route('/getOldestTransaction', methods=['GET'])
@@ -450,6 +486,14 @@ async def createStockInput():
     response = await itemService.createStockInput(stockInput) 
     return response
 
+@app.route('/createStockInputs', methods=['POST'])
+@token_required
+async def createStockInputs():
+    data = await request.json
+    stockInputs = data.get('stockInputs')
+    response = await itemService.createStockInputs(stockInputs) 
+    return response
+
 @app.route('/addUser', methods=['POST'])
 @token_required
 async def addUser():
@@ -491,6 +535,14 @@ async def createWHStockInput():
     response = await warehouseService.createStockInput(stockInput) 
     return response
 
+@app.route('/createWHStockInputs', methods=['POST'])
+@token_required
+async def createWHStockInputs():
+    data = await request.json
+    stockInputs = data.get('stockInputs')
+    response = await warehouseService.createStockInputs(stockInputs) 
+    return response
+
 @app.route('/setUserInactive', methods=['POST'])
 @token_required
 async def setUserInactive():
@@ -549,6 +601,14 @@ async def saveBranchTransfer():
     response = await stockService.saveBranchTransfer(branchTransfer) 
     return response
 
+@app.route('/saveBranchTransfers', methods=['POST'])
+@token_required
+async def saveBranchTransfers():
+    data = await request.json
+    branchTransfers = data.get('branchTransfers')
+    response = await stockService.saveBranchTransfers(branchTransfers) 
+    return response
+
 @app.route('/returnToSupplier', methods=['POST'])
 @token_required
 async def returnToSupplier():
@@ -557,6 +617,14 @@ async def returnToSupplier():
     response = await warehouseService.returnToSupplier(returnStock) 
     return response
 
+@app.route('/returnStocksToSupplier', methods=['POST'])
+@token_required
+async def returnStocksToSupplier():
+    data = await request.json
+    returnStocks = data.get('returnStocks')
+    response = await warehouseService.returnStocksToSupplier(returnStocks) 
+    return response
+
 @app.route('/returnToWH', methods=['POST'])
 @token_required
 async def returnToWH():
@@ -565,6 +633,14 @@ async def returnToWH():
     response = await stockService.returnToWH(returnStock) 
     return response
 
+@app.route('/returnStocksToWH', methods=['POST'])
+@token_required
+async def returnStocksToWH():
+    data = await request.json
+    returnStocks = data.get('returnStocks')
+    response = await stockService.returnStocksToWH(returnStocks) 
+    return response
+
 @app.route('/setBranchInactive', methods=['PUT'])
 @token_required
 async def setBranchInactive():
@@ -655,6 +731,13 @@ async def addItemToCart():
     response = await transactionService.addItemToCart(int(request.cart_id), int(data.get('itemId')), data.get('quantity')) 
     return response
 
+@app.route('/scanItemToCart', methods=['POST'])
+@token_required
+async def scanItemToCart():
+    data = await request.json
+    response = await transactionService.scanItemToCart(int(request.cart_id), data.get('code'), data.get('quantity') or 1) 
+    return response
+
 @app.route('/addCentralItemToCart', methods=['POST'])
 @token_required
 async def addCentralItemToCart():
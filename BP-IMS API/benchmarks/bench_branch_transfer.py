@@ -0,0 +1,82 @@
+"""Times a LINES-line branch-to-branch transfer sent one call per line and as one batch.
+
+Inserts scratch branchitem rows for LINES items in two unused branch ids, runs
+stockService.saveBranchTransfer once per line and then stockService.saveBranchTransfers with
+the whole list, prints the latency of each and checks both leave the same stock, then deletes
+the scratch rows and their transfer history.
+
+    python benchmarks/bench_branch_transfer.py
+"""
+import asyncio
+import os
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from quart import Quart
+from tortoise import Tortoise
+from db import DATABASE_CONFIG
+import stockService
+
+LINES = 500
+STOCK = 1000
+QUANTITY = 1
+# Ids no real branch or item uses, so the scratch rows cannot collide with live stock.
+FROM_BRANCH_ID = -1
+TO_BRANCH_ID = -2
+
+async def seed(connection):
+    await cleanup(connection)
+    values = ", ".join(f"({branchId}, {-itemNo}, {STOCK})" for itemNo in range(1, LINES + 1) for branchId in (FROM_BRANCH_ID, TO_BRANCH_ID))
+    await connection.execute_script(f"INSERT INTO branchitem (branchId, itemId, quantity) VALUES {values}")
+    rows = await connection.execute_query_dict(
+        "SELECT id FROM branchitem WHERE branchId = %s ORDER BY itemId", [FROM_BRANCH_ID])
+    return [{"branchFromId": row['id'], "branchToId": TO_BRANCH_ID, "quantity": QUANTITY} for row in rows]
+
+async def cleanup(connection):
+    await connection.execute_query("""
+        DELETE h FROM branchtransferhistory h
+        INNER JOIN branchitem bi ON bi.id = h.branchFromId
+        WHERE bi.branchId IN (%s, %s)
+    """, [FROM_BRANCH_ID, TO_BRANCH_ID])
+    await connection.execute_query("DELETE FROM branchitem WHERE branchId IN (%s, %s)", [FROM_BRANCH_ID, TO_BRANCH_ID])
+
+async def stockTotals(connection):
+    return await connection.execute_query_dict(
+        "SELECT branchId, SUM(quantity) AS quantity FROM branchitem WHERE branchId IN (%s, %s) GROUP BY branchId ORDER BY branchId",
+        [FROM_BRANCH_ID, TO_BRANCH_ID])
+
+async def singleCalls(transfers):
+    for transfer in transfers:
+        await stockService.saveBranchTransfer(transfer)
+
+async def batched(transfers):
+    await stockService.saveBranchTransfers(transfers)
+
+async def measure(connection, label, run):
+    transfers = await seed(connection)
+    started = time.perf_counter()
+    await run(transfers)
+    elapsed = (time.perf_counter() - started) * 1000
+    totals = await stockTotals(connection)
+    print(f"{label:<8} {elapsed:>9.1f} ms  " + "  ".join(f"branch {row['branchId']}={row['quantity']}" for row in totals))
+    return [row['quantity'] for row in totals]
+
+async def main():
+    await Tortoise.init(config=DATABASE_CONFIG)
+    connection = Tortoise.get_connection('default')
+    # The services build responses with quart.jsonify, which needs an app context.
+    app = Quart(__name__)
+    try:
+        async with app.app_context():
+            print(f"{LINES}-line transfer")
+            single = await measure(connection, "single", singleCalls)
+            batch = await measure(connection, "batched", batched)
+            print("same stock" if single == batch else "STOCK MISMATCH")
+    finally:
+        await cleanup(connection)
+        await Tortoise.close_connections()
+
+if __name__ == '__main__':
+    asyncio.run(main())
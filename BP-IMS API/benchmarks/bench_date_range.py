@@ -0,0 +1,93 @@
+"""Compares DATE()/YEAR() wrapped predicates against half-open range seeks.
+
+Seeds a scratch copy of the transactions table with ROWS rows, prints the EXPLAIN plan
+and the average latency of each query shape, then drops the table.
+
+    python benchmarks/bench_date_range.py
+"""
+import asyncio
+import os
+import random
+import sys
+import time
+from datetime import date, datetime, timedelta
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from tortoise import Tortoise
+from db import DATABASE_CONFIG
+from utils import day_range, month_range, year_range
+
+ROWS = 1_000_000
+BATCH = 5_000
+RUNS = 5
+BRANCHES = 5
+TABLE = "bench_transactions"
+FIRST_DAY = date(2022, 1, 1)
+DAYS = 3 * 365
+
+async def seed(connection):
+    await connection.execute_script(f"DROP TABLE IF EXISTS {TABLE}")
+    await connection.execute_script(f"""
+        CREATE TABLE {TABLE} (
+            id INT AUTO_INCREMENT PRIMARY KEY,
+            branchId INT NOT NULL,
+            transactionDate DATETIME NOT NULL,
+            totalAmount DECIMAL(18,2) NOT NULL,
+            isVoided TINYINT(1) NOT NULL DEFAULT 0,
+            isPaid TINYINT(1) NOT NULL DEFAULT 1,
+            isExacon TINYINT(1) NOT NULL DEFAULT 0,
+            INDEX idx_branch_status_date (branchId, isVoided, isPaid, transactionDate),
+            INDEX idx_date (transactionDate)
+        )
+    """)
+
+    for offset in range(0, ROWS, BATCH):
+        values = []
+        for _ in range(BATCH):
+            moment = datetime.combine(FIRST_DAY, datetime.min.time()) + timedelta(
+                days=random.randrange(DAYS), seconds=random.randrange(7 * 3600, 18 * 3600))
+            values.append(f"({random.randint(1, BRANCHES)}, '{moment}', {random.uniform(50, 5000):.2f}, "
+                          f"{int(random.random() < 0.02)}, 1, {int(random.random() < 0.1)})")
+        await connection.execute_script(
+            f"INSERT INTO {TABLE} (branchId, transactionDate, totalAmount, isVoided, isPaid, isExacon) VALUES {', '.join(values)}")
+    await connection.execute_script(f"ANALYZE TABLE {TABLE}")
+
+async def measure(connection, label, query):
+    plan = await connection.execute_query_dict(f"EXPLAIN {query}")
+    started = time.perf_counter()
+    for _ in range(RUNS):
+        await connection.execute_query_dict(query)
+    elapsed = (time.perf_counter() - started) / RUNS * 1000
+    step = plan[0]
+    print(f"{label:<28} {elapsed:>9.1f} ms  type={step['type']} key={step['key']} rows={step['rows']}")
+
+async def main():
+    await Tortoise.init(config=DATABASE_CONFIG)
+    connection = Tortoise.get_connection('default')
+    try:
+        print(f"Seeding {ROWS:,} rows into {TABLE}...")
+        await seed(connection)
+
+        day = FIRST_DAY + timedelta(days=DAYS - 30)
+        dayStart, dayEnd = day_range(day)
+        monthStart, monthEnd = month_range(day.year, day.month)
+        yearStart, yearEnd = year_range(day.year)
+        filters = "branchId = 1 AND isVoided = 0 AND isPaid = 1"
+
+        cases = [
+            ("day / DATE()", f"SELECT SUM(totalAmount) FROM {TABLE} WHERE DATE(transactionDate) = '{day}' AND {filters}"),
+            ("day / range", f"SELECT SUM(totalAmount) FROM {TABLE} WHERE transactionDate >= '{dayStart}' AND transactionDate < '{dayEnd}' AND {filters}"),
+            ("month / MONTH()+YEAR()", f"SELECT SUM(totalAmount) FROM {TABLE} WHERE MONTH(transactionDate) = {day.month} AND YEAR(transactionDate) = {day.year} AND {filters}"),
+            ("month / range", f"SELECT SUM(totalAmount) FROM {TABLE} WHERE transactionDate >= '{monthStart}' AND transactionDate < '{monthEnd}' AND {filters}"),
+            ("year / YEAR()", f"SELECT SUM(totalAmount) FROM {TABLE} WHERE YEAR(transactionDate) = {day.year} AND {filters}"),
+            ("year / range", f"SELECT SUM(totalAmount) FROM {TABLE} WHERE transactionDate >= '{yearStart}' AND transactionDate < '{yearEnd}' AND {filters}"),
+        ]
+        for label, query in cases:
+            await measure(connection, label, query)
+    finally:
+        await connection.execute_script(f"DROP TABLE IF EXISTS {TABLE}")
+        await Tortoise.close_connections()
+
+if __name__ == '__main__':
+    asyncio.run(main())
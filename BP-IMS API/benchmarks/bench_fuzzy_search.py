@@ -0,0 +1,85 @@
+"""Measures how often fuzzy item search recovers a misspelled word, and how long it takes.
+
+Indexes ITEMS synthetic hardware names in process (no database needed). For SAMPLES random
+items, misspells one word of the name with each kind of typo in TYPOS and searches for it
+alongside another word of the same name. A search counts as a hit when an item holding both
+intended words is on the first page (PAGE_SIZE) of results. Prints the hit rate of exact and
+fuzzy search and the average and p95 latency of fuzzy search per typo kind.
+
+    python benchmarks/bench_fuzzy_search.py
+"""
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import searchService
+
+ITEMS = 50_000
+SAMPLES = 500
+PAGE_SIZE = 30
+
+WORDS = ("pipe", "elbow", "coupling", "reducer", "valve", "faucet", "hammer", "screwdriver", "wrench",
+         "pliers", "chisel", "plywood", "lumber", "cement", "mortar", "gravel", "sand", "hollow", "block",
+         "nail", "screw", "bolt", "washer", "hinge", "padlock", "doorknob", "sandpaper", "primer", "enamel",
+         "latex", "thinner", "varnish", "brush", "roller", "trowel", "shovel", "wheelbarrow", "ladder",
+         "wire", "conduit", "breaker", "outlet", "switch", "bulb", "ballast", "tape", "sealant", "epoxy",
+         "gutter", "roofing", "sheet", "flashing", "tile", "grout", "adhesive", "bracket", "anchor",
+         "clamp", "drill", "blade", "cutter", "grinder", "level", "measuring", "shower", "toilet", "lavatory",
+         "sink", "strainer", "hose", "sprinkler", "galvanized", "stainless", "aluminum", "copper", "brass")
+BRANDS = ("Boysen", "Davies", "Stanley", "Makita", "Bosch", "Omni", "Firefly", "Neltex", "Atlanta", "Eagle")
+SIZES = ("1/2", "3/4", "1", "2", "2.5mm", "3.5mm", "4x8", "12oz", "16oz", "1L", "4L")
+
+def catalog():
+    random.seed(1)
+    for itemId in range(1, ITEMS + 1):
+        words = random.sample(WORDS, 2)
+        yield itemId, f"{random.choice(BRANDS)} {words[0]} {words[1]} {random.choice(SIZES)} {itemId}"
+
+def delete(word, at):
+    return word[:at] + word[at + 1:]
+
+def insert(word, at):
+    return word[:at] + random.choice("aeiourstn") + word[at:]
+
+def substitute(word, at):
+    return word[:at] + random.choice([letter for letter in "aeiourstnl" if letter != word[at]]) + word[at + 1:]
+
+def transpose(word, at):
+    at = min(at, len(word) - 2)
+    return word[:at] + word[at + 1] + word[at] + word[at + 2:]
+
+TYPOS = {"deletion": delete, "insertion": insert, "substitution": substitute, "transposition": transpose}
+
+def isHit(names, found, first, second):
+    # Every name holding both words ties on score, so any of them on the first page counts.
+    return any(first in names[itemId] and second in names[itemId] for itemId in found[:PAGE_SIZE])
+
+def main():
+    items = dict(catalog())
+    searchService.index(items.items())
+    names = {itemId: name.lower().split() for itemId, name in items.items()}
+    samples = random.sample(sorted(items), SAMPLES)
+
+    print(f"{'typo':<14} {'exact hits':>10} {'fuzzy hits':>10} {'avg':>9} {'p95':>9}")
+    for kind, typo in TYPOS.items():
+        exactHits = fuzzyHits = 0
+        timings = []
+        for itemId in samples:
+            first, second = names[itemId][1:3]
+            text = f"{typo(first, random.randrange(1, len(first) - 1))} {second}"
+
+            exactHits += isHit(names, searchService.findItemIds(text), first, second)
+            started = time.perf_counter()
+            found = searchService.findSimilarItemIds(text)
+            timings.append((time.perf_counter() - started) * 1000)
+            fuzzyHits += isHit(names, found, first, second)
+
+        p95 = statistics.quantiles(timings, n=20)[-1]
+        print(f"{kind:<14} {exactHits / SAMPLES:>10.1%} {fuzzyHits / SAMPLES:>10.1%} {statistics.mean(timings):>6.2f} ms {p95:>6.2f} ms")
+
+if __name__ == '__main__':
+    main()
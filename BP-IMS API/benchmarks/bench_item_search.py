@@ -0,0 +1,65 @@
+"""Compares searchService lookups against a substring scan of every item name.
+
+Indexes ITEMS synthetic hardware names in process (no database needed), then times each query
+in QUERIES through what a searched listing does in Python (match, count, and rank the first
+PAGE_SIZE + 1 ids with searchService) and through a plain scan that does what "name LIKE '%text%'"
+does, and prints the average latency and hit count of both. The hit counts differ by design: the
+index matches each word of the query on its own, so "galv pipe 3/4" finds names the whole phrase
+is not a substring of, and one- or two-letter words such as "sc" only match the start of a word.
+
+    python benchmarks/bench_item_search.py
+"""
+import os
+import random
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import searchService
+
+ITEMS = 50_000
+RUNS = 200
+PAGE_SIZE = 30
+QUERIES = ("pvc", "pvc elb", "elbow 1/2", "galv pipe 3/4", "boy", "hammer", "sc", "2.5mm wire", "xyz")
+
+PRODUCTS = ("PVC pipe", "PVC elbow", "PVC tee", "GI pipe", "Galvanized pipe", "Claw hammer", "Screw",
+            "Wood screw", "Concrete nail", "Common nail", "Boysen paint", "Davies paint", "Electrical wire",
+            "Cement", "Plywood", "Hinge", "Padlock", "Faucet", "Sandpaper", "Masking tape")
+SIZES = ("1/2", "3/4", "1", "2", "2.5mm", "3.5mm", "4x8", "12oz", "16oz", "1L", "4L")
+VARIANTS = ("", "white", "blue", "heavy duty", "stainless", "orange", "#10", "#12")
+
+def names():
+    random.seed(1)
+    for itemId in range(1, ITEMS + 1):
+        yield itemId, f"{random.choice(PRODUCTS)} {random.choice(SIZES)} {random.choice(VARIANTS)} {itemId}".strip()
+
+def scan(items, text):
+    text = text.lower()
+    return sum(1 for _, name in items if text in name.lower())
+
+def lookup(text):
+    tiers = searchService.matchItems(text)
+    searchService.pageIds(tiers, PAGE_SIZE + 1)
+    return sum(len(ids) for ids, _ in tiers)
+
+def measure(search, text):
+    started = time.perf_counter()
+    for _ in range(RUNS):
+        hits = search(text)
+    return (time.perf_counter() - started) / RUNS * 1000, hits
+
+def main():
+    items = list(names())
+    started = time.perf_counter()
+    searchService.index(items)
+    print(f"Indexed {ITEMS:,} items in {(time.perf_counter() - started) * 1000:.0f} ms")
+
+    print(f"{'query':<16} {'scan':>10} {'hits':>6} {'index':>10} {'hits':>6}")
+    for text in QUERIES:
+        scanned, scanHits = measure(lambda text: scan(items, text), text)
+        indexed, indexHits = measure(lookup, text)
+        print(f"{text:<16} {scanned:>7.3f} ms {scanHits:>6} {indexed:>7.3f} ms {indexHits:>6}")
+
+if __name__ == '__main__':
+    main()
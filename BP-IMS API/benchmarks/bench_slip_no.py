@@ -0,0 +1,118 @@
+"""Compares the old COUNT-based slip numbers against the slip_sequences counter on a busy day.
+
+Seeds scratch copies of transactions and slip_sequences holding HISTORY_DAYS of DAILY_ROWS
+transactions across BRANCHES, then fires ALLOCATIONS concurrent payments at one branch with
+each allocator. Prints the average latency per slip and how many slip numbers were duplicated
+or skipped, then drops the tables.
+
+    python benchmarks/bench_slip_no.py
+"""
+import asyncio
+import os
+import random
+import sys
+import time
+from datetime import date, datetime, timedelta
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from tortoise import Tortoise
+from tortoise.transactions import in_transaction
+from db import DATABASE_CONFIG
+from utils import day_range
+
+DAILY_ROWS = 5_000
+HISTORY_DAYS = 90
+BATCH = 5_000
+BRANCHES = 5
+ALLOCATIONS = 300
+BRANCH_ID = 1
+TABLE = "bench_slip_transactions"
+SEQUENCES = "bench_slip_sequences"
+TODAY = date.today()
+
+async def seed(connection):
+    await connection.execute_script(f"DROP TABLE IF EXISTS {TABLE}")
+    await connection.execute_script(f"DROP TABLE IF EXISTS {SEQUENCES}")
+    await connection.execute_script(f"""
+        CREATE TABLE {TABLE} (
+            id INT AUTO_INCREMENT PRIMARY KEY,
+            branchId INT NOT NULL,
+            slipNo VARCHAR(255) NOT NULL,
+            transactionDate DATETIME NOT NULL,
+            INDEX idx_date (transactionDate)
+        )
+    """)
+    await connection.execute_script(f"""
+        CREATE TABLE {SEQUENCES} (
+            id INT AUTO_INCREMENT PRIMARY KEY,
+            branchId INT NOT NULL,
+            date DATE NOT NULL,
+            lastNo INT NOT NULL DEFAULT 0,
+            UNIQUE KEY uid_sequences (branchId, date)
+        )
+    """)
+
+    rows = []
+    for dayOffset in range(HISTORY_DAYS):
+        day = TODAY - timedelta(days=dayOffset)
+        for no in range(1, DAILY_ROWS + 1):
+            moment = datetime.combine(day, datetime.min.time()) + timedelta(seconds=random.randrange(7 * 3600, 17 * 3600))
+            branchId = random.randint(1, BRANCHES)
+            rows.append(f"({branchId}, 'SEED-{day:%m%d%y}-{no}', '{moment}')")
+        await connection.execute_script(
+            f"INSERT INTO {SEQUENCES} (branchId, date, lastNo) VALUES " +
+            ", ".join(f"({branchId}, '{day}', {DAILY_ROWS})" for branchId in range(1, BRANCHES + 1)))
+
+    for offset in range(0, len(rows), BATCH):
+        await connection.execute_script(
+            f"INSERT INTO {TABLE} (branchId, slipNo, transactionDate) VALUES {', '.join(rows[offset:offset + BATCH])}")
+    await connection.execute_script(f"ANALYZE TABLE {TABLE}")
+
+async def countSlip():
+    start, end = day_range(TODAY)
+    async with in_transaction() as connection:
+        rows = await connection.execute_query_dict(
+            f"SELECT COUNT(*) AS total FROM {TABLE} WHERE transactionDate >= %s AND transactionDate < %s", [start, end])
+        no = rows[0]['total'] + 1
+        await connection.execute_query(
+            f"INSERT INTO {TABLE} (branchId, slipNo, transactionDate) VALUES (%s, %s, %s)", [BRANCH_ID, f"count-{no}", datetime.now()])
+    return no
+
+async def sequenceSlip():
+    async with in_transaction() as connection:
+        await connection.execute_query(f"""
+            INSERT INTO {SEQUENCES} (branchId, date, lastNo) VALUES (%s, %s, 1)
+            ON DUPLICATE KEY UPDATE lastNo = lastNo + 1
+        """, [BRANCH_ID, TODAY])
+        rows = await connection.execute_query_dict(
+            f"SELECT lastNo FROM {SEQUENCES} WHERE branchId = %s AND date = %s", [BRANCH_ID, TODAY])
+        no = rows[0]['lastNo']
+        await connection.execute_query(
+            f"INSERT INTO {TABLE} (branchId, slipNo, transactionDate) VALUES (%s, %s, %s)", [BRANCH_ID, f"sequence-{no}", datetime.now()])
+    return no
+
+async def measure(label, allocate):
+    started = time.perf_counter()
+    numbers = await asyncio.gather(*(allocate() for _ in range(ALLOCATIONS)))
+    elapsed = (time.perf_counter() - started) * 1000
+
+    duplicates = len(numbers) - len(set(numbers))
+    gaps = (max(numbers) - min(numbers) + 1) - len(set(numbers))
+    print(f"{label:<10} {elapsed / ALLOCATIONS:>7.2f} ms/slip  duplicates={duplicates} gaps={gaps}")
+
+async def main():
+    await Tortoise.init(config=DATABASE_CONFIG)
+    connection = Tortoise.get_connection('default')
+    try:
+        print(f"Seeding {HISTORY_DAYS} days of {DAILY_ROWS:,} transactions into {TABLE}...")
+        await seed(connection)
+        await measure("count", countSlip)
+        await measure("sequence", sequenceSlip)
+    finally:
+        await connection.execute_script(f"DROP TABLE IF EXISTS {TABLE}")
+        await connection.execute_script(f"DROP TABLE IF EXISTS {SEQUENCES}")
+        await Tortoise.close_connections()
+
+if __name__ == '__main__':
+    asyncio.run(main())
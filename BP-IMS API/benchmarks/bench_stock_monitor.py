@@ -0,0 +1,138 @@
+"""Compares the per-branch LEFT JOIN stock monitor against the pivot-free engine as branches grow.
+
+For each branch count in BRANCH_COUNTS, seeds scratch items/branches/branchitem/warehouseitems
+tables with ITEMS items, then times the critical-items page of the old N-way join (page plus
+count query) and of the new shape (one paged items query with an EXISTS filter plus one
+branchitem IN query for the page), and drops the tables.
+
+    python benchmarks/bench_stock_monitor.py
+"""
+import asyncio
+import os
+import random
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from tortoise import Tortoise
+from db import DATABASE_CONFIG
+
+ITEMS = 5_000
+BATCH = 10_000
+RUNS = 10
+PAGE_SIZE = 30
+BRANCH_COUNTS = (3, 10, 25, 50)
+PREFIX = "bench_monitor_"
+
+async def seed(connection, branchCount):
+    await drop(connection)
+    await connection.execute_script(f"""
+        CREATE TABLE {PREFIX}items (
+            id INT AUTO_INCREMENT PRIMARY KEY,
+            name VARCHAR(255) NOT NULL,
+            isManaged TINYINT(1) NOT NULL DEFAULT 1,
+            storeCriticalValue DECIMAL(10,2) NOT NULL,
+            whCriticalValue DECIMAL(10,2) NOT NULL,
+            INDEX idx_managed_name (isManaged, name)
+        )
+    """)
+    await connection.execute_script(f"""
+        CREATE TABLE {PREFIX}branches (
+            id INT AUTO_INCREMENT PRIMARY KEY,
+            name VARCHAR(255) NOT NULL,
+            isActive TINYINT(1) NOT NULL DEFAULT 1
+        )
+    """)
+    await connection.execute_script(f"""
+        CREATE TABLE {PREFIX}branchitem (
+            id INT AUTO_INCREMENT PRIMARY KEY,
+            branchId INT NOT NULL,
+            itemId INT NOT NULL,
+            quantity DECIMAL(10,2) NOT NULL,
+            UNIQUE KEY uid_branch_item (branchId, itemId),
+            INDEX idx_item (itemId)
+        )
+    """)
+    await connection.execute_script(f"""
+        CREATE TABLE {PREFIX}warehouseitems (
+            id INT AUTO_INCREMENT PRIMARY KEY,
+            itemId INT NOT NULL,
+            quantity DECIMAL(10,2) NOT NULL,
+            INDEX idx_item (itemId)
+        )
+    """)
+
+    await connection.execute_script(f"INSERT INTO {PREFIX}items (name, storeCriticalValue, whCriticalValue) VALUES " + ", ".join(
+        f"('Item {itemId:05d}', {random.randint(5, 20)}, {random.randint(20, 50)})" for itemId in range(1, ITEMS + 1)))
+    await connection.execute_script(f"INSERT INTO {PREFIX}branches (name) VALUES " + ", ".join(
+        f"('Branch {branchId}')" for branchId in range(1, branchCount + 1)))
+    await connection.execute_script(f"INSERT INTO {PREFIX}warehouseitems (itemId, quantity) VALUES " + ", ".join(
+        f"({itemId}, {random.randint(0, 500)})" for itemId in range(1, ITEMS + 1)))
+
+    rows = [f"({branchId}, {itemId}, {random.randint(0, 200)})" for branchId in range(1, branchCount + 1) for itemId in range(1, ITEMS + 1)]
+    for offset in range(0, len(rows), BATCH):
+        await connection.execute_script(f"INSERT INTO {PREFIX}branchitem (branchId, itemId, quantity) VALUES {', '.join(rows[offset:offset + BATCH])}")
+    await connection.execute_script(f"ANALYZE TABLE {PREFIX}items, {PREFIX}branchitem, {PREFIX}warehouseitems")
+
+async def drop(connection):
+    for table in ("items", "branches", "branchitem", "warehouseitems"):
+        await connection.execute_script(f"DROP TABLE IF EXISTS {PREFIX}{table}")
+
+async def joinMonitor(connection, branchCount):
+    joins = " ".join(f"LEFT JOIN {PREFIX}branchitem b{branchId} ON b{branchId}.itemId = i.id AND b{branchId}.branchId = {branchId}"
+                     for branchId in range(1, branchCount + 1))
+    selects = ", ".join(f"b{branchId}.quantity AS branch_{branchId}_qty, b{branchId}.id AS branch_{branchId}_id"
+                        for branchId in range(1, branchCount + 1))
+    critical = " OR ".join([f"b{branchId}.quantity < i.storeCriticalValue" for branchId in range(1, branchCount + 1)]
+                           + ["wh.quantity < i.whCriticalValue"])
+    fromWhere = f"FROM {PREFIX}items i {joins} LEFT JOIN {PREFIX}warehouseitems wh ON wh.itemId = i.id WHERE i.isManaged = 1 AND ({critical})"
+
+    await connection.execute_query_dict(f"SELECT i.id, i.name, wh.quantity, {selects} {fromWhere} ORDER BY i.name, i.id LIMIT {PAGE_SIZE}")
+    await connection.execute_query_dict(f"SELECT COUNT(*) AS totalCount {fromWhere}")
+
+async def pivotFreeMonitor(connection, branchCount):
+    items = await connection.execute_query_dict(f"""
+        SELECT i.id, i.name, wh.quantity, COUNT(*) OVER() AS totalCount
+        FROM {PREFIX}items i
+        LEFT JOIN {PREFIX}warehouseitems wh ON wh.itemId = i.id
+        WHERE i.isManaged = 1 AND (EXISTS (
+            SELECT 1
+            FROM {PREFIX}branchitem cb
+            INNER JOIN {PREFIX}branches b ON b.id = cb.branchId AND b.isActive = 1
+            WHERE cb.itemId = i.id AND cb.quantity < i.storeCriticalValue
+        ) OR wh.quantity < i.whCriticalValue)
+        ORDER BY i.name, i.id
+        LIMIT {PAGE_SIZE + 1}
+    """)
+    itemIds = ", ".join(str(item['id']) for item in items) or "NULL"
+    await connection.execute_query_dict(f"SELECT id, name FROM {PREFIX}branches WHERE isActive = 1 ORDER BY id")
+    await connection.execute_query_dict(f"""
+        SELECT bi.id, bi.itemId, bi.branchId, bi.quantity
+        FROM {PREFIX}branchitem bi
+        INNER JOIN {PREFIX}branches b ON b.id = bi.branchId AND b.isActive = 1
+        WHERE bi.itemId IN ({itemIds})
+    """)
+
+async def measure(connection, branchCount, monitor):
+    started = time.perf_counter()
+    for _ in range(RUNS):
+        await monitor(connection, branchCount)
+    return (time.perf_counter() - started) / RUNS * 1000
+
+async def main():
+    await Tortoise.init(config=DATABASE_CONFIG)
+    connection = Tortoise.get_connection('default')
+    try:
+        print(f"{'branches':>8} {'N-way join':>12} {'pivot-free':>12}")
+        for branchCount in BRANCH_COUNTS:
+            await seed(connection, branchCount)
+            joined = await measure(connection, branchCount, joinMonitor)
+            pivotFree = await measure(connection, branchCount, pivotFreeMonitor)
+            print(f"{branchCount:>8} {joined:>9.1f} ms {pivotFree:>9.1f} ms")
+    finally:
+        await drop(connection)
+        await Tortoise.close_connections()
+
+if __name__ == '__main__':
+    asyncio.run(main())
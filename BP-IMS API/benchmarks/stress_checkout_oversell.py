@@ -0,0 +1,140 @@
+"""Pays CARTS carts twice each, all at once, through checkoutService.checkout and checks nothing is oversold.
+
+Creates a scratch branch, an unmanaged item holding STOCK units in it, and CARTS cashiers whose
+carts each hold QUANTITY of the item, so the carts together ask for more than is in stock. Every
+cart is then paid twice concurrently, as a double-tapped pay button would. Prints how many
+payments went through, were rejected for stock, found the cart already emptied or failed, then
+checks that the stock never went negative, that the sold quantity matches the stock taken, and
+that no cart produced more than one transaction. Deletes every scratch row and exits non-zero
+if a check fails.
+
+    python benchmarks/stress_checkout_oversell.py
+"""
+import asyncio
+import os
+import sys
+import time
+from datetime import datetime
+from decimal import Decimal
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from tortoise import Tortoise
+from db import DATABASE_CONFIG
+import checkoutService
+import stockService
+
+CARTS = 200
+PAYMENTS_PER_CART = 2
+STOCK = 100
+QUANTITY = Decimal(1)
+PRICE = Decimal(10)
+NAME = "stress checkout"
+
+async def seed(connection):
+    await connection.execute_query("INSERT INTO branches (name, isActive) VALUES (%s, 0)", [NAME])
+    branchId = (await connection.execute_query_dict("SELECT MAX(id) AS id FROM branches WHERE name = %s", [NAME]))[0]['id']
+
+    await connection.execute_query("""
+        INSERT INTO items (name, price, cost, isManaged, storeCriticalValue, sellByUnit, whCriticalValue)
+        VALUES (%s, %s, %s, 0, 0, 1, 0)
+    """, [NAME, PRICE, PRICE / 2])
+    itemId = (await connection.execute_query_dict("SELECT MAX(id) AS id FROM items WHERE name = %s", [NAME]))[0]['id']
+
+    await connection.execute_query(
+        "INSERT INTO branchitem (branchId, itemId, quantity) VALUES (%s, %s, %s)", [branchId, itemId, STOCK])
+    branchItemId = (await connection.execute_query_dict(
+        "SELECT id FROM branchitem WHERE branchId = %s AND itemId = %s", [branchId, itemId]))[0]['id']
+
+    await connection.execute_query("INSERT INTO users (email, name, encryptedPassword, password, departmentId, branchId, isActive) VALUES " +
+        ", ".join(["(%s, %s, '', '', 0, %s, 0)"] * CARTS),
+        [value for no in range(CARTS) for value in (f"stress-{branchId}-{no}@example.invalid", NAME, branchId)])
+    await connection.execute_query("""
+        INSERT INTO carts (userId, subTotal)
+        SELECT id, %s FROM users WHERE branchId = %s AND name = %s
+    """, [PRICE * QUANTITY, branchId, NAME])
+    await connection.execute_query("""
+        INSERT INTO cartitems (cartId, branchItemId, quantity)
+        SELECT c.id, %s, %s FROM carts c INNER JOIN users u ON u.id = c.userId WHERE u.branchId = %s AND u.name = %s
+    """, [branchItemId, QUANTITY, branchId, NAME])
+    carts = await connection.execute_query_dict(
+        "SELECT c.id FROM carts c INNER JOIN users u ON u.id = c.userId WHERE u.branchId = %s AND u.name = %s", [branchId, NAME])
+
+    return branchId, branchItemId, [cart['id'] for cart in carts]
+
+async def cleanup(connection):
+    """Deletes every scratch row, including any left behind by an interrupted run."""
+    branches = await connection.execute_query_dict("SELECT id FROM branches WHERE name = %s AND isActive = 0", [NAME])
+    for branchId in [branch['id'] for branch in branches]:
+        await connection.execute_query(
+            "DELETE ti FROM transactionitems ti INNER JOIN transactions t ON t.id = ti.transactionId WHERE t.branchId = %s", [branchId])
+        for table in ("transactions", "daily_sales_rollup", "item_sales_rollup", "slip_sequences", "branchitem"):
+            await connection.execute_query(f"DELETE FROM {table} WHERE branchId = %s", [branchId])
+        await connection.execute_query(
+            "DELETE ci FROM cartitems ci INNER JOIN carts c ON c.id = ci.cartId INNER JOIN users u ON u.id = c.userId WHERE u.branchId = %s", [branchId])
+        await connection.execute_query(
+            "DELETE c FROM carts c INNER JOIN users u ON u.id = c.userId WHERE u.branchId = %s", [branchId])
+        await connection.execute_query("DELETE FROM users WHERE branchId = %s AND name = %s", [branchId, NAME])
+        await connection.execute_query("DELETE FROM branches WHERE id = %s", [branchId])
+    await connection.execute_query("DELETE FROM items WHERE name = %s AND isManaged = 0", [NAME])
+
+async def pay(cartId, branchId):
+    try:
+        await checkoutService.checkout(cartId, PRICE * QUANTITY, transactionDate=datetime.now(), branchId=branchId)
+    except stockService.StockConflict:
+        return "rejected"
+    except checkoutService.CheckoutError:
+        return "empty"
+    return "sold"
+
+async def main():
+    await Tortoise.init(config=DATABASE_CONFIG)
+    connection = Tortoise.get_connection('default')
+    failed = []
+    try:
+        await cleanup(connection)
+        branchId, branchItemId, cartIds = await seed(connection)
+        print(f"{CARTS} carts of {QUANTITY} paid {PAYMENTS_PER_CART}x each against {STOCK} units")
+
+        started = time.perf_counter()
+        payments = [pay(cartId, branchId) for cartId in cartIds for _ in range(PAYMENTS_PER_CART)]
+        results = await asyncio.gather(*payments, return_exceptions=True)
+        elapsed = (time.perf_counter() - started) * 1000
+
+        sold = results.count("sold")
+        errors = [result for result in results if isinstance(result, Exception)]
+        print(f"{elapsed:.1f} ms  sold={sold} rejected={results.count('rejected')} "
+              f"empty={results.count('empty')} errors={len(errors)}")
+        for error in errors[:5]:
+            print(f"  {type(error).__name__}: {error}")
+
+        remaining = (await connection.execute_query_dict("SELECT quantity FROM branchitem WHERE id = %s", [branchItemId]))[0]['quantity']
+        perCart = await connection.execute_query_dict("""
+            SELECT t.cashierId, COUNT(DISTINCT t.id) AS transactions, SUM(ti.quantity) AS quantity
+            FROM transactions t
+            INNER JOIN transactionitems ti ON ti.transactionId = t.id
+            WHERE t.branchId = %s
+            GROUP BY t.cashierId
+        """, [branchId])
+        soldQuantity = sum((row['quantity'] for row in perCart), Decimal(0))
+
+        if errors:
+            failed.append(f"{len(errors)} payments raised instead of succeeding or being rejected")
+        if remaining < 0:
+            failed.append(f"stock went negative: {remaining}")
+        if soldQuantity + remaining != STOCK:
+            failed.append(f"sold {soldQuantity} + remaining {remaining} != {STOCK}")
+        if any(row['transactions'] > 1 for row in perCart):
+            failed.append(f"{sum(1 for row in perCart if row['transactions'] > 1)} carts were charged more than once")
+        if len(perCart) != sold:
+            failed.append(f"{sold} successful payments but {len(perCart)} carts with a transaction")
+    finally:
+        await cleanup(connection)
+        await Tortoise.close_connections()
+
+    print("\n".join(failed) or f"ok: remaining={remaining}, one transaction per paid cart")
+    if failed:
+        sys.exit(1)
+
+if __name__ == '__main__':
+    asyncio.run(main())
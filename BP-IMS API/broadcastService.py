@@ -0,0 +1,93 @@
+import asyncio
+import eventService
+
+DEBOUNCE_SECONDS = 0.5
+
+_topics = {}
+
+class Topic:
+    def __init__(self, key, producer, heartbeat, events, branchId):
+        self.key = key
+        self.producer = producer
+        self.heartbeat = heartbeat
+        self.events = set(events)
+        self.branchId = None if branchId is None else str(branchId)
+        self.subscribers = set()
+        self.payload = None
+        self.task = None
+        self.changed = asyncio.Event()
+
+    def start(self):
+        if self.task is None:
+            eventService.subscribe(self.on_event)
+            self.task = asyncio.create_task(self.run())
+
+    def stop(self):
+        eventService.unsubscribe(self.on_event)
+        if self.task is not None:
+            self.task.cancel()
+            self.task = None
+
+    def on_event(self, event, branchId):
+        if event not in self.events:
+            return
+        # Topics without a branch (HQ, warehouse, Exacon) care about every branch.
+        if self.branchId is None or (branchId is not None and str(branchId) == self.branchId):
+            self.changed.set()
+
+    def publish(self, payload):
+        self.payload = payload
+        for queue in self.subscribers:
+            push_latest(queue, payload)
+
+    async def run(self):
+        while True:
+            self.changed.clear()
+            try:
+                self.publish(await self.producer())
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Broadcast error on {self.key}: {e}")
+
+            try:
+                await asyncio.wait_for(self.changed.wait(), self.heartbeat)
+                # Let a burst of writes (e.g. a checkout touching several items) settle into one recompute.
+                await asyncio.sleep(DEBOUNCE_SECONDS)
+            except asyncio.TimeoutError:
+                pass
+
+def push_latest(queue, payload):
+    # Slow clients only ever need the newest payload, so drop whatever is still queued.
+    if queue.full():
+        queue.get_nowait()
+    queue.put_nowait(payload)
+
+async def subscribe(websocket, name, key, producer, heartbeat, events=(), branchId=None):
+    topicKey = (name, key)
+    topic = _topics.get(topicKey)
+
+    if topic is None:
+        topic = Topic(topicKey, producer, heartbeat, events, branchId)
+        _topics[topicKey] = topic
+
+    queue = asyncio.Queue(maxsize=1)
+    topic.subscribers.add(queue)
+
+    if topic.payload is not None:
+        push_latest(queue, topic.payload)
+
+    topic.start()
+
+    try:
+        while True:
+            payload = await queue.get()
+            if isinstance(payload, str):
+                await websocket.send(payload)
+            else:
+                await websocket.send_json(payload)
+    finally:
+        topic.subscribers.discard(queue)
+        if not topic.subscribers:
+            topic.stop()
+            _topics.pop(topicKey, None)
@@ -0,0 +1,83 @@
+import time
+from collections import OrderedDict
+import eventService
+from utils import create_response
+
+MAX_ENTRIES = 2000
+CATALOG_TTL_SECONDS = 300
+CATEGORY_TTL_SECONDS = 3600
+BRANCH_TTL_SECONDS = 3600
+
+# Endpoints whose payloads embed branch stock quantities or sales rankings.
+STOCK_ENDPOINTS = ("getProducts", "getCentralProducts", "getBranchStocks", "getWHStocks", "getStocksMonitor", "getWHStocksMonitor")
+
+_entries = OrderedDict()
+_stats = {"hits": 0, "misses": 0, "evictions": 0, "invalidations": 0}
+_generation = 0
+
+def cacheKey(endpoint, categoryId=None, branchId=None, page=None, search=None, extra=None):
+    return (endpoint, categoryId, branchId, page, search or "", extra)
+
+def get(key):
+    entry = _entries.get(key)
+    if entry is None or entry[0] < time.monotonic():
+        if entry is not None:
+            del _entries[key]
+        _stats["misses"] += 1
+        return None
+
+    _entries.move_to_end(key)
+    _stats["hits"] += 1
+    return entry[1]
+
+def put(key, value, ttl=CATALOG_TTL_SECONDS):
+    _entries[key] = (time.monotonic() + ttl, value)
+    _entries.move_to_end(key)
+    while len(_entries) > MAX_ENTRIES:
+        _entries.popitem(last=False)
+        _stats["evictions"] += 1
+
+async def getOrLoad(key, loader, ttl=CATALOG_TTL_SECONDS):
+    value = get(key)
+    if value is None:
+        generation = _generation
+        value = await loader()
+        # Skip caching if a write invalidated the cache while the loader was still reading.
+        if value is not None and generation == _generation:
+            put(key, value, ttl)
+    return value
+
+def invalidate(endpoints=None, branchId=None):
+    """Drops cached entries for the given endpoints (all when None), limited to one branch when branchId is set.
+
+    Entries that are not branch-scoped are always dropped, since they may include every branch."""
+    global _generation
+    _generation += 1
+    for key in list(_entries):
+        endpoint, _, keyBranchId = key[:3]
+        if endpoints is not None and endpoint not in endpoints:
+            continue
+        if branchId is not None and keyBranchId is not None and str(keyBranchId) != str(branchId):
+            continue
+        del _entries[key]
+        _stats["invalidations"] += 1
+
+def getStats():
+    lookups = _stats["hits"] + _stats["misses"]
+    return {
+        **_stats,
+        "entries": len(_entries),
+        "maxEntries": MAX_ENTRIES,
+        "hitRate": round(_stats["hits"] / lookups, 4) if lookups else 0.0
+    }
+
+def getCacheStats():
+    return create_response(True, 'Cache Stats Retrieved', getStats()), 200
+
+def on_event(event, branchId):
+    if event in (eventService.ITEM_CHANGED, eventService.BRANCH_CHANGED):
+        invalidate()
+    elif event in eventService.TRANSACTION_EVENTS or event == eventService.STOCK_CHANGED:
+        invalidate(STOCK_ENDPOINTS, branchId)
+
+eventService.subscribe(on_event)
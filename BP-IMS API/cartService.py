@@ -0,0 +1,180 @@
+import asyncio
+import time
+from datetime import datetime
+from tortoise import Tortoise
+import eventService
+from utils import create_response
+
+CART_TTL_SECONDS = 60
+RECONCILE_INTERVAL_SECONDS = 300
+
+# cartId -> (expiry, snapshot); userId -> cartId, since a cart never changes owner.
+_snapshots = {}
+_cartIds = {}
+_generation = 0
+_reconcileStats = {"runs": 0, "driftRuns": 0, "driftedCarts": 0, "lastDriftedCarts": 0, "lastRunAt": None, "errors": 0}
+_reconciler = None
+
+async def loadCart(userId):
+    """Reads a user's cart, its lines with branch stock and the customer name in one query."""
+    query = """
+        SELECT
+            c.id AS cartId,
+            c.discount,
+            c.deliveryFee,
+            c.subTotal,
+            u.branchId,
+            cu.name AS customerName,
+            ci.id,
+            ci.quantity,
+            i.id AS itemId,
+            i.name,
+            i.price,
+            i.sellByUnit,
+            bi.quantity AS branchQty
+        FROM carts c
+        LEFT JOIN users u ON u.id = c.userId
+        LEFT JOIN customers cu ON cu.id = c.customerId
+        LEFT JOIN cartitems ci ON ci.cartId = c.id
+        LEFT JOIN branchitem bi ON bi.id = ci.branchItemId
+        LEFT JOIN items i ON i.id = bi.itemId
+        WHERE c.userId = %s
+        ORDER BY ci.id
+    """
+    rows = await Tortoise.get_connection('default').execute_query_dict(query, [userId])
+    if not rows:
+        return None
+
+    first = rows[0]
+    lines = [
+        {
+            "id": row['id'],
+            "itemId": row['itemId'],
+            "name": row['name'],
+            "price": row['price'],
+            "quantity": row['quantity'],
+            "sellByUnit": bool(row['sellByUnit']),
+            "branchQty": row['branchQty']
+        }
+        for row in rows
+        if row['itemId'] is not None
+    ]
+
+    return {
+        "cart": {
+            "id": first['cartId'],
+            "discount": first['discount'],
+            "deliveryFee": first['deliveryFee'],
+            "subTotal": str(first['subTotal']),
+            "customerName": first['customerName']
+        },
+        "cartItems": lines,
+        "totalCount": int(sum(line['quantity'] if line['sellByUnit'] else 1 for line in lines)),
+        "branchId": first['branchId']
+    }
+
+async def getCart(userId):
+    """Returns the snapshot of a user's cart, reading it again only after a mutation or stock change."""
+    cartId = _cartIds.get(userId)
+    entry = _snapshots.get(cartId)
+    if entry is not None and entry[0] >= time.monotonic():
+        return entry[1]
+
+    generation = _generation
+    snapshot = await loadCart(userId)
+    if snapshot is not None:
+        cartId = snapshot['cart']['id']
+        _cartIds[userId] = cartId
+        # Skip caching if the cart changed while it was being read.
+        if generation == _generation:
+            _snapshots[cartId] = (time.monotonic() + CART_TTL_SECONDS, snapshot)
+    return snapshot
+
+def invalidate(cartId=None, branchId=None):
+    """Drops one cart's snapshot, every cart of a branch's users, or all snapshots when neither is given."""
+    global _generation
+    _generation += 1
+    if cartId is not None:
+        _snapshots.pop(cartId, None)
+        return
+
+    for key, (_, snapshot) in list(_snapshots.items()):
+        if branchId is None or str(snapshot['branchId']) == str(branchId):
+            del _snapshots[key]
+
+async def repriceCarts(connection, cartIds=None):
+    """Sets subTotal to the sum of each cart's lines at current prices, for cartIds or every cart.
+
+    Only carts whose subTotal changes are written, and the rowcount says how many there were."""
+    query = """
+        UPDATE carts c
+        LEFT JOIN (
+            SELECT ci.cartId, SUM(i.price * ci.quantity) AS subTotal
+            FROM cartitems ci
+            INNER JOIN branchitem bi ON bi.id = ci.branchItemId
+            INNER JOIN items i ON i.id = bi.itemId
+            GROUP BY ci.cartId
+        ) t ON t.cartId = c.id
+        SET c.subTotal = COALESCE(t.subTotal, 0)
+        WHERE c.subTotal <> COALESCE(t.subTotal, 0)
+    """
+    params = []
+    if cartIds is not None:
+        if not cartIds:
+            return 0
+        query += f" AND c.id IN ({', '.join(['%s'] * len(cartIds))})"
+        params = list(cartIds)
+
+    rowcount, _ = await connection.execute_query(query, params)
+    return rowcount
+
+async def reconcileSubTotals():
+    """Reprices every cart from cartitems and returns how many carts had drifted.
+
+    The UPDATE takes locks on the lines it reads, so a cart mutation still in flight finishes
+    before its cart is checked."""
+    rowcount = await repriceCarts(Tortoise.get_connection('default'))
+
+    _reconcileStats["runs"] += 1
+    _reconcileStats["lastDriftedCarts"] = rowcount
+    _reconcileStats["lastRunAt"] = datetime.now()
+    if rowcount:
+        _reconcileStats["driftRuns"] += 1
+        _reconcileStats["driftedCarts"] += rowcount
+        invalidate()
+    return rowcount
+
+async def runReconciler():
+    while True:
+        await asyncio.sleep(RECONCILE_INTERVAL_SECONDS)
+        try:
+            await reconcileSubTotals()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            _reconcileStats["errors"] += 1
+            print(f"Cart reconcile error: {e}")
+
+def startReconciler():
+    global _reconciler
+    if _reconciler is None:
+        _reconciler = asyncio.create_task(runReconciler())
+
+def getReconcileStats():
+    runs = _reconcileStats["runs"]
+    stats = {
+        **_reconcileStats,
+        "intervalSeconds": RECONCILE_INTERVAL_SECONDS,
+        "driftRate": round(_reconcileStats["driftRuns"] / runs, 4) if runs else 0.0
+    }
+    return create_response(True, 'Cart Reconcile Stats Retrieved', stats), 200
+
+def on_event(event, branchId):
+    if event == eventService.ITEM_CHANGED:
+        invalidate()
+    elif event in eventService.TRANSACTION_EVENTS or event == eventService.STOCK_CHANGED:
+        # Warehouse changes come through without a branch and never touch branchQty.
+        if branchId is not None:
+            invalidate(branchId=branchId)
+
+eventService.subscribe(on_event)
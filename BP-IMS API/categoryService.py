@@ -1,7 +1,14 @@
 from models import Category
 from utils import create_response
+import cacheService
 
 async def get_categories():
+    key = cacheService.cacheKey('getCategories')
+    category_list = await cacheService.getOrLoad(key, loadCategories, cacheService.CATEGORY_TTL_SECONDS)
+
+    return create_response(True, 'Categories Successfully Retrieved', category_list), 200
+
+async def loadCategories():
     categories = await Category.filter(id__in=[11, 1, 8, 13]).order_by('name')
 
     category_list = [
@@ -14,9 +21,15 @@ async def get_categories():
         for category in categories
     ])
 
-    return create_response(True, 'Categories Successfully Retrieved', category_list), 200
+    return category_list
 
 async def getCategoriesHQ():
+    key = cacheService.cacheKey('getCategoriesHQ')
+    category_list = await cacheService.getOrLoad(key, loadCategoriesHQ, cacheService.CATEGORY_TTL_SECONDS)
+
+    return create_response(True, 'Categories Successfully Retrieved', category_list), 200
+
+async def loadCategoriesHQ():
     categories = await Category.filter(id__in=[11, 1, 8, 13]).order_by('name')
 
     category_list = [
@@ -27,6 +40,6 @@ async def getCategoriesHQ():
         for category in categories
     ])
     
-    return create_response(True, 'Categories Successfully Retrieved', category_list), 200
+    return category_list
 
 
@@ -1,28 +1,44 @@
 from tortoise import Tortoise
 from utils import create_response
 import transactionService
-from models import User, CartItems, Item, Customer, Cart, BranchItem, Branch, Transaction, TransactionItem
-from decimal import Decimal
+import eventService
+import rollupService
+import checkoutService
+import cartService
+import stockService
+import cacheService
+import pagination
+import userService
+from models import Customer, Cart, Branch, Transaction
+from decimal import Decimal, InvalidOperation
 from datetime import datetime, time, timedelta, timezone
+from tortoise.transactions import in_transaction
+
+async def getCentralProducts(categoryId, page=1, search="", countMode=pagination.COUNT_EXACT, fuzzy=False):
+    key = cacheService.cacheKey('getCentralProducts', categoryId, None, page, search, (countMode, fuzzy))
+    itemList, totalCount, hasMore = await cacheService.getOrLoad(key, lambda: loadCentralProducts(categoryId, page, search, countMode, fuzzy))
 
-async def getCentralProducts(categoryId, page=1, search=""):
+    return create_response(True, 'Items Successfully Retrieved', itemList, None, totalCount, None, hasMore), 200
+
+async def loadCentralProducts(categoryId, page, search, countMode=pagination.COUNT_EXACT, fuzzy=False):
     pageSize = 30
     offset = (page - 1) * pageSize
 
-    sqlQuery = """
-        SELECT 
-            i.id, 
-            i.name, 
-            i.categoryId, 
-            i.price, 
-            i.cost, 
-            i.isManaged, 
-            i.imagePath, 
-            i.sellByUnit,
-            i.storeCriticalValue,
-            c.name as categoryName,
-            i.whCriticalValue,
-            i.unitOfMeasure
+    select = """
+        i.id, 
+        i.name, 
+        i.categoryId, 
+        i.price, 
+        i.cost, 
+        i.isManaged, 
+        i.imagePath, 
+        i.sellByUnit,
+        i.storeCriticalValue,
+        c.name as categoryName,
+        i.whCriticalValue,
+        i.unitOfMeasure
+    """
+    fromWhere = """
         FROM items i
         LEFT JOIN categories c on c.Id = i.categoryId
         WHERE i.isManaged = 1
@@ -31,31 +47,19 @@ async def getCentralProducts(categoryId, page=1, search=""):
     params = []
 
     if categoryId != 0 and categoryId != -1:
-        sqlQuery += " AND i.categoryId = %s"
+        fromWhere += " AND i.categoryId = %s"
         params.append(categoryId)
 
-    if search:
-        sqlQuery += " AND i.name LIKE %s"
-        params.append(f'%{search}%')
-    sqlQuery += " ORDER BY i.name"
-    sqlQuery += " LIMIT %s OFFSET %s"
-    params.extend([pageSize, offset])
+    countKey = cacheService.cacheKey('getCentralProducts', categoryId, None, 'count', search, fuzzy)
 
     connection = Tortoise.get_connection('default')
-    result = await connection.execute_query(sqlQuery, tuple(params))
-
-    countQuery = """
-        SELECT COUNT(*) 
-        FROM items i
-        WHERE i.isManaged = 1
-    """
-    totalCountResult = await connection.execute_query(countQuery)
-    totalCount = totalCountResult[1][0]['COUNT(*)']
-
-    items = result[1]
+    if search:
+        idsKey = cacheService.cacheKey('getCentralProducts', categoryId, None, 'ids')
+        items, totalCount, hasMore, _ = await pagination.fetchSearchPage(connection, select, fromWhere, params, search, pageSize, offset, None, countMode, idsKey, fuzzy)
+    else:
+        items, totalCount, hasMore = await pagination.fetchPage(connection, select, fromWhere, params, "i.name, i.id", pageSize, offset, None, countMode, countKey)
 
-    for item in items:
-        item['branchProducts'] = await getBranchProducts(item['id'])
+    branchProducts = await getBranchProducts([item['id'] for item in items])
 
     itemList = [
         {
@@ -71,93 +75,65 @@ async def getCentralProducts(categoryId, page=1, search=""):
             "categoryName":item['categoryName'],
             "whCriticalValue":item['whCriticalValue'],
             "unitOfMeasure":item['unitOfMeasure'],
-            "branchProducts":item['branchProducts']
+            "branchProducts":branchProducts[item['id']]
         }
         for item in items
     ]
 
-    return create_response(True, 'Items Successfully Retrieved', itemList, None, totalCount), 200
+    return itemList, totalCount, hasMore
 
-async def getBranchProducts(itemId):
+async def getBranchProducts(itemIds):
+    """Returns {itemId: [stock in each active branch]} for every item on a page, read in one query."""
+    branches = await userService.getActiveBranchList()
+    branchProducts = {itemId: [] for itemId in itemIds}
+    if not itemIds or not branches:
+        return branchProducts
 
-    sqlQuery = """
-        SELECT bi.id, bi.branchId, b.name as branchName, bi.quantity
-        From branchitem bi inner join branches b on b.Id = bi.branchId 
-        where bi.itemId = %s and b.isActive = 1
-    """
-
-    params = [itemId]
+    branchNames = {branch['id']: branch['name'] for branch in branches}
 
-    sqlQuery += " ORDER BY b.id"
+    sqlQuery = f"""
+        SELECT bi.id, bi.branchId, bi.itemId, bi.quantity
+        FROM branchitem bi
+        WHERE bi.itemId IN ({", ".join(["%s"] * len(itemIds))})
+        AND bi.branchId IN ({", ".join(["%s"] * len(branchNames))})
+        ORDER BY bi.branchId
+    """
 
     connection = Tortoise.get_connection('default')
-    result = await connection.execute_query(sqlQuery, tuple(params))
-
-    items = result[1]
-
-    itemList = [
-        {
-            "id": item['id'],
-            "branchId": item['branchId'],
-            "branchName": item['branchName'],
-            "quantity": item['quantity']
-        }
-        for item in items
-    ]
+    rows = await connection.execute_query_dict(sqlQuery, list(itemIds) + list(branchNames))
+
+    for row in rows:
+        branchProducts[row['itemId']].append({
+            "id": row['id'],
+            "branchId": row['branchId'],
+            "branchName": branchNames[row['branchId']],
+            "quantity": row['quantity']
+        })
 
-    return itemList
+    return branchProducts
 
 async def getCentralCartandItems(userId):
-    cart = await transactionService.getCartforUser(userId)
-    user = await User.get_or_none(id = userId)
-    totalCount = await transactionService.getTotalItemCount(cart.id);    
-    cartItems = await getCentralCartItems(cart.id)
-
-    cart_data = cart.__dict__  
-    cart_data.pop('userId', None)
-    customer = None
-    if(cart_data["customerId"]):
-        customer = await Customer.get_or_none(id = cart_data["customerId"])
+    snapshot = await cartService.getCart(userId)
+    if not snapshot:
+        await transactionService.createCartforUser(userId)
+        snapshot = await cartService.getCart(userId)
 
     cartDto = {
-            "cart": {
-                "id": cart_data["id"],
-                "discount": cart_data["discount"],
-                "deliveryFee": cart_data["deliveryFee"],
-                "subTotal": str(cart_data["subTotal"]),
-                "customerName": customer.name if customer else None 
-            },
-            "cartItems": cartItems
+            "cart": snapshot["cart"],
+            "cartItems": [
+                {key: value for key, value in line.items() if key != "branchQty"}
+                for line in snapshot["cartItems"]
+            ]
         }
 
-    return create_response(True, "Successfully retrieved cart and items", cartDto, None, totalCount), 200
-
-async def getCentralCartItems(cartId):
-    cartItems = await CartItems.all().filter(cartId=cartId)
-    result = []
-
-    if cartItems:
-        for cartItem in cartItems:
-            branchItem = await BranchItem.get_or_none(id = cartItem.branchItemId)
-            item = await Item.get_or_none(id=branchItem.itemId)
-
-            if item:
-                result.append({
-                    "id": cartItem.id,
-                    "itemId": item.id,
-                    "name": item.name,
-                    "price": item.price,
-                    "quantity": cartItem.quantity,
-                    "sellByUnit": item.sellByUnit
-                })
-
-    return result
-
-from decimal import Decimal, InvalidOperation
+    return create_response(True, "Successfully retrieved cart and items", cartDto, None, snapshot["totalCount"]), 200
 
 async def addCentralItemToCart(cartId, branchProducts):
-    message = None
+    """Adds every branch product with a soldQuantity to the cart in one transaction.
 
+    All lines are checked against stock in one query first; if any line is short nothing is
+    added and the short lines are returned. Lines already in the cart are topped up."""
+    quantities = {}
     for bp in branchProducts:
         sold_qty = bp.get('soldQuantity')
 
@@ -172,29 +148,63 @@ async def addCentralItemToCart(cartId, branchProducts):
         if quantity_decimal <= 0:
             continue
 
-        branchItem = await BranchItem.get_or_none(id=bp['id'])
-        if not branchItem:
-            continue
-
-        item = await Item.get_or_none(id=branchItem.itemId)
-        if branchItem.quantity < quantity_decimal:
-            return create_response(False, 'Not enough stock available for this item', None, None), 200
-
-        existing_cart_item = await CartItems.get_or_none(cartId=cartId, branchItemId=branchItem.id)
-
-        if existing_cart_item:
-            existing_cart_item.quantity += quantity_decimal
-            await existing_cart_item.save()
-            message = 'Item quantity updated in the cart'
-        else:
-            await CartItems.create(cartId=cartId, branchItemId=branchItem.id, quantity=quantity_decimal)
-            message = 'Item successfully added to the cart' 
-
-        cart = await Cart.get_or_none(id=cartId)
-        cart.subTotal += item.price * quantity_decimal
-        await cart.save()    
-    
-    return create_response(True, message or "No items added to cart", None, None), 200
+        branchItemId = int(bp['id'])
+        quantities[branchItemId] = quantities.get(branchItemId, 0) + quantity_decimal
+
+    if not quantities:
+        return create_response(True, "No items added to cart", None, None), 200
+
+    branchItemIds = sorted(quantities)
+    placeholders = ", ".join(["%s"] * len(branchItemIds))
+
+    async with in_transaction() as connection:
+        # Cart first, then its lines, in the order checkout locks them, so the two cannot deadlock.
+        await checkoutService.lockCart(cartId)
+        stockQuery = f"""
+            SELECT bi.id, bi.quantity, i.id AS itemId, i.name, i.price, ci.quantity AS cartQuantity
+            FROM branchitem bi
+            INNER JOIN items i ON i.id = bi.itemId
+            LEFT JOIN cartitems ci ON ci.branchItemId = bi.id AND ci.cartId = %s
+            WHERE bi.id IN ({placeholders})
+            ORDER BY bi.id
+        """
+        lines = await connection.execute_query_dict(stockQuery, [cartId] + branchItemIds)
+
+        if not lines:
+            return create_response(True, "No items added to cart", None, None), 200
+
+        conflicts = [
+            {
+                "branchItemId": line['id'],
+                "itemId": line['itemId'],
+                "name": line['name'],
+                "requested": quantities[line['id']] + (line['cartQuantity'] or 0),
+                "available": line['quantity']
+            }
+            for line in lines
+            if line['quantity'] < quantities[line['id']] + (line['cartQuantity'] or 0)
+        ]
+        if conflicts:
+            return create_response(False, 'Not enough stock available for this item', conflicts, None), 200
+
+        values = ", ".join(["(%s, %s, %s)"] * len(lines))
+        params = [value for line in lines for value in (cartId, line['id'], quantities[line['id']])]
+        await connection.execute_query(f"""
+            INSERT INTO cartitems (cartId, branchItemId, quantity) VALUES {values}
+            ON DUPLICATE KEY UPDATE quantity = quantity + VALUES(quantity)
+        """, params)
+
+        subTotal = sum((line['price'] * quantities[line['id']] for line in lines), Decimal(0))
+        await connection.execute_query("UPDATE carts SET subTotal = subTotal + %s WHERE id = %s", [subTotal, cartId])
+
+    cartService.invalidate(cartId)
+
+    if any(line['cartQuantity'] is not None for line in lines):
+        message = 'Item quantity updated in the cart'
+    else:
+        message = 'Item successfully added to the cart'
+
+    return create_response(True, message, None, None), 200
 
 async def processCentralPayment(cartId, amountReceived, isCredit):
     cart = await Cart.get_or_none(id=cartId)
@@ -202,74 +212,27 @@ async def processCentralPayment(cartId, amountReceived, isCredit):
     if not cart:
         return create_response(False, 'Transaction Error. Please Try Again!'), 404
     
-    user = await User.get_or_none(id=cart.userId)
     branch = await Branch.get_or_none(id=1)
-    customer = await Customer.get_or_none(id=cart.customerId) if cart.customerId else None
-    cartItems = await CartItems.filter(cartId=cartId)
-    transactionItems = []
-
-    total_amount = cart.subTotal
-    if cart.discount:
-        total_amount -= cart.discount  
-    if cart.deliveryFee:
-        total_amount += cart.deliveryFee  
-
-    if total_amount > float(amountReceived):
-        return create_response(False, 'Transaction Error. Please Try Again!'), 404
-
-    slip_no = await transactionService.generate_slip_no(branch.id)
-    total_profit = 0 
-
-    total_cogs = 0
-    for cItem in cartItems:
-        branchItem = await BranchItem.get_or_none(id=cItem.branchItemId)
-        item = await Item.get_or_none(id=branchItem.itemId)
-        if item:
-            total_cogs += item.cost * cItem.quantity  
-
-    total_profit = total_amount - total_cogs
     current_time = datetime.now(timezone.utc) + timedelta(hours=8)
     adjusted_time = transactionService.adjust_transaction_time(current_time)
 
-    transaction = await Transaction.create(
-        amountReceived=float(amountReceived),
-        totalAmount=total_amount,
-        cashierId=cart.userId,
-        slipNo=slip_no,
-        transactionDate = adjusted_time,
-        branchId=1,
-        profit=total_profit,
-        discount=cart.discount,
-        deliveryFee=cart.deliveryFee,
-        isExacon = True,
-        isPaid = False if isCredit else True
-    )
-
-    for cItem in cartItems:
-        branchItem = await BranchItem.get_or_none(id=cItem.branchItemId)
-        item = await Item.get_or_none(id=branchItem.itemId)
-        if item:    
-            branchItem.quantity -= cItem.quantity
-            itemAmount = item.price * cItem.quantity
-
-            tItem = await TransactionItem.create(
-                transactionId=transaction.id,
-                itemId=branchItem.itemId,
-                quantity=cItem.quantity,
-                amount=itemAmount,
-                isVoided=False
-            )
-            transactionItems.append({
-                "id": tItem.id,
-                "itemId": item.id,
-                "name": item.name,
-                "price": item.price,
-                "quantity": tItem.quantity,
-                "amount": tItem.amount,
-                "sellByUnit": item.sellByUnit
-            })
-
-        await branchItem.save()
+    try:
+        result = await checkoutService.checkout(
+            cartId,
+            amountReceived,
+            recordCustomer=False,
+            transactionDate = adjusted_time,
+            branchId=1,
+            isExacon = True,
+            isPaid = False if isCredit else True
+        )
+    except checkoutService.CheckoutError as e:
+        return create_response(False, str(e)), e.status
+    except stockService.StockConflict as e:
+        return create_response(False, 'Insufficient stock for some items', e.conflicts), 409
+
+    transaction = result['transaction']
+    customer = await Customer.get_or_none(id=result['customerId']) if result['customerId'] else None
 
     transactionRequest = {
         "transaction": {
@@ -279,26 +242,23 @@ async def processCentralPayment(cartId, amountReceived, isCredit):
             "slipNo": transaction.slipNo,
             "transactionDate": transaction.transactionDate,
             "branch": branch.name,
-            "deliveryFee": cart.deliveryFee,
-            "discount": cart.discount,
-            "subTotal": cart.subTotal,
+            "deliveryFee": transaction.deliveryFee,
+            "discount": transaction.discount,
+            "subTotal": result['subTotal'],
             "customerName": customer.name if customer else None,
             "isCredit": isCredit
         },
-        "transactionItems": transactionItems
+        "transactionItems": result['transactionItems']
     }
 
-    await CartItems.filter(cartId=cartId).delete()
-    cart.subTotal = 0
-    cart.deliveryFee = None
-    cart.discount = None
-    cart.customerId = None
-    await cart.save()
-
     if customer:
-        customer.totalOrderAmount += total_amount
+        customer.totalOrderAmount += transaction.totalAmount
         await customer.save()
 
+    eventService.publish(eventService.TRANSACTION_CREATED, branch.id)
+    for stockBranchId in result['stockBranchIds']:
+        eventService.publish(eventService.STOCK_CHANGED, stockBranchId)
+
     message = 'Payment Successful'
     return create_response(True, message, transactionRequest), 200
 
@@ -325,15 +285,10 @@ async def getAllCentralTransactionsAsync(categoryId,page=1, search=""):
     dailyTransactions = await Tortoise.get_connection("default").execute_query_dict(dailyTransactsDto, tuple(params))
 
     transactionsDto = []
+    itemsByTransaction = await transactionService.getTransactionItemsByIds([tr['id'] for tr in dailyTransactions])
 
     for tr in dailyTransactions:
-        itemsQuery = """
-            SELECT ti.id, i.name as itemName, i.id as itemId, ti.quantity 
-            FROM transactionitems ti
-            INNER JOIN items i ON i.id = ti.itemId
-            WHERE ti.transactionId = %s
-        """
-        items = await Tortoise.get_connection("default").execute_query_dict(itemsQuery, (tr['id'],))
+        items = itemsByTransaction[tr['id']]
         transactionsDto.append({
             "id": tr["id"],
             "totalAmount": float(tr["totalAmount"]),
@@ -353,10 +308,24 @@ async def getAllCentralTransactionsAsync(categoryId,page=1, search=""):
     return create_response(True, "Successfully Retrieved", transactions, None, total_count), 200
 
 async def payPendingTransaction(transactionId, amount):
-    transaction = await Transaction.get_or_none(id = transactionId)
-    transaction.isPaid = True
-    transaction.amountReceived = amount
-    
-    await transaction.save()
+    async with in_transaction():
+        # Locking the row makes a second pay, or a pay racing a void, wait and then see the other's
+        # change, so the sale is added to the rollups once and never over a void.
+        transaction = await Transaction.select_for_update().get_or_none(id=transactionId)
+
+        if not transaction:
+            return create_response(False, 'Transaction not found!'), 404
+        if transaction.isPaid:
+            return create_response(False, 'Transaction already paid'), 409
+        if transaction.isVoided:
+            return create_response(False, 'Transaction is voided'), 409
+
+        transaction.isPaid = True
+        transaction.amountReceived = amount
+        await transaction.save()
+        # Credit sales only count towards the dashboards once they are settled.
+        await rollupService.addTransaction(transaction)
+
+    eventService.publish(eventService.TRANSACTION_PAID, transaction.branchId)
     
     return create_response(True, "Successfully Paid", None, None), 200
\ No newline at end of file
@@ -0,0 +1,158 @@
+from models import Cart, Transaction, TransactionItem, CartItems
+from tortoise.transactions import in_transaction
+from decimal import Decimal
+from datetime import datetime, timedelta, timezone
+import rollupService
+import stockService
+import cartService
+
+class CheckoutError(Exception):
+    """Raised when a cart cannot be checked out; status is the HTTP status to answer with."""
+    def __init__(self, message, status=404):
+        super().__init__(message)
+        self.status = status
+
+async def lockCart(cartId):
+    """Locks the cart row for the rest of the transaction, so a second payment on it waits and then finds it emptied."""
+    return await Cart.select_for_update().get_or_none(id=cartId)
+
+async def getCartLines(connection, cartId):
+    """Loads and locks every cart line with its branch item and item in one query, in the order they were added.
+
+    Only the cart lines are locked here; the branch items are locked in id order by decrementStock."""
+    query = """
+        SELECT
+            ci.quantity,
+            bi.id AS branchItemId,
+            bi.branchId,
+            i.id AS itemId,
+            i.name,
+            i.price,
+            i.cost,
+            i.sellByUnit
+        FROM cartitems ci
+        INNER JOIN branchitem bi ON bi.id = ci.branchItemId
+        INNER JOIN items i ON i.id = bi.itemId
+        WHERE ci.cartId = %s
+        ORDER BY ci.id
+        FOR UPDATE OF ci
+    """
+    return await connection.execute_query_dict(query, [cartId])
+
+async def generateSlipNo(connection, branchId):
+    """Allocates the next CC{branch}-{mmddyy}-{no} slip number from slip_sequences.
+
+    The upsert locks the branch's row for the day until the surrounding transaction ends, so
+    concurrent payments get consecutive numbers and a rolled back payment hands its number back."""
+    now_sg = datetime.now(timezone.utc) + timedelta(hours=8)
+    today = now_sg.date()
+
+    await connection.execute_query("""
+        INSERT INTO slip_sequences (branchId, date, lastNo) VALUES (%s, %s, 1)
+        ON DUPLICATE KEY UPDATE lastNo = lastNo + 1
+    """, [branchId, today])
+    rows = await connection.execute_query_dict(
+        "SELECT lastNo FROM slip_sequences WHERE branchId = %s AND date = %s",
+        [branchId, today]
+    )
+
+    return f"CC{branchId:02d}-{now_sg.strftime('%m%d%y')}-{rows[0]['lastNo']:03d}"
+
+def getTotalCogs(lines):
+    return sum((line['cost'] * line['quantity'] for line in lines), Decimal(0))
+
+async def checkout(cartId, amountReceived, recordCustomer=True, **transactionFields):
+    """Writes a checkout as one DB transaction: the locked cart and its lines, the slip number, the transaction row,
+    its items in a single INSERT, the stock decrements in a single UPDATE, the sales rollups (when paid) and the
+    emptied cart.
+
+    The total and profit are worked out from the lines read under the cart lock, so they match what is sold even
+    if the cart changed after the cashier last saw it. Any failure rolls the whole checkout back, so stock never
+    moves without a matching sale.
+    Raises CheckoutError when the cart is missing or empty or amountReceived does not cover the total, and
+    stockService.StockConflict when a line asks for more than is in stock.
+    Returns a dict with the transaction, its items shaped for the receipt, the subTotal, the cart's customerId
+    and the branches whose stock moved."""
+    async with in_transaction() as connection:
+        cart = await lockCart(cartId)
+        if not cart:
+            raise CheckoutError('Transaction Error. Please Try Again!')
+
+        lines = await getCartLines(connection, cartId)
+        if not lines:
+            raise CheckoutError('Cart is empty', 409)
+
+        subTotal = sum((line['price'] * line['quantity'] for line in lines), Decimal(0))
+        totalAmount = subTotal
+        if cart.discount:
+            totalAmount -= cart.discount
+        if cart.deliveryFee:
+            totalAmount += cart.deliveryFee
+
+        if totalAmount > Decimal(str(amountReceived)):
+            raise CheckoutError('Transaction Error. Please Try Again!')
+
+        # Take the stock first so the row locks are held before anything else is written.
+        await stockService.decrementStock(connection, lines)
+
+        slipNo = await generateSlipNo(connection, transactionFields['branchId'])
+        transaction = await Transaction.create(
+            slipNo=slipNo,
+            amountReceived=float(amountReceived),
+            totalAmount=totalAmount,
+            cashierId=cart.userId,
+            profit=totalAmount - getTotalCogs(lines),
+            discount=cart.discount,
+            deliveryFee=cart.deliveryFee,
+            **({"customerId": cart.customerId} if recordCustomer else {}),
+            **transactionFields
+        )
+
+        await TransactionItem.bulk_create([
+            TransactionItem(
+                transactionId=transaction.id,
+                itemId=line['itemId'],
+                quantity=line['quantity'],
+                amount=line['price'] * line['quantity']
+            )
+            for line in lines
+        ])
+        # bulk_create does not return ids on MySQL; one multi-row INSERT gets consecutive ids in line order.
+        rows = await connection.execute_query_dict(
+            "SELECT id FROM transactionitems WHERE transactionId = %s ORDER BY id",
+            [transaction.id]
+        )
+
+        if transaction.isPaid:
+            await rollupService.addTransaction(transaction)
+
+        customerId = cart.customerId
+        await CartItems.filter(cartId=cart.id).delete()
+        cart.subTotal = 0
+        cart.deliveryFee = None
+        cart.discount = None
+        cart.customerId = None
+        await cart.save()
+
+    cartService.invalidate(cart.id)
+
+    transactionItems = [
+        {
+            "id": row['id'],
+            "itemId": line['itemId'],
+            "name": line['name'],
+            "price": line['price'],
+            "quantity": line['quantity'],
+            "amount": line['price'] * line['quantity'],
+            "sellByUnit": bool(line['sellByUnit'])
+        }
+        for row, line in zip(rows, lines)
+    ]
+
+    return {
+        "transaction": transaction,
+        "transactionItems": transactionItems,
+        "subTotal": subTotal,
+        "customerId": customerId,
+        "stockBranchIds": {line['branchId'] for line in lines}
+    }
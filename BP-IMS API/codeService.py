@@ -0,0 +1,36 @@
+from tortoise import Tortoise
+
+# Scanned code -> itemId and back, for managed items that have a code. Keys are upper-cased
+# because MySQL's default collation treats "ab12" and "AB12" as the same code.
+_itemIds = {}
+_codes = {}
+
+def normalize(code):
+    """Returns the map key of a code, or None when it is blank."""
+    code = (code or "").strip()
+    return code.upper() or None
+
+def setCode(itemId, code):
+    """Points code at itemId, dropping whatever code the item had before."""
+    removeItem(itemId)
+    key = normalize(code)
+    if key is not None:
+        _itemIds[key] = itemId
+        _codes[itemId] = key
+
+def removeItem(itemId):
+    key = _codes.pop(itemId, None)
+    if key is not None and _itemIds.get(key) == itemId:
+        del _itemIds[key]
+
+def resolve(code):
+    key = normalize(code)
+    return _itemIds.get(key) if key is not None else None
+
+async def build():
+    rows = await Tortoise.get_connection('default').execute_query_dict(
+        "SELECT id, code FROM items WHERE isManaged = 1 AND code IS NOT NULL")
+    _itemIds.clear()
+    _codes.clear()
+    for row in rows:
+        setCode(row['id'], row['code'])
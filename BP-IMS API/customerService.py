@@ -4,6 +4,10 @@ import os
 from tortoise.queryset import Q 
 from datetime import date
 from tortoise import Tortoise
+from tortoise.transactions import in_transaction
+import eventService
+import cartService
+import stockService
 from decimal import Decimal
 from werkzeug.utils import secure_filename
 from config import CUSTOMER_IMAGES
@@ -125,6 +129,8 @@ async def saveCustomer(data, file):
         if branchId:
             existing_customer.branchId = branchId
         await existing_customer.save()
+        # The customer's name is shown on any cart they are attached to.
+        cartService.invalidate()
 
         message = "Customer updated successfully."
 
@@ -159,6 +165,7 @@ async def deleteCustomer(id):
     for cart in carts:
         cart.customerId = None
         await cart.save()
+        cartService.invalidate(cart.id)
 
     for transaction in transactions:
         transaction.customerId = None
@@ -407,10 +414,14 @@ async def saveCustomerItemReward(id, itemId, branchId, qty):
     branchItem = await BranchItem.get_or_none(itemId = itemId, branchId = branchId)
 
     loyaltyCustomer.itemId = branchItem.id
-    branchItem.quantity -= Decimal(qty)
+    deltas = {branchItem.id: -Decimal(str(qty))}
 
-    await loyaltyCustomer.save()
-    await branchItem.save()
+    async with in_transaction() as connection:
+        await loyaltyCustomer.save()
+        await stockService.lockStock(connection, list(deltas))
+        await stockService.applyStockDeltas(connection, deltas)
+
+    eventService.publish(eventService.STOCK_CHANGED, branchId)
 
     return create_response(True, "Picked Item Successfully", None, None), 200
 
@@ -421,10 +432,16 @@ async def changeReward(id, itemId, branchId, lastItemId, qty, lastQty):
     branchItem = await BranchItem.get_or_none(itemId = itemId, branchId = branchId)
 
     loyaltyCustomer.itemId = branchItem.id
-    branchItem.quantity -= Decimal(qty)
-    lastItem.quantity += Decimal(lastQty)
-    await loyaltyCustomer.save()
-    await branchItem.save()
-    await lastItem.save()
+    deltas = stockService.stockDeltas([
+        {"branchItemId": branchItem.id, "quantity": Decimal(str(qty))},
+        {"branchItemId": lastItem.id, "quantity": -Decimal(str(lastQty))}
+    ])
+
+    async with in_transaction() as connection:
+        await loyaltyCustomer.save()
+        await stockService.lockStock(connection, list(deltas))
+        await stockService.applyStockDeltas(connection, deltas)
+
+    eventService.publish(eventService.STOCK_CHANGED, branchId)
 
     return create_response(True, "Picked Item Successfully", None, None), 200
\ No newline at end of file
@@ -0,0 +1,26 @@
+TRANSACTION_CREATED = "transactionCreated"
+TRANSACTION_PAID = "transactionPaid"
+TRANSACTION_VOIDED = "transactionVoided"
+STOCK_CHANGED = "stockChanged"
+ITEM_CHANGED = "itemChanged"
+BRANCH_CHANGED = "branchChanged"
+
+TRANSACTION_EVENTS = (TRANSACTION_CREATED, TRANSACTION_PAID, TRANSACTION_VOIDED)
+
+_listeners = set()
+
+def subscribe(listener):
+    _listeners.add(listener)
+
+def unsubscribe(listener):
+    _listeners.discard(listener)
+
+def publish(event, branchId=None):
+    """Notifies in-process listeners after a write has been committed.
+
+    branchId is None for changes that are not tied to a single branch (warehouse stock)."""
+    for listener in list(_listeners):
+        try:
+            listener(event, branchId)
+        except Exception as e:
+            print(f"Event listener error on {event}: {e}")
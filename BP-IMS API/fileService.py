@@ -14,6 +14,7 @@ from reportlab.pdfbase import pdfmetrics
 from reportlab.pdfbase.ttfonts import TTFont
 from datetime import datetime, timedelta, timezone
 from tortoise import Tortoise
+from utils import day_range, days_range
 
 async def generate_receipt_pdf(transaction, transaction_items):
     buffer = BytesIO()
@@ -264,6 +265,11 @@ async def generate_sales_report_pdf(from_date_str, to_date_str, branch_id, branc
         
         now_sg = datetime.now(timezone.utc) + timedelta(hours=8)
         connection = Tortoise.get_connection('default')
+
+        from_date = datetime.strptime(from_date_str, '%Y-%m-%d').date()
+        to_date = datetime.strptime(to_date_str, '%Y-%m-%d').date()
+        dayStart, dayEnd = day_range(from_date)
+        rangeStart, rangeEnd = days_range(from_date, to_date)
         
         branch_filter = f"AND tr.branchId = {branch_id}" if branch_id != 0 else ""
         summary_query = f"""
@@ -280,9 +286,11 @@ async def generate_sales_report_pdf(from_date_str, to_date_str, branch_id, branc
                     SUM(ti.quantity * i.cost) AS item_cost
                 FROM transactionitems ti
                 JOIN items i ON ti.itemId = i.id
+                JOIN transactions rt ON rt.id = ti.transactionId
+                WHERE rt.transactionDate >= '{rangeStart}' AND rt.transactionDate < '{rangeEnd}'
                 GROUP BY ti.transactionId
             ) AS costs ON tr.id = costs.transactionId
-            WHERE DATE(tr.transactionDate) BETWEEN '{from_date_str}' AND '{to_date_str}'
+            WHERE tr.transactionDate >= '{rangeStart}' AND tr.transactionDate < '{rangeEnd}'
             AND tr.isVoided = 0
             AND tr.isPaid = 1
             {branch_filter}
@@ -296,7 +304,7 @@ async def generate_sales_report_pdf(from_date_str, to_date_str, branch_id, branc
                     HOUR(tr.transactionDate) AS hour,
                     COALESCE(SUM(tr.totalAmount), 0) AS totalAmount
                 FROM transactions tr
-                WHERE DATE(tr.transactionDate) = '{from_date_str}'
+                WHERE tr.transactionDate >= '{dayStart}' AND tr.transactionDate < '{dayEnd}'
                 AND HOUR(tr.transactionDate) BETWEEN 7 AND 17
                 AND tr.isVoided = 0 AND tr.isPaid = 1
                 {branch_filter}
@@ -310,7 +318,7 @@ async def generate_sales_report_pdf(from_date_str, to_date_str, branch_id, branc
                     DATE(tr.transactionDate) AS date,
                     COALESCE(SUM(tr.totalAmount), 0) AS totalAmount
                 FROM transactions tr
-                WHERE DATE(tr.transactionDate) BETWEEN '{from_date_str}' AND '{to_date_str}'
+                WHERE tr.transactionDate >= '{rangeStart}' AND tr.transactionDate < '{rangeEnd}'
                 AND tr.isVoided = 0 AND tr.isPaid = 1
                 {branch_filter}
                 GROUP BY DATE(tr.transactionDate)
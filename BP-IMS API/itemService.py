@@ -1,88 +1,97 @@
-from models import BranchItem, StockInput, Item, Branch, WareHouseItem, CartItems
+from models import BranchItem, StockInput, Item
 from utils import create_response, upload_media, delete_media
 from tortoise import Tortoise
+from tortoise.transactions import in_transaction
+import eventService
+import cacheService
+import searchService
+import codeService
+import cartService
+import provisionService
+import stockService
+import userService
+import pagination
 from decimal import Decimal
+from datetime import datetime, timedelta, timezone
 from werkzeug.utils import secure_filename
 from config import ITEM_IMAGES
 import os
 
+HOT_ITEMS_DAYS = 30
+
 """ GET METHODS """
-async def get_products(categoryId, branchId, page=1, search=""):
+async def get_products(categoryId, branchId, page=1, search="", hotDays=HOT_ITEMS_DAYS, cursor=None, countMode=pagination.COUNT_EXACT, fuzzy=False):
+    key = cacheService.cacheKey('getProducts', categoryId, branchId, cursor or page, search, (hotDays if categoryId == -1 else None, countMode, fuzzy))
+    try:
+        itemList, totalCount, nextCursor, hasMore = await cacheService.getOrLoad(key, lambda: loadProducts(categoryId, branchId, page, search, hotDays, cursor, countMode, fuzzy))
+    except pagination.CursorError:
+        return create_response(False, 'Invalid cursor'), 400
+
+    return create_response(True, 'Items Successfully Retrieved', itemList, None, totalCount, nextCursor, hasMore), 200
+
+async def loadProducts(categoryId, branchId, page, search, hotDays, cursor=None, countMode=pagination.COUNT_EXACT, fuzzy=False):
     pageSize = 30
     offset = (page - 1) * pageSize
     params = [branchId]
+    seek = None
+
+    select = """
+        i.id, 
+        i.name, 
+        COALESCE(i.categoryId, 0) AS categoryId, 
+        i.price, 
+        i.cost, 
+        i.isManaged, 
+        i.imagePath, 
+        bi.quantity,
+        i.sellByUnit,
+        bi.id as branchItemId
+    """
 
     if categoryId == -1:
-        sqlQuery = """
-            WITH HotItems AS (
-                SELECT 
-                    i.id, 
-                    i.name, 
-                    COALESCE(i.categoryId, 0) AS categoryId, 
-                    i.price, 
-                    i.cost, 
-                    i.isManaged, 
-                    i.imagePath, 
-                    bi.quantity,
-                    i.sellByUnit,
-                    COUNT(ti.itemId) AS total_sales,
-                    bi.id as branchItemId
-                FROM transactionitems ti
-                JOIN items i ON ti.itemId = i.id
-                JOIN transactions tr ON ti.transactionId = tr.id AND tr.isVoided = 0
-                JOIN branches b ON tr.branchId = b.id
-                JOIN branchitem bi ON bi.itemId = i.id AND bi.branchId = b.id
-                WHERE b.id = %s AND i.isManaged = 1
-                GROUP BY i.id, i.name, i.categoryId, i.price, i.cost, i.isManaged, i.imagePath, bi.quantity, i.sellByUnit, bi.id
-            )
-            SELECT * FROM HotItems 
-            ORDER BY total_sales DESC 
-            LIMIT %s OFFSET %s
+        now_sg = datetime.now(timezone.utc) + timedelta(hours=8)
+        params = [branchId, (now_sg - timedelta(days=hotDays)).date(), branchId]
+        select += ", h.total_sales"
+        fromWhere = """
+            FROM (
+                SELECT itemId, SUM(lineCount) AS total_sales
+                FROM item_sales_rollup
+                WHERE branchId = %s AND date >= %s
+                GROUP BY itemId
+                HAVING SUM(lineCount) > 0
+            ) h
+            JOIN items i ON h.itemId = i.id
+            JOIN branchitem bi ON bi.itemId = i.id AND bi.branchId = %s
+            WHERE i.isManaged = 1
         """
+        orderBy = "h.total_sales DESC, i.id"
     else:
-        sqlQuery = """
-            SELECT 
-                i.id, 
-                i.name, 
-                COALESCE(i.categoryId, 0) AS categoryId, 
-                i.price, 
-                i.cost, 
-                i.isManaged, 
-                i.imagePath, 
-                bi.quantity,
-                i.sellByUnit,
-                bi.id as branchItemId
+        fromWhere = """
             FROM items i
             LEFT JOIN branchitem bi ON i.id = bi.itemId
             WHERE bi.branchId = %s AND i.isManaged = 1
         """
 
         if categoryId != 0:
-            sqlQuery += " AND i.categoryId = %s"
+            fromWhere += " AND i.categoryId = %s"
             params.append(categoryId)
 
-        if search:
-            sqlQuery += " AND i.name LIKE %s"
-            params.append(f'%{search}%')
+        if cursor and not search:
+            seek = pagination.afterName(cursor, 'i.name', 'i.id')
+            offset = 0
 
-        sqlQuery += " ORDER BY i.name"
-        sqlQuery += " LIMIT %s OFFSET %s"
+        orderBy = "i.name, i.id"
 
-    params.extend([pageSize, offset])
+    countKey = cacheService.cacheKey('getProducts', categoryId, branchId, 'count', search, (hotDays if categoryId == -1 else None, fuzzy))
 
     connection = Tortoise.get_connection('default')
-    result = await connection.execute_query(sqlQuery, tuple(params))
-
-    countQuery = """
-        SELECT COUNT(*) 
-        FROM items i
-        LEFT JOIN branchitem bi ON i.id = bi.itemId
-        WHERE bi.branchId = %s AND i.isManaged = 1
-    """
-    totalCountResult = await connection.execute_query(countQuery, (branchId,))
-    totalCount = totalCountResult[1][0]['COUNT(*)']
-
-    items = result[1]
+    if search and categoryId != -1:
+        idsKey = cacheService.cacheKey('getProducts', categoryId, branchId, 'ids')
+        items, totalCount, hasMore, nextCursor = await pagination.fetchSearchPage(connection, select, fromWhere, params, search, pageSize, offset, cursor, countMode, idsKey, fuzzy)
+    else:
+        items, totalCount, hasMore = await pagination.fetchPage(connection, select, fromWhere, params, orderBy, pageSize, offset, seek, countMode, countKey)
+        # Hot Items are ranked by sales rather than name, so they only support page numbers.
+        nextCursor = pagination.nextCursor(items, hasMore, 'name') if categoryId != -1 else None
 
     itemList = [
         {
@@ -100,15 +109,17 @@ async def get_products(categoryId, branchId, page=1, search=""):
         for item in items
     ]
 
-    return create_response(True, 'Items Successfully Retrieved', itemList, None, totalCount), 200
+    return itemList, totalCount, nextCursor, hasMore
 
 
-async def getBranchStocks(categoryId, branchId, page=1, search=""):
+async def getBranchStocks(categoryId, branchId, page=1, search="", cursor=None, countMode=pagination.COUNT_EXACT):
     pageSize = 30
     offset = (page - 1) * pageSize
+    seek = None
 
-    sqlQuery = """
-        SELECT bi.id, i.name, bi.quantity, i.unitOfMeasure, i.storeCriticalValue, i.sellByUnit, i.whCriticalValue, wi.quantity as whQuantity, i.imagePath FROM items i 
+    select = "bi.id, i.name, bi.quantity, i.unitOfMeasure, i.storeCriticalValue, i.sellByUnit, i.whCriticalValue, wi.quantity as whQuantity, i.imagePath"
+    fromWhere = """
+        FROM items i 
         INNER JOIN branchitem bi ON bi.itemId = i.id
         INNER JOIN warehouseitems wi ON wi.itemId = i.id
         WHERE bi.branchId = %s AND i.isManaged = 1
@@ -116,30 +127,24 @@ async def getBranchStocks(categoryId, branchId, page=1, search=""):
     params = [branchId]
 
     if int(categoryId) == 1:
-        sqlQuery += " AND bi.quantity < i.storeCriticalValue"
-
-    if search:
-        sqlQuery += " AND i.name LIKE %s"
-        params.append(f'%{search}%')
+        fromWhere += " AND bi.quantity < i.storeCriticalValue"
 
-    sqlQuery += " ORDER BY i.name"
-    sqlQuery += " LIMIT %s OFFSET %s"
-    params.extend([pageSize, offset])
+    countKey = cacheService.cacheKey('getBranchStocks', int(categoryId), branchId, 'count', search)
 
     connection = Tortoise.get_connection('default')
-    result = await connection.execute_query(sqlQuery, tuple(params))
-
-    countQuery = """
-        SELECT COUNT(*) 
-        FROM items i
-        INNER JOIN branchitem bi ON bi.itemId = i.id
-        INNER JOIN warehouseitems wi ON wi.itemId = i.id
-        WHERE bi.branchId = %s AND i.isManaged = 1
-    """
-    totalCountResult = await connection.execute_query(countQuery, (branchId,))
-    totalCount = totalCountResult[1][0]['COUNT(*)']
-
-    items = result[1]
+    try:
+        if search:
+            idsKey = cacheService.cacheKey('getBranchStocks', int(categoryId), branchId, 'ids')
+            items, totalCount, hasMore, nextCursor = await pagination.fetchSearchPage(
+                connection, select, fromWhere, params, search, pageSize, offset, cursor, countMode, idsKey, rowIdColumn='bi.id')
+        else:
+            if cursor:
+                seek = pagination.afterName(cursor, 'i.name', 'bi.id')
+                offset = 0
+            items, totalCount, hasMore = await pagination.fetchPage(connection, select, fromWhere, params, "i.name, bi.id", pageSize, offset, seek, countMode, countKey)
+            nextCursor = pagination.nextCursor(items, hasMore, 'name')
+    except pagination.CursorError:
+        return create_response(False, 'Invalid cursor'), 400
 
     itemList = [
         {
@@ -155,7 +160,7 @@ async def getBranchStocks(categoryId, branchId, page=1, search=""):
         }
         for item in items
     ]
-    return create_response(True, 'Items Successfully Retrieved', itemList, None, totalCount), 200
+    return create_response(True, 'Items Successfully Retrieved', itemList, None, totalCount, nextCursor, hasMore), 200
 
 async def getStockHistory(itemId):
     sqlQuery = """
@@ -193,24 +198,36 @@ async def getStockHistory(itemId):
 
     return create_response(True, 'Items Successfully Retrieved', itemList, None, totalCount), 200
 
-async def getProductsHQ(categoryId, page=1, search=""):
+async def getProductsHQ(categoryId, page=1, search="", cursor=None, countMode=pagination.COUNT_EXACT, fuzzy=False):
+    key = cacheService.cacheKey('getProductsHQ', categoryId, None, cursor or page, search, (countMode, fuzzy))
+    try:
+        itemList, totalCount, nextCursor, hasMore = await cacheService.getOrLoad(key, lambda: loadProductsHQ(categoryId, page, search, cursor, countMode, fuzzy))
+    except pagination.CursorError:
+        return create_response(False, 'Invalid cursor'), 400
+
+    return create_response(True, 'Items Successfully Retrieved', itemList, None, totalCount, nextCursor, hasMore), 200
+
+async def loadProductsHQ(categoryId, page, search, cursor=None, countMode=pagination.COUNT_EXACT, fuzzy=False):
     pageSize = 30
     offset = (page - 1) * pageSize
-
-    sqlQuery = """
-        SELECT 
-            i.id, 
-            i.name, 
-            i.categoryId, 
-            i.price, 
-            i.cost, 
-            i.isManaged, 
-            i.imagePath, 
-            i.sellByUnit,
-            i.storeCriticalValue,
-            c.name as categoryName,
-            i.whCriticalValue,
-            i.unitOfMeasure
+    seek = None
+
+    select = """
+        i.id, 
+        i.name, 
+        i.categoryId, 
+        i.price, 
+        i.cost, 
+        i.isManaged, 
+        i.imagePath, 
+        i.sellByUnit,
+        i.storeCriticalValue,
+        c.name as categoryName,
+        i.whCriticalValue,
+        i.unitOfMeasure,
+        i.code
+    """
+    fromWhere = """
         FROM items i
         LEFT JOIN categories c on c.Id = i.categoryId
         WHERE i.isManaged = 1
@@ -219,28 +236,22 @@ async def getProductsHQ(categoryId, page=1, search=""):
     params = []
 
     if categoryId != 0 and categoryId != -1:
-        sqlQuery += " AND i.categoryId = %s"
+        fromWhere += " AND i.categoryId = %s"
         params.append(categoryId)
 
-    if search:
-        sqlQuery += " AND i.name LIKE %s"
-        params.append(f'%{search}%')
-    sqlQuery += " ORDER BY i.name"
-    sqlQuery += " LIMIT %s OFFSET %s"
-    params.extend([pageSize, offset])
-
-    connection = Tortoise.get_connection('default')
-    result = await connection.execute_query(sqlQuery, tuple(params))
+    if cursor and not search:
+        seek = pagination.afterName(cursor, 'i.name', 'i.id')
+        offset = 0
 
-    countQuery = """
-        SELECT COUNT(*) 
-        FROM items i
-        WHERE i.isManaged = 1
-    """
-    totalCountResult = await connection.execute_query(countQuery)
-    totalCount = totalCountResult[1][0]['COUNT(*)']
+    countKey = cacheService.cacheKey('getProductsHQ', categoryId, None, 'count', search, fuzzy)
 
-    items = result[1]
+    connection = Tortoise.get_connection('default')
+    if search:
+        idsKey = cacheService.cacheKey('getProductsHQ', categoryId, None, 'ids')
+        items, totalCount, hasMore, nextCursor = await pagination.fetchSearchPage(connection, select, fromWhere, params, search, pageSize, offset, cursor, countMode, idsKey, fuzzy)
+    else:
+        items, totalCount, hasMore = await pagination.fetchPage(connection, select, fromWhere, params, "i.name, i.id", pageSize, offset, seek, countMode, countKey)
+        nextCursor = pagination.nextCursor(items, hasMore, 'name')
 
     itemList = [
         {
@@ -255,14 +266,24 @@ async def getProductsHQ(categoryId, page=1, search=""):
             "storeCriticalValue": item['storeCriticalValue'],
             "categoryName":item['categoryName'],
             "whCriticalValue":item['whCriticalValue'],
-            "unitOfMeasure":item['unitOfMeasure']
+            "unitOfMeasure":item['unitOfMeasure'],
+            "code": item['code']
         }
         for item in items
     ]
 
-    return create_response(True, 'Items Successfully Retrieved', itemList, None, totalCount), 200
+    return itemList, totalCount, nextCursor, hasMore
 
 async def getProductHQ(itemId):
+    key = cacheService.cacheKey('getProductHQ', extra=itemId)
+    formatted_item = await cacheService.getOrLoad(key, lambda: loadProductHQ(itemId))
+
+    if not formatted_item:
+        return create_response(False, "Item not found", None), 404
+
+    return create_response(True, "Item Successfully Retrieved", formatted_item), 200
+
+async def loadProductHQ(itemId):
     sqlQuery = """
         SELECT 
             i.id, 
@@ -276,7 +297,8 @@ async def getProductHQ(itemId):
             i.storeCriticalValue,
             c.name as categoryName,
             i.whCriticalValue,
-            i.unitOfMeasure
+            i.unitOfMeasure,
+            i.code
         FROM items i
         LEFT JOIN categories c ON c.Id = i.categoryId
         WHERE i.id = %s
@@ -291,7 +313,7 @@ async def getProductHQ(itemId):
     items = result[1]
 
     if not items:
-        return create_response(False, "Item not found", None), 404
+        return None
 
     item = items[0]
 
@@ -307,30 +329,66 @@ async def getProductHQ(itemId):
         "storeCriticalValue": item['storeCriticalValue'],
         "categoryName": item['categoryName'],
         "whCriticalValue": item['whCriticalValue'],
-        "unitOfMeasure": item['unitOfMeasure']
+        "unitOfMeasure": item['unitOfMeasure'],
+        "code": item['code']
     }
 
-    return create_response(True, "Item Successfully Retrieved", formatted_item), 200
+    return formatted_item
 
 async def createStockInput(stockInput):
-    branchItem = await BranchItem.get_or_none(id=stockInput['branchItemId'])
-    whItem = await WareHouseItem.get_or_none(itemId = branchItem.itemId)
+    return await createStockInputs([stockInput])
+
+async def createStockInputs(stockInputs):
+    """Receives a branch delivery manifest, moving each line's qty from the warehouse into the branch.
+
+    Every branchItemId is checked in one query and the whole manifest is applied in one
+    transaction, so either every line is received or none is."""
+    if not stockInputs:
+        return create_response(False, 'No stock inputs', None, None), 400
+
+    lines = [{**stockInput, "branchItemId": int(stockInput['branchItemId']), "qty": Decimal(str(stockInput['qty']))} for stockInput in stockInputs]
+    branchItemIds = sorted({line['branchItemId'] for line in lines})
+    placeholders = ", ".join(["%s"] * len(branchItemIds))
+
+    async with in_transaction() as connection:
+        rows = await connection.execute_query_dict(f"""
+            SELECT bi.id, bi.branchId, wh.id AS whItemId
+            FROM branchitem bi
+            LEFT JOIN warehouseitems wh ON wh.itemId = bi.itemId
+            WHERE bi.id IN ({placeholders})
+        """, branchItemIds)
+        branchItems = {row['id']: row for row in rows if row['whItemId'] is not None}
+
+        missing = [branchItemId for branchItemId in branchItemIds if branchItemId not in branchItems]
+        if missing:
+            return create_response(False, 'Item not found', missing, None), 200
+
+        for line in lines:
+            line['whItemId'] = branchItems[line['branchItemId']]['whItemId']
+        branchDeltas = stockService.stockDeltas(lines, 1, quantityKey='qty')
+        whDeltas = stockService.stockDeltas(lines, -1, 'whItemId', 'qty')
+
+        # Branch rows before warehouse rows, each in id order, like every other stock move.
+        await stockService.lockStock(connection, list(branchDeltas))
+        await stockService.lockStock(connection, list(whDeltas), "warehouseitems")
+
+        await StockInput.bulk_create([
+            StockInput(
+                qty=line['qty'],
+                deliveryDate=line['deliveryDate'],
+                deliveredBy=line['deliveredBy'],
+                expectedQty=line['expectedTotalQty'],
+                actualQty=line['actualTotalQty'],
+                branchItemId=line['branchItemId']
+            )
+            for line in lines
+        ])
 
-    if not branchItem:
-        return create_response(False, 'Item not found', None, None), 200
+        await stockService.applyStockDeltas(connection, branchDeltas)
+        await stockService.applyStockDeltas(connection, whDeltas, table="warehouseitems")
 
-    await StockInput.create(
-        qty=stockInput['qty'],
-        deliveryDate=stockInput['deliveryDate'],
-        deliveredBy=stockInput['deliveredBy'],
-        expectedQty=stockInput['expectedTotalQty'],
-        actualQty=stockInput['actualTotalQty'],
-        branchItemId=branchItem.id
-    )
-    branchItem.quantity += Decimal(str(stockInput['qty']))
-    whItem.quantity -= Decimal(str(stockInput['qty']))
-    await branchItem.save()
-    await whItem.save()
+    for branchId in {branchItems[branchItemId]['branchId'] for branchItemId in branchItemIds}:
+        eventService.publish(eventService.STOCK_CHANGED, branchId)
     
     return create_response(True, "Success", None, None), 200
 
@@ -349,34 +407,31 @@ async def saveItem(data, file):
 
     whCriticalValue = data.get('whCriticalValue')
     unitOfMeasure = data.get('unitOfMeasure')
+    # Forms that predate item codes leave the field out, which keeps the item's current code.
+    hasCode = 'code' in data
+    code = (data.get('code') or "").strip() or None
+    cartIds = []
+
+    if code is not None and await Item.filter(code=code).exclude(id=itemId).exists():
+        return create_response(False, "Code is already used by another item."), 409
 
     if itemId == 0:
-        item = await Item.create(
-            categoryId=categoryId,
-            price=price,
-            cost=cost,
-            storeCriticalValue= storeCriticalValue,
-            name = name,
-            sellByUnit = sellByUnit,
-            unitOfMeasure = unitOfMeasure,
-            isManaged = True,
-            whCriticalValue = whCriticalValue
-        )
-        itemId = item.id
-
-        branchItems = await Branch.all()
-
-        for branch in branchItems:
-            await BranchItem.create(
-                itemId = itemId,
-                branchId = branch.id,
-                quantity = 0.00
+        async with in_transaction() as connection:
+            item = await Item.create(
+                categoryId=categoryId,
+                price=price,
+                cost=cost,
+                storeCriticalValue= storeCriticalValue,
+                name = name,
+                sellByUnit = sellByUnit,
+                unitOfMeasure = unitOfMeasure,
+                isManaged = True,
+                whCriticalValue = whCriticalValue,
+                code = code
             )
-        
-        await WareHouseItem.create(
-            itemId = itemId,
-            quantity = 0.00
-        )
+            itemId = item.id
+
+            await provisionService.provisionItem(connection, itemId)
 
         message = "Item added successfully."
 
@@ -393,15 +448,28 @@ async def saveItem(data, file):
         existing_item.sellByUnit = sellByUnit
         existing_item.unitOfMeasure = unitOfMeasure
         existing_item.whCriticalValue = whCriticalValue
-
-        cartItems = await CartItems.all()
-
-        for i in cartItems:
-            branchItem = await BranchItem.get_or_none(id = i.branchItemId)
-            if(branchItem.itemId == existing_item.id):
-                await i.delete()
-                
-        await existing_item.save()
+        if hasCode:
+            existing_item.code = code
+
+        async with in_transaction() as connection:
+            carts = await connection.execute_query_dict("""
+                SELECT DISTINCT ci.cartId
+                FROM cartitems ci
+                INNER JOIN branchitem bi ON bi.id = ci.branchItemId
+                WHERE bi.itemId = %s
+                FOR UPDATE
+            """, [existing_item.id])
+            cartIds = [cart['cartId'] for cart in carts]
+
+            # Drop the edited item from every cart, then reprice those carts from their remaining lines.
+            await connection.execute_query("""
+                DELETE ci
+                FROM cartitems ci
+                INNER JOIN branchitem bi ON bi.id = ci.branchItemId
+                WHERE bi.itemId = %s
+            """, [existing_item.id])
+            await existing_item.save()
+            await cartService.repriceCarts(connection, cartIds)
 
     if file is not None:
         file_name = secure_filename(file.filename)
@@ -412,7 +480,12 @@ async def saveItem(data, file):
         existing_item.imagePath = file_name  
         await existing_item.save()
 
-    return create_response(True, "Success", itemId, None), 200
+    searchService.addItem(itemId, name)
+    if hasCode:
+        codeService.setCode(itemId, code)
+    eventService.publish(eventService.ITEM_CHANGED)
+
+    return create_response(True, "Success", itemId, cartIds), 200
 
 async def deleteItem(id):
     item = await Item.get_or_none(id=id)
@@ -421,52 +494,65 @@ async def deleteItem(id):
         return create_response(False, "Item not found.", None, None), 200
 
     item.isManaged = False
+    # Free the code so it can be given to the item that replaces this one.
+    item.code = None
     if item.imagePath:
         result = delete_media(item.imageId)
         
     await item.save()
+
+    searchService.removeItem(item.id)
+    codeService.removeItem(item.id)
+    eventService.publish(eventService.ITEM_CHANGED)
     
     return create_response(True, "Item deleted successfully.", None, None), 200
 
-async def getStocksMonitor(categoryId, page=1, search=""):
+async def getMonitorBranchStocks(connection, itemIds):
+    """Returns the active branches and {itemId: {branchId: branchitem row}} for itemIds from one branchitem query.
+
+    The SQL is the same however many branches there are; the per-branch columns are pivoted here."""
+    branches = await userService.getActiveBranchList()
+    stocks = {itemId: {} for itemId in itemIds}
+    if not itemIds:
+        return branches, stocks
+
+    rows = await connection.execute_query_dict(f"""
+        SELECT bi.id, bi.itemId, bi.branchId, bi.quantity
+        FROM branchitem bi
+        INNER JOIN branches b ON b.id = bi.branchId AND b.isActive = 1
+        WHERE bi.itemId IN ({", ".join(["%s"] * len(itemIds))})
+    """, list(itemIds))
+    for row in rows:
+        stocks[row['itemId']][row['branchId']] = row
+
+    return branches, stocks
+
+# Items below their store critical value in at least one active branch.
+BRANCH_CRITICAL_CONDITION = """EXISTS (
+    SELECT 1
+    FROM branchitem cb
+    INNER JOIN branches b ON b.id = cb.branchId AND b.isActive = 1
+    WHERE cb.itemId = i.id AND cb.quantity < i.storeCriticalValue
+)"""
+
+async def getStocksMonitor(categoryId, page=1, search="", cursor=None):
     pageSize = 30
     offset = (page - 1) * pageSize
-
-    connection = Tortoise.get_connection('default')
-    branches = await connection.execute_query("SELECT id, name FROM branches WHERE isActive = 1")
-    branch_list = branches[1]
-    
-    branch_joins = []
-    branch_selects = []
-    branch_names = []
-    branch_ids = []
-    critical_conditions = []
-    
-    for branch in branch_list:
-        alias = f"b{branch['id']}"
-        branch_joins.append(f"LEFT JOIN branchitem {alias} on {alias}.itemId = i.id and {alias}.branchId = {branch['id']}")
-        branch_selects.append(f"{alias}.quantity as branch_{branch['id']}_qty")
-        branch_names.append(f"'Branch: {branch['name']}' as branch_{branch['id']}_name")
-        branch_ids.append(f"{alias}.Id as branch_{branch['id']}_id")
-        critical_conditions.append(f"{alias}.quantity < i.storeCriticalValue")
-
-    sqlQuery = f"""
-        SELECT 
-            i.id, 
-            i.name, 
-            {', '.join(branch_selects)},
-            {', '.join(branch_names)},
-            wh.quantity as whQty, 
-            "Warehouse" as whName,
-            i.sellByUnit, 
-            i.whCriticalValue, 
-            i.imagePath, 
-            i.storeCriticalValue, 
-            {', '.join(branch_ids)},
-            wh.Id as whId,
-            i.unitOfMeasure
+    seek = None
+
+    select = """
+        i.id, 
+        i.name, 
+        wh.quantity as whQty, 
+        i.sellByUnit, 
+        i.whCriticalValue, 
+        i.imagePath, 
+        i.storeCriticalValue, 
+        wh.Id as whId,
+        i.unitOfMeasure
+    """
+    fromWhere = """
         FROM items i 
-        {' '.join(branch_joins)}
         LEFT JOIN warehouseitems wh on wh.itemId = i.id
         WHERE i.isManaged = 1
     """
@@ -474,37 +560,25 @@ async def getStocksMonitor(categoryId, page=1, search=""):
     params = []
 
     if int(categoryId) == 1:
-        all_critical_conditions = " OR ".join(critical_conditions + ["wh.quantity < i.whCriticalValue"])
-        sqlQuery += f" AND ({all_critical_conditions})"
-
-    if search:
-        sqlQuery += " AND i.name LIKE %s"
-        params.append(f'%{search}%')
+        fromWhere += f" AND ({BRANCH_CRITICAL_CONDITION} OR wh.quantity < i.whCriticalValue)"
 
-    sqlQuery += " ORDER BY i.name"
-    sqlQuery += " LIMIT %s OFFSET %s"
-    params.extend([pageSize, offset])
+    countKey = cacheService.cacheKey('getStocksMonitor', int(categoryId), None, 'count', search)
 
-    result = await connection.execute_query(sqlQuery, tuple(params))
-
-    countQuery = f"""
-        SELECT COUNT(*) 
-        FROM items i 
-        {' '.join(branch_joins)}
-        LEFT JOIN warehouseitems wh on wh.itemId = i.id
-        WHERE i.isManaged = 1
-    """
-    
-    if int(categoryId) == 1:
-        countQuery += f" AND ({all_critical_conditions})"
-    
-    if search:
-        countQuery += " AND i.name LIKE %s"
-    
-    totalCountResult = await connection.execute_query(countQuery, tuple(params[:-2]))
-    totalCount = totalCountResult[1][0]['COUNT(*)']
+    connection = Tortoise.get_connection('default')
+    try:
+        if search:
+            idsKey = cacheService.cacheKey('getStocksMonitor', int(categoryId), None, 'ids')
+            items, totalCount, hasMore, nextCursor = await pagination.fetchSearchPage(connection, select, fromWhere, params, search, pageSize, offset, cursor, idsKey=idsKey)
+        else:
+            if cursor:
+                seek = pagination.afterName(cursor, 'i.name', 'i.id')
+                offset = 0
+            items, totalCount, hasMore = await pagination.fetchPage(connection, select, fromWhere, params, "i.name, i.id", pageSize, offset, seek, countKey=countKey)
+            nextCursor = pagination.nextCursor(items, hasMore, 'name')
+    except pagination.CursorError:
+        return create_response(False, 'Invalid cursor'), 400
+    branch_list, stocks = await getMonitorBranchStocks(connection, [item['id'] for item in items])
 
-    items = result[1]
     itemList = []
     
     for item in items:
@@ -512,7 +586,7 @@ async def getStocksMonitor(categoryId, page=1, search=""):
             "id": item['id'],
             "name": item['name'],
             "whQty": Decimal(item['whQty']),
-            "whName": item['whName'],
+            "whName": "Warehouse",
             "whCriticalValue": item['whCriticalValue'],
             "sellByUnit": bool(item['sellByUnit']),
             "imagePath": item['imagePath'],
@@ -523,91 +597,50 @@ async def getStocksMonitor(categoryId, page=1, search=""):
         }
         
         for branch in branch_list:
-            branch_id = branch['id']
+            branchItem = stocks[item['id']].get(branch['id'])
             item_data["branches"].append({
-                "id": item[f'branch_{branch_id}_id'],
-                "name": item[f'branch_{branch_id}_name'],
-                "quantity": Decimal(item[f'branch_{branch_id}_qty']),
-                "branchId": branch_id
+                "id": branchItem['id'] if branchItem else None,
+                "name": f"Branch: {branch['name']}",
+                "quantity": Decimal(branchItem['quantity']) if branchItem else Decimal(0),
+                "branchId": branch['id']
             })
         
         itemList.append(item_data)
 
-    return create_response(True, 'Items Successfully Retrieved', itemList, None, totalCount), 200
+    return create_response(True, 'Items Successfully Retrieved', itemList, None, totalCount, nextCursor), 200
 
 async def getWHStocksMonitor(categoryId, page=1, search=""):
     pageSize = 30
     offset = (page - 1) * pageSize
 
-    connection = Tortoise.get_connection('default')
-    branches = await connection.execute_query("SELECT id, name FROM branches WHERE isActive = 1")
-    branch_list = branches[1]
-    
-    branch_joins = []
-    branch_selects = []
-    branch_ids = []
-    critical_conditions = []
-    
-    for branch in branch_list:
-        alias = f"b{branch['id']}"
-        branch_joins.append(f"LEFT JOIN branchitem {alias} on {alias}.itemId = i.id and {alias}.branchId = {branch['id']}")
-        branch_selects.append(f"{alias}.quantity as branch_{branch['id']}_qty")
-        branch_selects.append(f"b{branch['id']}.branchId as branch_{branch['id']}_id")
-        branch_ids.append(f"{alias}.Id as branch_{branch['id']}_item_id")
-        critical_conditions.append(f"{alias}.quantity < i.storeCriticalValue")
-
-    sqlQuery = f"""
-        SELECT 
-            i.id, 
-            i.name, 
-            {', '.join(branch_selects)},
-            {', '.join(branch_ids)},
-            i.sellByUnit, 
-            i.imagePath, 
-            i.storeCriticalValue,
-            i.unitOfMeasure
+    select = """
+        i.id, 
+        i.name, 
+        i.sellByUnit, 
+        i.imagePath, 
+        i.storeCriticalValue,
+        i.unitOfMeasure
+    """
+    fromWhere = """
         FROM items i 
-        {' '.join(branch_joins)}
         WHERE i.isManaged = 1
     """
     
     params = []
 
     if int(categoryId) == 1:
-        all_critical_conditions = " OR ".join(critical_conditions)
-        sqlQuery += f" AND ({all_critical_conditions})"
-
-    if search:
-        sqlQuery += " AND i.name LIKE %s"
-        params.append(f'%{search}%')
-
-    sqlQuery += " ORDER BY i.name"
-    sqlQuery += " LIMIT %s OFFSET %s"
-    params.extend([pageSize, offset])
+        fromWhere += f" AND {BRANCH_CRITICAL_CONDITION}"
 
-    result = await connection.execute_query(sqlQuery, tuple(params))
-
-    countQuery = f"""
-        SELECT COUNT(*) 
-        FROM items i 
-        {' '.join(branch_joins)}
-        WHERE i.isManaged = 1
-    """
-    
-    if int(categoryId) == 1:
-        countQuery += f" AND ({all_critical_conditions})"
-    
+    connection = Tortoise.get_connection('default')
     if search:
-        countQuery += " AND i.name LIKE %s"
-    
-    totalCountResult = await connection.execute_query(countQuery, tuple(params[:-2]))
-    totalCount = totalCountResult[1][0]['COUNT(*)']
+        idsKey = cacheService.cacheKey('getWHStocksMonitor', int(categoryId), None, 'ids')
+        items, totalCount, _, _ = await pagination.fetchSearchPage(connection, select, fromWhere, params, search, pageSize, offset, idsKey=idsKey)
+    else:
+        items, totalCount, _ = await pagination.fetchPage(connection, select, fromWhere, params, "i.name, i.id", pageSize, offset)
+    branch_list, stocks = await getMonitorBranchStocks(connection, [item['id'] for item in items])
 
-    items = result[1]
     itemList = []
     
-    branch_name_map = {branch['id']: branch['name'] for branch in branch_list}
-    
     for item in items:
         item_data = {
             "id": item['id'],
@@ -620,12 +653,12 @@ async def getWHStocksMonitor(categoryId, page=1, search=""):
         }
         
         for branch in branch_list:
-            branch_id = branch['id']
+            branchItem = stocks[item['id']].get(branch['id'])
             item_data["branches"].append({
-                "id": item[f'branch_{branch_id}_item_id'],
-                "branchId": branch_id,
-                "name": branch_name_map[branch_id],
-                "quantity": Decimal(item[f'branch_{branch_id}_qty']) if item[f'branch_{branch_id}_qty'] is not None else Decimal(0)
+                "id": branchItem['id'] if branchItem else None,
+                "branchId": branch['id'],
+                "name": branch['name'],
+                "quantity": Decimal(branchItem['quantity']) if branchItem else Decimal(0)
             })
         
         itemList.append(item_data)
@@ -639,5 +672,7 @@ async def editStock(id, qty):
 
     branchItem.quantity = Decimal(str(qty))
     await branchItem.save()
+
+    eventService.publish(eventService.STOCK_CHANGED, branchItem.branchId)
     
     return create_response(True, "Success", None, None), 200
\ No newline at end of file
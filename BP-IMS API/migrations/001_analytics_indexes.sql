@@ -0,0 +1,14 @@
+-- Composite indexes backing the half-open transactionDate range predicates used by the
+-- dashboards and sales report (transactionDate >= start AND transactionDate < end).
+
+CREATE INDEX idx_transactions_branch_status_date
+    ON transactions (branchId, isVoided, isPaid, transactionDate);
+
+CREATE INDEX idx_transactions_exacon_status_date
+    ON transactions (isExacon, isVoided, isPaid, transactionDate);
+
+CREATE INDEX idx_transactions_date
+    ON transactions (transactionDate);
+
+CREATE INDEX idx_transactionitems_transaction
+    ON transactionitems (transactionId);
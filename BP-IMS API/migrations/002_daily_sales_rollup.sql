@@ -0,0 +1,19 @@
+-- Per-branch, per-day sales totals maintained by rollupService alongside every payment and void.
+-- hourlySales maps the hour of day ("7".."17") to that hour's gross sales.
+
+CREATE TABLE daily_sales_rollup (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    branchId INT NOT NULL,
+    date DATE NOT NULL,
+    isExacon TINYINT(1) NOT NULL DEFAULT 0,
+    grossSales DECIMAL(18,2) NOT NULL DEFAULT 0,
+    profit DECIMAL(18,2) NOT NULL DEFAULT 0,
+    discount DECIMAL(18,2) NOT NULL DEFAULT 0,
+    transactionCount INT NOT NULL DEFAULT 0,
+    hourlySales JSON NOT NULL,
+    UNIQUE KEY uid_daily_sales_rollup (branchId, date, isExacon),
+    INDEX idx_daily_sales_rollup_date (date)
+);
+
+-- Populate from existing history afterwards with:
+--     python rollupService.py
@@ -0,0 +1,17 @@
+-- Per-branch, per-day, per-item sales maintained by rollupService alongside daily_sales_rollup.
+-- The unique key leads with (branchId, date) so hot-item and top-item windows are index range scans.
+
+CREATE TABLE item_sales_rollup (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    branchId INT NOT NULL,
+    date DATE NOT NULL,
+    itemId INT NOT NULL,
+    quantity DECIMAL(18,2) NOT NULL DEFAULT 0,
+    amount DECIMAL(18,2) NOT NULL DEFAULT 0,
+    lineCount INT NOT NULL DEFAULT 0,
+    UNIQUE KEY uid_item_sales_rollup (branchId, date, itemId),
+    INDEX idx_item_sales_rollup_date (date, branchId)
+);
+
+-- Populate from existing history afterwards with:
+--     python rollupService.py
@@ -0,0 +1,8 @@
+-- Indexes that let cursor pagination seek straight to the next page.
+-- InnoDB appends the primary key to secondary indexes, so these also cover the id tie-breaker.
+
+CREATE INDEX idx_items_managed_name
+    ON items (isManaged, name);
+
+CREATE INDEX idx_transactions_branch_date
+    ON transactions (branchId, transactionDate);
@@ -0,0 +1,37 @@
+-- Per-branch, per-day slip counters used by checkoutService.generateSlipNo.
+-- Slips look like CC{branch:02d}-{mmddyy}-{no:03d}; the counter holds the last {no} issued.
+
+CREATE TABLE slip_sequences (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    branchId INT NOT NULL,
+    date DATE NOT NULL,
+    lastNo INT NOT NULL DEFAULT 0,
+    UNIQUE KEY uid_slip_sequences (branchId, date)
+);
+
+-- Start every counter after the highest slip already issued, so today's sequence carries on
+-- from the old count-based numbers.
+INSERT INTO slip_sequences (branchId, date, lastNo)
+SELECT
+    CAST(SUBSTRING(SUBSTRING_INDEX(slipNo, '-', 1), 3) AS UNSIGNED),
+    STR_TO_DATE(SUBSTRING_INDEX(SUBSTRING_INDEX(slipNo, '-', 2), '-', -1), '%m%d%y'),
+    MAX(CAST(SUBSTRING_INDEX(slipNo, '-', -1) AS UNSIGNED))
+FROM transactions
+WHERE slipNo LIKE 'CC%-%-%'
+GROUP BY 1, 2;
+
+-- The count-based allocator could hand two concurrent payments the same slip. Keep the first
+-- holder of each duplicate and suffix the others with their transaction id so the constraint
+-- below can be added; list them first with:
+--     SELECT slipNo, COUNT(*) FROM transactions GROUP BY slipNo HAVING COUNT(*) > 1;
+UPDATE transactions t
+JOIN (
+    SELECT slipNo, MIN(id) AS firstId
+    FROM transactions
+    GROUP BY slipNo
+    HAVING COUNT(*) > 1
+) d ON d.slipNo = t.slipNo AND t.id <> d.firstId
+SET t.slipNo = CONCAT(t.slipNo, '-', t.id);
+
+ALTER TABLE transactions
+    ADD CONSTRAINT uid_transactions_slipNo UNIQUE (slipNo);
@@ -0,0 +1,23 @@
+-- One cartitems row per branch item in a cart, so bulk adds can upsert with ON DUPLICATE KEY UPDATE.
+
+-- Fold any existing duplicate lines into the oldest row before adding the key.
+UPDATE cartitems c
+JOIN (
+    SELECT cartId, branchItemId, MIN(id) AS keepId, SUM(quantity) AS quantity
+    FROM cartitems
+    GROUP BY cartId, branchItemId
+    HAVING COUNT(*) > 1
+) d ON d.keepId = c.id
+SET c.quantity = d.quantity;
+
+DELETE c
+FROM cartitems c
+JOIN (
+    SELECT cartId, branchItemId, MIN(id) AS keepId
+    FROM cartitems
+    GROUP BY cartId, branchItemId
+    HAVING COUNT(*) > 1
+) d ON d.cartId = c.cartId AND d.branchItemId = c.branchItemId AND c.id <> d.keepId;
+
+ALTER TABLE cartitems
+    ADD CONSTRAINT uid_cartitems_cart_branchitem UNIQUE (cartId, branchItemId);
@@ -0,0 +1,5 @@
+-- The stock monitor reads every branch's row for a page of items (itemId IN (...)) and checks
+-- critical stock per item with EXISTS, both of which seek on itemId first.
+
+CREATE INDEX idx_branchitem_item_branch
+    ON branchitem (itemId, branchId);
@@ -0,0 +1,6 @@
+-- SKU / barcode per item, resolved by codeService and /scanItemToCart.
+-- NULL for items without a code; MySQL allows any number of NULLs under a unique key.
+
+ALTER TABLE items
+    ADD COLUMN code VARCHAR(64) NULL,
+    ADD CONSTRAINT uid_items_code UNIQUE (code);
@@ -42,9 +42,11 @@ class Item(Model):
     whCriticalValue = fields.DecimalField(max_digits=10, decimal_places=2, null=False)
     unitOfMeasure = fields.CharField(max_length=20, null=True)
     imageId = fields.CharField(max_length=255, null=True)
+    code = fields.CharField(max_length=64, null=True, unique=True)
 
     class Meta:
         table = "items"
+        indexes = (("isManaged", "name"),)
 
 class Category(Model):
     id = fields.IntField(pk=True)
@@ -72,13 +74,14 @@ class CartItems(Model):
 
     class Meta:
         table = "cartitems"
+        unique_together = ("cartId", "branchItemId")
 
 class Transaction(Model):
     id = fields.IntField(pk=True)
     amountReceived = fields.DecimalField(max_digits=18, decimal_places=2, null=False)
     totalAmount = fields.DecimalField(max_digits=18, decimal_places=2, null=False)
     cashierId = fields.IntField(null=False)
-    slipNo = fields.CharField(max_length=255, null=False)
+    slipNo = fields.CharField(max_length=255, null=False, unique=True)
     transactionDate = fields.DatetimeField(null=False)
     customerId = fields.CharField(max_length=500, null=True)
     branchId = fields.IntField(null=False)
@@ -91,6 +94,12 @@ class Transaction(Model):
 
     class Meta:
         table = "transactions"
+        indexes = (
+            ("branchId", "isVoided", "isPaid", "transactionDate"),
+            ("isExacon", "isVoided", "isPaid", "transactionDate"),
+            ("transactionDate",),
+            ("branchId", "transactionDate"),
+        )
 
 class TransactionItem(Model):
     id = fields.IntField(pk=True)
@@ -101,6 +110,7 @@ class TransactionItem(Model):
 
     class Meta:
         table = "transactionitems"
+        indexes = (("transactionId",),)
 
 class Customer(Model):
     id = fields.IntField(pk=True)
@@ -125,6 +135,7 @@ class BranchItem(Model):
     class Meta:
         table = "branchitem"
         unique_together = ("branchId", "itemId")
+        indexes = (("itemId", "branchId"),)
 
 class StockInput(Model):
     id = fields.IntField(null=False, pk=True)
@@ -231,4 +242,42 @@ class LoyaltyCustomer(Model):
     itemId = fields.IntField(null=True)
     
     class Meta:
-        table = "loyaltycustomers"
\ No newline at end of file
+        table = "loyaltycustomers"
+
+class DailySalesRollup(Model):
+    id = fields.IntField(pk=True)
+    branchId = fields.IntField(null=False)
+    date = fields.DateField(null=False)
+    isExacon = fields.BooleanField(null=False, default=False)
+    grossSales = fields.DecimalField(max_digits=18, decimal_places=2, null=False, default=0)
+    profit = fields.DecimalField(max_digits=18, decimal_places=2, null=False, default=0)
+    discount = fields.DecimalField(max_digits=18, decimal_places=2, null=False, default=0)
+    transactionCount = fields.IntField(null=False, default=0)
+    hourlySales = fields.JSONField(null=False)
+
+    class Meta:
+        table = "daily_sales_rollup"
+        unique_together = ("branchId", "date", "isExacon")
+
+class ItemSalesRollup(Model):
+    id = fields.IntField(pk=True)
+    branchId = fields.IntField(null=False)
+    date = fields.DateField(null=False)
+    itemId = fields.IntField(null=False)
+    quantity = fields.DecimalField(max_digits=18, decimal_places=2, null=False, default=0)
+    amount = fields.DecimalField(max_digits=18, decimal_places=2, null=False, default=0)
+    lineCount = fields.IntField(null=False, default=0)
+
+    class Meta:
+        table = "item_sales_rollup"
+        unique_together = ("branchId", "date", "itemId")
+
+class SlipSequence(Model):
+    id = fields.IntField(pk=True)
+    branchId = fields.IntField(null=False)
+    date = fields.DateField(null=False)
+    lastNo = fields.IntField(null=False, default=0)
+
+    class Meta:
+        table = "slip_sequences"
+        unique_together = ("branchId", "date")
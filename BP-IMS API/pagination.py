@@ -0,0 +1,147 @@
+import base64
+import binascii
+import json
+from datetime import datetime
+import cacheService
+import searchService
+
+COUNT_EXACT = "exact"
+COUNT_CACHED = "cached"
+COUNT_HAS_MORE = "hasMore"
+COUNT_MODES = (COUNT_EXACT, COUNT_CACHED, COUNT_HAS_MORE)
+
+class CursorError(ValueError):
+    pass
+
+def encodeCursor(values):
+    payload = json.dumps([value.isoformat() if isinstance(value, datetime) else value for value in values])
+    return base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii')
+
+def decodeCursor(cursor):
+    """Returns the (sort value, id) pair stored in cursor, raising CursorError if it was not issued by encodeCursor."""
+    try:
+        value, lastId = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+        return value, int(lastId)
+    except (binascii.Error, UnicodeError, ValueError, TypeError):
+        raise CursorError("Invalid cursor")
+
+def afterName(cursor, nameColumn, idColumn):
+    """Seeks past the last row of an ascending (name, id) listing."""
+    name, lastId = decodeCursor(cursor)
+    return f"({nameColumn} > %s OR ({nameColumn} = %s AND {idColumn} > %s))", [name, name, lastId]
+
+def beforeDate(cursor, dateColumn, idColumn):
+    """Seeks past the last row of a descending (date, id) listing."""
+    date, lastId = decodeCursor(cursor)
+    try:
+        date = datetime.fromisoformat(date)
+    except (TypeError, ValueError):
+        raise CursorError("Invalid cursor")
+    return f"({dateColumn} < %s OR ({dateColumn} = %s AND {idColumn} < %s))", [date, date, lastId]
+
+def afterRank(cursor):
+    """Returns the searchService.pageIds (tier, name, itemId) position a search cursor points at."""
+    value, itemId = decodeCursor(cursor)
+    try:
+        tier, name = value
+    except (TypeError, ValueError):
+        raise CursorError("Invalid cursor")
+    if not isinstance(tier, int) or not isinstance(name, str):
+        raise CursorError("Invalid cursor")
+    return tier, name, itemId
+
+def nextCursor(rows, hasMore, sortKey, idKey='id'):
+    """Returns the cursor for the page after rows, or None when rows was the last page."""
+    if not hasMore or not rows:
+        return None
+
+    last = rows[-1]
+    return encodeCursor([last[sortKey], last[idKey]])
+
+def countMode(value):
+    return value if value in COUNT_MODES else COUNT_EXACT
+
+async def countRows(connection, fromWhere, params, countKey=None):
+    async def load():
+        result = await connection.execute_query_dict(f"SELECT COUNT(*) AS totalCount {fromWhere}", list(params))
+        return result[0]["totalCount"]
+
+    if countKey is None:
+        return await load()
+    return await cacheService.getOrLoad(countKey, load)
+
+async def fetchPage(connection, select, fromWhere, params, orderBy, pageSize, offset=0, seek=None, mode=COUNT_EXACT, countKey=None):
+    """Runs one page of a listing and returns (rows, totalCount, hasMore).
+
+    fromWhere holds the FROM/JOIN/WHERE clauses with every filter applied, so the total always
+    matches the rows being paged. seek is an (condition, params) pair from afterName/beforeDate.
+    One extra row is fetched to work out hasMore; COUNT_HAS_MORE stops there and returns
+    totalCount None, COUNT_EXACT reads COUNT(*) OVER() from the first page and stores it under
+    countKey for the cursor pages that follow, and COUNT_CACHED reuses the filtered count stored
+    under countKey."""
+    windowCount = mode == COUNT_EXACT and seek is None
+    pageQuery = f"SELECT {select}{', COUNT(*) OVER() AS totalCount' if windowCount else ''} {fromWhere}"
+    pageParams = list(params)
+
+    if seek is not None:
+        pageQuery += f" AND {seek[0]}"
+        pageParams.extend(seek[1])
+
+    pageQuery += f" ORDER BY {orderBy} LIMIT %s OFFSET %s"
+    pageParams.extend([pageSize + 1, offset])
+
+    rows = await connection.execute_query_dict(pageQuery, pageParams)
+    hasMore = len(rows) > pageSize
+    rows = rows[:pageSize]
+
+    if mode == COUNT_HAS_MORE:
+        return rows, None, hasMore
+
+    if windowCount and (rows or offset == 0):
+        totalCount = rows[0]["totalCount"] if rows else 0
+        if countKey is not None:
+            cacheService.put(countKey, totalCount)
+    else:
+        # Past the last page, or seeking with a cursor, the window count no longer covers the whole listing,
+        # so reuse the count from the first page (or count once and keep it) instead of a COUNT(*) per page.
+        totalCount = await countRows(connection, fromWhere, params, countKey)
+
+    return rows, totalCount, hasMore
+
+async def fetchSearchPage(connection, select, fromWhere, params, search, pageSize, offset=0, cursor=None, mode=COUNT_EXACT, idsKey=None, fuzzy=False, idColumn='i.id', rowIdColumn=None):
+    """Runs one page of a listing limited to items whose name matches search (or is close to it when
+    fuzzy is set) and returns (rows, totalCount, hasMore, nextCursor).
+
+    The ids the listing's own filters let through do not depend on the search, so they are read once
+    and kept under idsKey. The index then counts and ranks the matches among them, and only the
+    page's ids go to MySQL; cursors seek on the rank. Falls back to a name LIKE ordered by (name,
+    rowIdColumn) when the index cannot answer: not built in this process, or search is only punctuation."""
+    tiers = searchService.rankTiers(search, fuzzy)
+    if tiers is None:
+        rowIdColumn = rowIdColumn or idColumn
+        seek = afterName(cursor, 'i.name', rowIdColumn) if cursor else None
+        rows, totalCount, hasMore = await fetchPage(connection, select, f"{fromWhere} AND i.name LIKE %s", [*params, f'%{search}%'],
+                                                    f"i.name, {rowIdColumn}", pageSize, 0 if cursor else offset, seek, mode)
+        return rows, totalCount, hasMore, nextCursor(rows, hasMore, 'name')
+
+    async def loadIds():
+        rows = await connection.execute_query_dict(f"SELECT {idColumn} AS id {fromWhere}", list(params))
+        return frozenset(row['id'] for row in rows)
+
+    allowed = await cacheService.getOrLoad(idsKey, loadIds) if idsKey is not None else await loadIds()
+    tiers = [(ids & allowed, ordered) for ids, ordered in tiers]
+    positions = searchService.pageIds(tiers, pageSize + 1, 0 if cursor else offset, afterRank(cursor) if cursor else None)
+    hasMore = len(positions) > pageSize
+    positions = positions[:pageSize]
+
+    rows = []
+    if positions:
+        ranks = {itemId: rank for rank, (_, _, itemId) in enumerate(positions)}
+        rows = await connection.execute_query_dict(
+            f"SELECT {select}, {idColumn} AS searchItemId {fromWhere} AND {idColumn} IN ({', '.join(['%s'] * len(ranks))})",
+            [*params, *ranks])
+        rows.sort(key=lambda row: ranks[row['searchItemId']])
+
+    totalCount = None if mode == COUNT_HAS_MORE else sum(len(ids) for ids, _ in tiers)
+    last = positions[-1] if hasMore else None
+    return rows, totalCount, hasMore, encodeCursor([[last[0], last[1]], last[2]]) if last else None
@@ -0,0 +1,22 @@
+async def provisionItem(connection, itemId):
+    """Gives a new item an empty branchitem row in every branch and an empty warehouse row.
+
+    Each is a single statement however many branches there are. Call inside the same
+    in_transaction() that creates the item, so an item never exists without its stock rows."""
+    rowcount, _ = await connection.execute_query("""
+        INSERT INTO branchitem (branchId, itemId, quantity)
+        SELECT b.id, %s, 0
+        FROM branches b
+    """, [itemId])
+    await connection.execute_query("INSERT INTO warehouseitems (itemId, quantity) VALUES (%s, 0)", [itemId])
+    return rowcount
+
+async def provisionBranch(connection, branchId):
+    """Gives a new branch an empty branchitem row for every managed item in a single INSERT ... SELECT."""
+    rowcount, _ = await connection.execute_query("""
+        INSERT INTO branchitem (branchId, itemId, quantity)
+        SELECT %s, i.id, 0
+        FROM items i
+        WHERE i.isManaged = 1
+    """, [branchId])
+    return rowcount
@@ -0,0 +1,182 @@
+from tortoise import Tortoise
+from tortoise.transactions import in_transaction
+from datetime import date
+
+async def addTransaction(transaction, sign=1):
+    """Adds a paid transaction to daily_sales_rollup and item_sales_rollup, or removes it when sign is -1.
+
+    Must be awaited inside the same in_transaction() block as the write that changes the
+    transaction (after its transaction items exist), so the rollups never drift from the
+    transactions table."""
+    connection = Tortoise.get_connection('default')
+    transactionDate = transaction.transactionDate
+    hour = transactionDate.hour
+    grossSales = transaction.totalAmount * sign
+    profit = transaction.profit * sign
+    discount = (transaction.discount or 0) * sign
+
+    query = f"""
+        INSERT INTO daily_sales_rollup (branchId, date, isExacon, grossSales, profit, discount, transactionCount, hourlySales)
+        VALUES (%s, %s, %s, %s, %s, %s, %s, JSON_OBJECT('{hour}', %s))
+        ON DUPLICATE KEY UPDATE
+            grossSales = grossSales + VALUES(grossSales),
+            profit = profit + VALUES(profit),
+            discount = discount + VALUES(discount),
+            transactionCount = transactionCount + VALUES(transactionCount),
+            hourlySales = JSON_SET(hourlySales, '$."{hour}"', COALESCE(JSON_EXTRACT(hourlySales, '$."{hour}"'), 0) + %s)
+    """
+    await connection.execute_query(query, [
+        transaction.branchId,
+        transactionDate.date(),
+        transaction.isExacon,
+        grossSales,
+        profit,
+        discount,
+        sign,
+        grossSales,
+        grossSales
+    ])
+
+    itemQuery = """
+        INSERT INTO item_sales_rollup (branchId, date, itemId, quantity, amount, lineCount)
+        SELECT %s, %s, ti.itemId, SUM(ti.quantity) * %s, SUM(ti.amount) * %s, COUNT(*) * %s
+        FROM transactionitems ti
+        WHERE ti.transactionId = %s
+        GROUP BY ti.itemId
+        ON DUPLICATE KEY UPDATE
+            quantity = quantity + VALUES(quantity),
+            amount = amount + VALUES(amount),
+            lineCount = lineCount + VALUES(lineCount)
+    """
+    await connection.execute_query(itemQuery, [
+        transaction.branchId,
+        transactionDate.date(),
+        sign,
+        sign,
+        sign,
+        transaction.id
+    ])
+
+async def removeTransaction(transaction):
+    await addTransaction(transaction, sign=-1)
+
+async def getGrossSales(fromDate, toDate, branchId=None, isExacon=None):
+    """Sums grossSales for rollup days in [fromDate, toDate)."""
+    connection = Tortoise.get_connection('default')
+    query = """
+        SELECT SUM(grossSales) AS totalSales
+        FROM daily_sales_rollup
+        WHERE date >= %s AND date < %s
+    """
+    params = [fromDate, toDate]
+
+    if branchId is not None:
+        query += " AND branchId = %s"
+        params.append(branchId)
+    if isExacon is not None:
+        query += " AND isExacon = %s"
+        params.append(isExacon)
+
+    result = await connection.execute_query_dict(query, params)
+    return result[0]["totalSales"] if result and result[0]["totalSales"] else 0
+
+async def getTopItems(fromDate, toDate, limit=5):
+    """Returns each active branch's top items by sales amount for days in [fromDate, toDate)."""
+    connection = Tortoise.get_connection('default')
+    query = """
+        WITH ItemTotals AS (
+            SELECT branchId, itemId, SUM(amount) AS totalSales
+            FROM item_sales_rollup
+            WHERE date >= %s AND date < %s
+            GROUP BY branchId, itemId
+            HAVING SUM(amount) > 0
+        ),
+        RankedItems AS (
+            SELECT
+                branchId,
+                itemId,
+                totalSales,
+                ROW_NUMBER() OVER (PARTITION BY branchId ORDER BY totalSales DESC) AS `rank`
+            FROM ItemTotals
+        )
+        SELECT b.name AS branchName, i.name AS itemName, r.totalSales
+        FROM RankedItems r
+        JOIN branches b ON b.id = r.branchId AND b.isActive = 1
+        JOIN items i ON i.id = r.itemId
+        WHERE r.`rank` <= %s
+        ORDER BY r.branchId, r.`rank`
+    """
+    return await connection.execute_query_dict(query, [fromDate, toDate, limit])
+
+async def rebuild(fromDate=None):
+    """Recomputes both rollups from paid, non-voided transactions, optionally from fromDate onwards."""
+    dateFilter = "AND transactionDate >= %s" if fromDate else ""
+    itemDateFilter = "AND tr.transactionDate >= %s" if fromDate else ""
+    params = [fromDate] if fromDate else []
+
+    async with in_transaction() as connection:
+        if fromDate:
+            await connection.execute_query("DELETE FROM daily_sales_rollup WHERE date >= %s", params)
+            await connection.execute_query("DELETE FROM item_sales_rollup WHERE date >= %s", params)
+        else:
+            await connection.execute_query("DELETE FROM daily_sales_rollup")
+            await connection.execute_query("DELETE FROM item_sales_rollup")
+
+        query = f"""
+            INSERT INTO daily_sales_rollup (branchId, date, isExacon, grossSales, profit, discount, transactionCount, hourlySales)
+            SELECT
+                h.branchId,
+                h.date,
+                h.isExacon,
+                SUM(h.grossSales),
+                SUM(h.profit),
+                SUM(h.discount),
+                SUM(h.transactionCount),
+                JSON_OBJECTAGG(CAST(h.hour AS CHAR), h.grossSales)
+            FROM (
+                SELECT
+                    branchId,
+                    DATE(transactionDate) AS date,
+                    isExacon,
+                    HOUR(transactionDate) AS hour,
+                    SUM(totalAmount) AS grossSales,
+                    SUM(profit) AS profit,
+                    SUM(COALESCE(discount, 0)) AS discount,
+                    COUNT(*) AS transactionCount
+                FROM transactions
+                WHERE isVoided = 0 AND isPaid = 1
+                {dateFilter}
+                GROUP BY branchId, DATE(transactionDate), isExacon, HOUR(transactionDate)
+            ) h
+            GROUP BY h.branchId, h.date, h.isExacon
+        """
+        rowcount, _ = await connection.execute_query(query, params)
+
+        itemQuery = f"""
+            INSERT INTO item_sales_rollup (branchId, date, itemId, quantity, amount, lineCount)
+            SELECT tr.branchId, DATE(tr.transactionDate), ti.itemId, SUM(ti.quantity), SUM(ti.amount), COUNT(*)
+            FROM transactionitems ti
+            JOIN transactions tr ON tr.id = ti.transactionId
+            WHERE tr.isVoided = 0 AND tr.isPaid = 1
+            {itemDateFilter}
+            GROUP BY tr.branchId, DATE(tr.transactionDate), ti.itemId
+        """
+        itemRowcount, _ = await connection.execute_query(itemQuery, params)
+
+    return rowcount, itemRowcount
+
+if __name__ == '__main__':
+    import asyncio
+    import sys
+    from db import DATABASE_CONFIG
+
+    async def main():
+        fromDate = date.fromisoformat(sys.argv[1]) if len(sys.argv) > 1 else None
+        await Tortoise.init(config=DATABASE_CONFIG)
+        try:
+            rowcount, itemRowcount = await rebuild(fromDate)
+            print(f"Rebuilt {rowcount} daily_sales_rollup and {itemRowcount} item_sales_rollup rows" + (f" from {fromDate}" if fromDate else ""))
+        finally:
+            await Tortoise.close_connections()
+
+    asyncio.run(main())
@@ -0,0 +1,316 @@
+import re
+from bisect import bisect_left, bisect_right, insort
+from collections import Counter
+from operator import itemgetter
+from tortoise import Tortoise
+
+MAX_PREFIX_LENGTH = 12
+
+# Fuzzy search keeps words whose trigram similarity to a typed word reaches this (0-1, as in pg_trgm).
+FUZZY_THRESHOLD = 0.3
+FUZZY_MIN_LENGTH = 3
+
+# Keeps sizes and fractions such as "1/2" or "2.5mm" together as one token.
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+(?:[./][a-z0-9]+)*")
+
+_names = {}
+_tokens = {}
+_prefixes = {}
+# The same ids as _prefixes as (name, itemId) lists in name order, so a page of matches can be read
+# off in order without sorting every match.
+_prefixOrder = {}
+_trigrams = {}
+# Trigrams that start inside a word, so "pvc" does not have to sift through every name starting with it.
+_innerTrigrams = {}
+# Every indexed word with its padded trigram count, and padded trigram -> words, for fuzzy search.
+_vocabulary = {}
+_wordTrigrams = {}
+_built = False
+
+def normalize(text):
+    return " ".join((text or "").lower().split())
+
+def tokenize(text):
+    return TOKEN_PATTERN.findall(normalize(text))
+
+def trigrams(text):
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+def innerTrigrams(name):
+    starts = {match.start() for match in TOKEN_PATTERN.finditer(name)}
+    return {name[i:i + 3] for i in range(len(name) - 2) if i not in starts}
+
+def wordTrigrams(word):
+    """Trigrams of a word padded like pg_trgm, so the start and end of a word weigh in."""
+    return trigrams(f"  {word} ")
+
+def isFuzzy(value):
+    return str(value).lower() in ("1", "true")
+
+def addWord(word):
+    grams = wordTrigrams(word)
+    _vocabulary[word] = len(grams)
+    for gram in grams:
+        _wordTrigrams.setdefault(gram, set()).add(word)
+
+def removeWord(word):
+    del _vocabulary[word]
+    for gram in wordTrigrams(word):
+        discard(_wordTrigrams, gram, word)
+
+def namePrefixes(name):
+    return {token[:length] for token in set(tokenize(name)) for length in range(1, min(len(token), MAX_PREFIX_LENGTH) + 1)}
+
+def addItem(itemId, name):
+    """Indexes an item under its name, replacing whatever name it was indexed under before."""
+    removeItem(itemId)
+    name = indexName(itemId, name)
+    for prefix in namePrefixes(name):
+        insort(_prefixOrder.setdefault(prefix, []), (name, itemId))
+
+def indexName(itemId, name):
+    name = normalize(name)
+    _names[itemId] = name
+
+    for token in set(tokenize(name)):
+        if token not in _tokens:
+            addWord(token)
+        _tokens.setdefault(token, set()).add(itemId)
+    for prefix in namePrefixes(name):
+        _prefixes.setdefault(prefix, set()).add(itemId)
+    for gram in trigrams(name):
+        _trigrams.setdefault(gram, set()).add(itemId)
+    for gram in innerTrigrams(name):
+        _innerTrigrams.setdefault(gram, set()).add(itemId)
+    return name
+
+def removeItem(itemId):
+    name = _names.pop(itemId, None)
+    if name is None:
+        return
+
+    for token in set(tokenize(name)):
+        discard(_tokens, token, itemId)
+        if token not in _tokens:
+            removeWord(token)
+    for prefix in namePrefixes(name):
+        discard(_prefixes, prefix, itemId)
+        ordered = _prefixOrder[prefix]
+        del ordered[bisect_left(ordered, (name, itemId))]
+        if not ordered:
+            del _prefixOrder[prefix]
+    for gram in trigrams(name):
+        discard(_trigrams, gram, itemId)
+    for gram in innerTrigrams(name):
+        discard(_innerTrigrams, gram, itemId)
+
+def discard(index, key, itemId):
+    ids = index.get(key)
+    if ids is not None:
+        ids.discard(itemId)
+        if not ids:
+            del index[key]
+
+def index(items):
+    """Rebuilds the index from (id, name) pairs."""
+    global _built
+    for table in (_names, _tokens, _prefixes, _prefixOrder, _trigrams, _innerTrigrams, _vocabulary, _wordTrigrams):
+        table.clear()
+    for itemId, name in dict(items).items():
+        indexName(itemId, name)
+    # Appending in name order leaves every list sorted without sorting each one.
+    for name, itemId in sorted((name, itemId) for itemId, name in _names.items()):
+        for prefix in namePrefixes(name):
+            _prefixOrder.setdefault(prefix, []).append((name, itemId))
+    _built = True
+
+async def build():
+    rows = await Tortoise.get_connection('default').execute_query_dict("SELECT id, name FROM items WHERE isManaged = 1")
+    index((row['id'], row['name']) for row in rows)
+
+def matchToken(term):
+    """Returns (matches, prefixes, wholes): the ids whose name contains term anywhere a LIKE would
+    find it (from three characters) or at the start of a word, and the subsets where it starts a
+    word or is a whole word."""
+    wholes = _tokens.get(term, set())
+    if len(term) <= MAX_PREFIX_LENGTH:
+        prefixes = _prefixes.get(term, set())
+    else:
+        prefixes = {itemId for itemId in _prefixes.get(term[:MAX_PREFIX_LENGTH], set())
+                    if any(token.startswith(term) for token in tokenize(_names[itemId]))}
+
+    matches = prefixes
+    if len(term) >= 3:
+        # Where term is inside a word, its first trigram starts inside that word.
+        candidates = _innerTrigrams.get(term[:3], set()) - prefixes
+        if candidates:
+            # Trigrams can match out of order, so confirm the substring like LIKE '%term%' would.
+            grams = (_trigrams.get(gram, set()) for gram in trigrams(term[1:]))
+            inside = {itemId for itemId in candidates.intersection(*grams) if term in _names[itemId]}
+            if inside:
+                matches = prefixes | inside
+    return matches, prefixes, wholes
+
+def matchItems(text):
+    """Returns the ids of every item matching every token of text as three tiers, best first, or None
+    when text has no searchable characters.
+
+    Text is split into tokens (words, or sizes such as "1/2" and "2.5mm") and an item must match all
+    of them, in any order. A token matches a whole word or the start of a word, and from three
+    characters also the inside of a word, so "pvc elb" finds "PVC pipe 1/2 elbow" and "galv pipe 3/4"
+    finds "Galvanized pipe 3/4 blue" although neither is a substring of the name. Tokens of one or
+    two characters only match word starts: "sc" finds "Screw" but not "Disc". The tiers hold the items
+    where every token is a whole word, then those where every token starts a word, then the rest, as
+    (ids, ordered) pairs for pageIds."""
+    terms = tokenize(text)
+    if not terms:
+        return None
+
+    matched = [matchToken(term) for term in dict.fromkeys(terms)]
+    wordStarts = intersect([prefixes for _, prefixes, _ in matched])
+    # Unless a term also matched inside words, its matches are its word starts.
+    found = wordStarts if all(matches is prefixes for matches, prefixes, _ in matched) else intersect([matches for matches, _, _ in matched])
+    if not found:
+        return []
+    wholeWords = intersect([wholes for _, _, wholes in matched])
+
+    # A whole word also starts a word and a word start also matches, so each tier is a subset of the next
+    # and a one-term search reuses the index's own sets. They all start a word with every term, so they
+    # sit in each term's prefix list.
+    ordered = min((_prefixOrder.get(term, []) for term in dict.fromkeys(terms) if len(term) <= MAX_PREFIX_LENGTH), key=len, default=None)
+    return [(wholeWords, ordered), (wordStarts - wholeWords, ordered), (found - wordStarts if found is not wordStarts else set(), None)]
+
+def intersect(sets):
+    sets = sorted(sets, key=len)
+    return sets[0].intersection(*sets[1:]) if len(sets) > 1 else sets[0]
+
+def orderedEntries(ids, ordered, start, count):
+    """Returns up to count (name, itemId) pairs of ids in name order, after the (name, itemId) start.
+
+    ordered is a name-ordered (name, itemId) list holding every id, or None. When ids make up at least
+    a quarter of it, walking it costs at most four steps per id, less than sorting ids, and stops as
+    soon as the page is full."""
+    if count <= 0:
+        return []
+    if ordered is not None and 4 * len(ids) >= len(ordered):
+        entries = []
+        for position in range(bisect_right(ordered, start) if start else 0, len(ordered)):
+            entry = ordered[position]
+            if entry[1] in ids:
+                entries.append(entry)
+                if len(entries) == count:
+                    break
+        return entries
+
+    entries = sorted((_names[itemId], itemId) for itemId in ids)
+    first = bisect_right(entries, start) if start else 0
+    return entries[first:first + count]
+
+def pageIds(tiers, limit, offset=0, after=None):
+    """Returns the next limit (tier, name, itemId) positions of the ranked (ids, ordered) tiers, each
+    tier in name order. Starts offset positions in, or right after the position after. Only the tiers
+    the page reaches are ordered, and only as far as the page needs."""
+    positions = []
+    for number, (ids, ordered) in enumerate(tiers):
+        start = None
+        if after is not None:
+            if number < after[0]:
+                continue
+            if number == after[0]:
+                start = tuple(after[1:])
+        if offset >= len(ids):
+            offset -= len(ids)
+            continue
+
+        entries = orderedEntries(ids, ordered, start, offset + limit - len(positions))[offset:]
+        offset = 0
+        positions.extend((number, name, itemId) for name, itemId in entries)
+        if len(positions) == limit:
+            break
+    return positions
+
+def rankedIds(tiers):
+    if tiers is None:
+        return None
+    return [itemId for _, _, itemId in pageIds(tiers, sum(len(ids) for ids, _ in tiers))]
+
+def findItemIds(text):
+    """Returns the ids of every item matching text (see matchItems), best first and by name within a
+    tier, or None when text has no searchable characters."""
+    return rankedIds(matchItems(text))
+
+def isOneEditAway(a, b):
+    """True when b is a with one letter added, dropped, replaced or swapped with its neighbour."""
+    if abs(len(a) - len(b)) > 1 or a == b:
+        return False
+    if len(a) > len(b):
+        a, b = b, a
+    start = 0
+    while start < len(a) and a[start] == b[start]:
+        start += 1
+    if len(a) < len(b):
+        return a[start:] == b[start + 1:]
+    if a[start + 1:] == b[start + 1:]:
+        return True
+    return a[start:start + 2] == b[start + 1] + b[start] and a[start + 2:] == b[start + 2:]
+
+def similarWords(term):
+    """Returns {word: similarity} for the indexed words whose trigram similarity to term reaches
+    FUZZY_THRESHOLD, or that are one typo away from it. Short words and swapped letters break most
+    of a word's trigrams, so the edit check catches "nial" for "nail"."""
+    grams = wordTrigrams(term)
+    shared = Counter()
+    for gram in grams:
+        shared.update(_wordTrigrams.get(gram, ()))
+
+    words = {}
+    for word, count in shared.items():
+        similarity = count / (len(grams) + _vocabulary[word] - count)
+        if similarity >= FUZZY_THRESHOLD:
+            words[word] = similarity
+        elif isOneEditAway(term, word):
+            words[word] = FUZZY_THRESHOLD
+    return words
+
+def matchFuzzy(term):
+    """Returns {itemId: score} for one query token: 1 for anything findItemIds would match, otherwise
+    the similarity of the closest word in the item's name."""
+    scores = {}
+    # Sizes and model numbers ("1/2", "2.5mm") are never corrected, so "1/2" does not turn into "1/4".
+    if len(term) >= FUZZY_MIN_LENGTH and term.isalpha():
+        for word, similarity in sorted(similarWords(term).items(), key=itemgetter(1)):
+            scores.update(dict.fromkeys(_tokens[word], similarity))
+    scores.update(dict.fromkeys(matchToken(term)[0], 1.0))
+    return scores
+
+def matchSimilarItems(text):
+    """Like matchItems, but a token also matches words it is a likely misspelling of, so "hamer" finds
+    "Claw hammer" and "plywod" finds "Plywood 1/4". Items are tiered by the summed score of their
+    tokens, closest first."""
+    terms = tokenize(text)
+    if not terms:
+        return None
+
+    totals = None
+    for term in dict.fromkeys(terms):
+        scores = matchFuzzy(term)
+        totals = scores if totals is None else {itemId: totals[itemId] + score for itemId, score in scores.items() if itemId in totals}
+        if not totals:
+            return []
+
+    tiers = {}
+    for itemId, score in totals.items():
+        tiers.setdefault(score, set()).add(itemId)
+    return [(tiers[score], None) for score in sorted(tiers, reverse=True)]
+
+def findSimilarItemIds(text):
+    """Returns the ids of every item close to text (see matchSimilarItems), closest first and then by
+    name, or None when text has no searchable characters."""
+    return rankedIds(matchSimilarItems(text))
+
+def rankTiers(text, fuzzy=False):
+    """Returns the tiers of items matching text, or close to it when fuzzy is set, for pageIds. None
+    when the index has not been built in this process (scripts, benchmarks) or text is only punctuation."""
+    if not _built:
+        return None
+    return matchSimilarItems(text) if fuzzy else matchItems(text)
@@ -1,28 +1,133 @@
-from models import BranchTransferHistory, BranchItem, BranchReturn, WareHouseItem
+from models import BranchTransferHistory, BranchReturn
 from utils import create_response
 from tortoise import Tortoise
+from tortoise.transactions import in_transaction
+import eventService
 from decimal import Decimal
 from datetime import datetime
 
+def stockDeltas(lines, sign=-1, key='branchItemId', quantityKey='quantity'):
+    """Sums line quantities per stock row id, so a row listed twice is only updated once."""
+    deltas = {}
+    for line in lines:
+        deltas[line[key]] = deltas.get(line[key], 0) + line[quantityKey] * sign
+    return deltas
+
+class StockConflict(Exception):
+    def __init__(self, conflicts):
+        super().__init__("Insufficient stock")
+        self.conflicts = conflicts
+
+async def lockStock(connection, ids, table="branchitem"):
+    """Locks the stock rows with SELECT ... FOR UPDATE and returns {id: quantity}.
+
+    Rows are always locked in id order, and callers touching both tables lock branchitem before
+    warehouseitems, so two transactions moving the same stock queue up instead of deadlocking.
+    Must be called inside in_transaction()."""
+    if not ids:
+        return {}
+
+    placeholders = ", ".join(["%s"] * len(ids))
+    query = f"SELECT id, quantity FROM {table} WHERE id IN ({placeholders}) ORDER BY id FOR UPDATE"
+    rows = await connection.execute_query_dict(query, sorted(ids))
+    return {row['id']: row['quantity'] for row in rows}
+
+async def applyStockDeltas(connection, deltas, guard=False, table="branchitem"):
+    """Adds each id -> quantity change in deltas to branchitem (or warehouseitems) with a single UPDATE ... CASE.
+
+    With guard set, rows whose quantity would go negative are left untouched and not counted
+    in the returned rowcount."""
+    if not deltas:
+        return 0
+
+    ids = sorted(deltas)
+    cases = " ".join(["WHEN %s THEN %s"] * len(ids))
+    placeholders = ", ".join(["%s"] * len(ids))
+    caseParams = [value for id in ids for value in (id, deltas[id])]
+
+    query = f"UPDATE {table} SET quantity = quantity + CASE id {cases} END WHERE id IN ({placeholders})"
+    params = caseParams + ids
+    if guard:
+        query += f" AND quantity + CASE id {cases} END >= 0"
+        params += caseParams
+
+    rowcount, _ = await connection.execute_query(query, params)
+    return rowcount
+
+async def decrementStock(connection, lines):
+    """Takes the quantities in lines out of stock, or raises StockConflict without changing anything.
+
+    The rows are locked first, so the availability check and the guarded UPDATE see the same
+    quantities even with other checkouts running. Each conflict lists the line and what is left."""
+    deltas = stockDeltas(lines)
+    stock = await lockStock(connection, list(deltas))
+
+    conflicts = [
+        {
+            "branchItemId": line['branchItemId'],
+            "itemId": line['itemId'],
+            "name": line['name'],
+            "requested": line['quantity'],
+            "available": stock.get(line['branchItemId'], 0)
+        }
+        for line in lines
+        if stock.get(line['branchItemId'], 0) + deltas[line['branchItemId']] < 0
+    ]
+    if conflicts:
+        raise StockConflict(conflicts)
+
+    changed = [branchItemId for branchItemId, delta in deltas.items() if delta]
+    if await applyStockDeltas(connection, deltas, guard=True) != len(changed):
+        raise StockConflict([{"branchItemId": branchItemId} for branchItemId in changed])
+
 async def saveBranchTransfer(branchTransfer):
-    branchItemFrom = await BranchItem.get_or_none(id=branchTransfer['branchFromId'])
-    branchItemTo = await BranchItem.get_or_none(branchId=branchTransfer['branchToId'], itemId = branchItemFrom.itemId)
+    return await saveBranchTransfers([branchTransfer])
+
+async def saveBranchTransfers(branchTransfers):
+    """Moves a list of items between branches in one transaction, all moves or none.
+
+    branchFromId is the source branchitem id and branchToId the destination branch; the
+    destination rows are resolved in one query and every involved row is locked in id order."""
+    if not branchTransfers:
+        return create_response(False, "No transfers", None, None), 400
+
+    moves = [
+        {"branchFromId": int(transfer['branchFromId']), "branchToId": int(transfer['branchToId']), "quantity": Decimal(str(transfer['quantity']))}
+        for transfer in branchTransfers
+    ]
+    pairs = sorted({(move['branchFromId'], move['branchToId']) for move in moves})
+
+    async with in_transaction() as connection:
+        rows = await connection.execute_query_dict(f"""
+            SELECT bf.id AS fromId, bf.branchId AS fromBranchId, bt.id AS toId, bt.branchId AS toBranchId
+            FROM branchitem bf
+            INNER JOIN branchitem bt ON bt.itemId = bf.itemId
+            WHERE (bf.id, bt.branchId) IN ({", ".join(["(%s, %s)"] * len(pairs))})
+        """, [value for pair in pairs for value in pair])
+        targets = {(row['fromId'], row['toBranchId']): row for row in rows}
+
+        missing = [{"branchFromId": pair[0], "branchToId": pair[1]} for pair in pairs if pair not in targets]
+        if missing:
+            return create_response(False, "Invalid branch ID", missing, None), 400
+
+        for move in moves:
+            move['toId'] = targets[(move['branchFromId'], move['branchToId'])]['toId']
 
-    if not branchItemTo or not branchItemFrom:
-        return create_response(False, "Invalid branch ID", None, None), 400
+        deltas = stockDeltas(moves, -1, 'branchFromId')
+        for branchItemId, delta in stockDeltas(moves, 1, 'toId').items():
+            deltas[branchItemId] = deltas.get(branchItemId, 0) + delta
 
-    await BranchTransferHistory.create(
-        branchFromId=branchItemFrom.id,
-        branchToId=branchItemTo.id,
-        quantity=branchTransfer['quantity'],
-        date=datetime.now() 
-    )
+        await lockStock(connection, list(deltas))
 
-    branchItemTo.quantity += Decimal(branchTransfer['quantity'])
-    branchItemFrom.quantity -= Decimal(branchTransfer['quantity'])
+        now = datetime.now()
+        await BranchTransferHistory.bulk_create([
+            BranchTransferHistory(branchFromId=move['branchFromId'], branchToId=move['toId'], quantity=move['quantity'], date=now)
+            for move in moves
+        ])
+        await applyStockDeltas(connection, deltas)
 
-    await branchItemTo.save()
-    await branchItemFrom.save()
+    for branchId in {branchId for row in rows for branchId in (row['fromBranchId'], row['toBranchId'])}:
+        eventService.publish(eventService.STOCK_CHANGED, branchId)
 
     return create_response(True, "Success", None, None), 200
 
@@ -60,26 +165,48 @@ async def getBranchTransferHistory(branchItemId):
     return create_response(True, "Success", historyList, None), 200
 
 async def returnToWH(returnStock):
-    branchItemId = await BranchItem.get_or_none(id=returnStock['branchItemId'])
-    whItem = await WareHouseItem.get_or_none(itemId = branchItemId.itemId)
-
-    if not branchItemId:
-        return create_response(False, 'Item not found', None, None), 200
-
-    if not whItem:
-        return create_response(False, 'Item not found', None, None), 200
-
-    await BranchReturn.create(
-        branchItemId=returnStock['branchItemId'],
-        reason=returnStock['reason'],
-        quantity=Decimal(str(returnStock['quantity'])),
-        date=datetime.now()
-    )
-
-    branchItemId.quantity -= Decimal(str(returnStock['quantity']))
-    whItem.quantity += Decimal(str(returnStock['quantity']))
-    await branchItemId.save()
-    await whItem.save()
+    return await returnStocksToWH([returnStock])
+
+async def returnStocksToWH(returnStocks):
+    """Returns a list of branch items to the warehouse in one transaction, all lines or none."""
+    if not returnStocks:
+        return create_response(False, 'No returns', None, None), 400
+
+    lines = [{**returnStock, "branchItemId": int(returnStock['branchItemId']), "quantity": Decimal(str(returnStock['quantity']))} for returnStock in returnStocks]
+    branchItemIds = sorted({line['branchItemId'] for line in lines})
+    placeholders = ", ".join(["%s"] * len(branchItemIds))
+
+    async with in_transaction() as connection:
+        rows = await connection.execute_query_dict(f"""
+            SELECT bi.id, bi.branchId, wh.id AS whItemId
+            FROM branchitem bi
+            INNER JOIN warehouseitems wh ON wh.itemId = bi.itemId
+            WHERE bi.id IN ({placeholders})
+        """, branchItemIds)
+        branchItems = {row['id']: row for row in rows}
+
+        missing = [branchItemId for branchItemId in branchItemIds if branchItemId not in branchItems]
+        if missing:
+            return create_response(False, 'Item not found', missing, None), 200
+
+        for line in lines:
+            line['whItemId'] = branchItems[line['branchItemId']]['whItemId']
+        branchDeltas = stockDeltas(lines, -1)
+        whDeltas = stockDeltas(lines, 1, 'whItemId')
+
+        await lockStock(connection, list(branchDeltas))
+        await lockStock(connection, list(whDeltas), "warehouseitems")
+
+        now = datetime.now()
+        await BranchReturn.bulk_create([
+            BranchReturn(branchItemId=line['branchItemId'], reason=line['reason'], quantity=line['quantity'], date=now)
+            for line in lines
+        ])
+        await applyStockDeltas(connection, branchDeltas)
+        await applyStockDeltas(connection, whDeltas, table="warehouseitems")
+
+    for branchId in {row['branchId'] for row in rows}:
+        eventService.publish(eventService.STOCK_CHANGED, branchId)
 
     return create_response(True, "Success", None, None), 200
 
@@ -0,0 +1,81 @@
+import asyncio
+import pytest
+import cacheService
+import eventService
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+@pytest.fixture(autouse=True)
+def clock(monkeypatch):
+    cacheService.invalidate()
+    clock = Clock()
+    monkeypatch.setattr(cacheService.time, "monotonic", clock)
+    return clock
+
+def test_entries_expire_after_their_ttl(clock):
+    key = cacheService.cacheKey("getCategories")
+    cacheService.put(key, ["Paint"], ttl=60)
+
+    clock.now += 60
+    assert cacheService.get(key) == ["Paint"]
+    clock.now += 1
+    assert cacheService.get(key) is None
+    assert key not in cacheService._entries
+
+def test_least_recently_used_entry_is_evicted(monkeypatch):
+    monkeypatch.setattr(cacheService, "MAX_ENTRIES", 2)
+    first, second, third = (cacheService.cacheKey("getProducts", page=page) for page in (1, 2, 3))
+    cacheService.put(first, "first")
+    cacheService.put(second, "second")
+    cacheService.get(first)
+    cacheService.put(third, "third")
+
+    assert cacheService.get(second) is None
+    assert cacheService.get(first) == "first"
+    assert cacheService.get(third) == "third"
+
+def test_get_or_load_loads_once():
+    calls = []
+    async def load():
+        calls.append(1)
+        return "items"
+
+    key = cacheService.cacheKey("getProducts", 0, 1, 1)
+    assert asyncio.run(cacheService.getOrLoad(key, load)) == "items"
+    assert asyncio.run(cacheService.getOrLoad(key, load)) == "items"
+    assert len(calls) == 1
+
+def test_write_during_load_is_not_cached():
+    async def load():
+        cacheService.invalidate()
+        return "stale"
+
+    key = cacheService.cacheKey("getProducts", 0, 1, 1)
+    assert asyncio.run(cacheService.getOrLoad(key, load)) == "stale"
+    assert cacheService.get(key) is None
+
+def test_stock_change_only_drops_that_branch():
+    branchOne = cacheService.cacheKey("getProducts", 0, 1, 1)
+    branchTwo = cacheService.cacheKey("getProducts", 0, 2, 1)
+    allBranches = cacheService.cacheKey("getWHStocks", 0, None, 1)
+    categories = cacheService.cacheKey("getCategories")
+    for key in (branchOne, branchTwo, allBranches, categories):
+        cacheService.put(key, key)
+
+    cacheService.on_event(eventService.STOCK_CHANGED, 1)
+
+    assert cacheService.get(branchOne) is None
+    assert cacheService.get(allBranches) is None
+    assert cacheService.get(branchTwo) == branchTwo
+    assert cacheService.get(categories) == categories
+
+def test_item_change_drops_everything():
+    key = cacheService.cacheKey("getCategories")
+    cacheService.put(key, [])
+    cacheService.on_event(eventService.ITEM_CHANGED, None)
+    assert cacheService.get(key) is None
@@ -0,0 +1,151 @@
+import asyncio
+from datetime import datetime
+import pytest
+import cacheService
+import pagination
+import searchService
+
+class Connection:
+    """Answers page queries from rows and COUNT(*) queries from count, recording every query."""
+
+    def __init__(self, rows, count=None):
+        self.rows = rows
+        self.count = count
+        self.queries = []
+
+    async def execute_query_dict(self, query, params):
+        self.queries.append((query, params))
+        if "COUNT(*) AS totalCount FROM" in query:
+            return [{"totalCount": self.count}]
+        limit, offset = params[-2:]
+        return self.rows[offset:offset + limit]
+
+def page(connection, pageSize=2, offset=0, seek=None, mode=pagination.COUNT_EXACT, countKey=None):
+    return asyncio.run(pagination.fetchPage(connection, "id, name", "FROM items i WHERE i.isManaged = 1", [],
+                                            "i.name, i.id", pageSize, offset, seek, mode, countKey))
+
+@pytest.fixture(autouse=True)
+def cache():
+    cacheService.invalidate()
+
+def test_cursor_round_trip():
+    cursor = pagination.encodeCursor(["Claw hammer", 6])
+    assert pagination.decodeCursor(cursor) == ("Claw hammer", 6)
+
+def test_cursor_keeps_dates_as_iso_strings():
+    cursor = pagination.encodeCursor([datetime(2024, 5, 1, 13, 30), 9])
+    assert pagination.decodeCursor(cursor) == ("2024-05-01T13:30:00", 9)
+
+@pytest.mark.parametrize("cursor", ["", "not a cursor", "W10=", pagination.encodeCursor(["a", "b"])])
+def test_invalid_cursor(cursor):
+    with pytest.raises(pagination.CursorError):
+        pagination.decodeCursor(cursor)
+
+def test_after_name_seeks_past_the_last_row():
+    condition, params = pagination.afterName(pagination.encodeCursor(["Nail", 4]), "i.name", "i.id")
+    assert condition == "(i.name > %s OR (i.name = %s AND i.id > %s))"
+    assert params == ["Nail", "Nail", 4]
+
+def test_before_date_rejects_a_name_cursor():
+    with pytest.raises(pagination.CursorError):
+        pagination.beforeDate(pagination.encodeCursor(["Nail", 4]), "t.transactionDate", "t.id")
+
+def test_next_cursor_points_at_the_last_row():
+    rows = [{"id": 1, "name": "Bolt"}, {"id": 4, "name": "Nail"}]
+    assert pagination.decodeCursor(pagination.nextCursor(rows, True, "name")) == ("Nail", 4)
+    assert pagination.nextCursor(rows, False, "name") is None
+    assert pagination.nextCursor([], True, "name") is None
+
+def test_count_mode_defaults_to_exact():
+    assert pagination.countMode(pagination.COUNT_CACHED) == pagination.COUNT_CACHED
+    assert pagination.countMode("bogus") == pagination.COUNT_EXACT
+
+def test_first_page_reads_the_window_count():
+    connection = Connection([{"id": n, "name": f"Item {n}", "totalCount": 3} for n in range(3)])
+    rows, totalCount, hasMore = page(connection)
+    assert [row["id"] for row in rows] == [0, 1]
+    assert (totalCount, hasMore) == (3, True)
+    assert len(connection.queries) == 1
+    assert connection.queries[0][1][-2:] == [3, 0]
+
+def test_exactly_full_last_page_has_no_more():
+    connection = Connection([{"id": n, "name": f"Item {n}", "totalCount": 2} for n in range(2)])
+    rows, totalCount, hasMore = page(connection)
+    assert (len(rows), totalCount, hasMore) == (2, 2, False)
+    assert pagination.nextCursor(rows, hasMore, "name") is None
+
+def test_cursor_pages_reuse_the_first_page_count():
+    key = cacheService.cacheKey("test", page="count")
+    page(Connection([{"id": n, "name": f"Item {n}", "totalCount": 3} for n in range(3)]), countKey=key)
+
+    connection = Connection([{"id": 2, "name": "Item 2"}], count=99)
+    rows, totalCount, hasMore = page(connection, seek=("i.id > %s", [1]), countKey=key)
+    assert (len(rows), totalCount, hasMore) == (1, 3, False)
+    assert len(connection.queries) == 1
+    assert "i.id > %s ORDER BY" in connection.queries[0][0]
+
+def test_has_more_mode_skips_the_count():
+    connection = Connection([{"id": n, "name": f"Item {n}"} for n in range(3)], count=99)
+    rows, totalCount, hasMore = page(connection, mode=pagination.COUNT_HAS_MORE)
+    assert (len(rows), totalCount, hasMore) == (2, None, True)
+    assert "COUNT" not in connection.queries[0][0]
+
+def test_page_past_the_end_counts_separately():
+    connection = Connection([], count=3)
+    rows, totalCount, hasMore = page(connection, offset=4)
+    assert (rows, totalCount, hasMore) == ([], 3, False)
+    assert len(connection.queries) == 2
+
+class SearchConnection:
+    """Lets through the ids in allowed and answers page queries for them in reverse order."""
+
+    def __init__(self, allowed):
+        self.allowed = allowed
+        self.queries = []
+
+    async def execute_query_dict(self, query, params):
+        self.queries.append((query, params))
+        if query.startswith("SELECT i.id AS id"):
+            return [{"id": itemId} for itemId in self.allowed]
+        return [{"id": itemId, "searchItemId": itemId} for itemId in reversed(params) if itemId in self.allowed]
+
+def searchPage(connection, search, cursor=None, offset=0, mode=pagination.COUNT_EXACT):
+    return asyncio.run(pagination.fetchSearchPage(connection, "i.id", "FROM items i WHERE i.isManaged = 1", [], search,
+                                                  2, offset, cursor, mode, cacheService.cacheKey("test", page="ids")))
+
+@pytest.fixture
+def index():
+    searchService.index([(1, "PVC pipe"), (2, "PVC elbow"), (3, "PVC tee"), (4, "GI pipe"), (5, "PVC cement")])
+
+def test_search_page_sends_only_the_page_ids(index):
+    connection = SearchConnection({1, 2, 3, 4, 5})
+    rows, totalCount, hasMore, cursor = searchPage(connection, "pvc")
+    assert [row["id"] for row in rows] == [5, 2]
+    assert (totalCount, hasMore) == (4, True)
+    assert connection.queries[-1][1] == [5, 2]
+
+    rows, totalCount, hasMore, cursor = searchPage(connection, "pvc", cursor)
+    assert [row["id"] for row in rows] == [1, 3]
+    assert (totalCount, hasMore, cursor) == (4, False, None)
+
+def test_search_page_counts_only_what_the_listing_lets_through(index):
+    connection = SearchConnection({1, 3, 4})
+    rows, totalCount, hasMore, _ = searchPage(connection, "pvc")
+    assert ([row["id"] for row in rows], totalCount, hasMore) == ([1, 3], 2, False)
+
+    searchPage(connection, "pipe")
+    assert sum(query.startswith("SELECT i.id AS id") for query, _ in connection.queries) == 1
+
+def test_search_page_by_number(index):
+    rows, _, hasMore, _ = searchPage(SearchConnection({1, 2, 3, 4, 5}), "pvc", offset=2)
+    assert ([row["id"] for row in rows], hasMore) == ([1, 3], False)
+
+def test_search_page_without_matches_skips_the_page_query(index):
+    connection = SearchConnection({1, 2, 3, 4, 5})
+    rows, totalCount, hasMore, cursor = searchPage(connection, "plywood", mode=pagination.COUNT_HAS_MORE)
+    assert (rows, totalCount, hasMore, cursor) == ([], None, False, None)
+    assert len(connection.queries) == 1
+
+def test_search_page_rejects_a_name_cursor(index):
+    with pytest.raises(pagination.CursorError):
+        searchPage(SearchConnection({1}), "pvc", pagination.encodeCursor(["PVC pipe", 1]))
@@ -0,0 +1,121 @@
+import pytest
+import searchService
+
+ITEMS = {
+    1: "PVC pipe 1/2 elbow",
+    2: "PVC elbow 3/4",
+    3: "Galvanized pipe 3/4 blue",
+    4: "Screw #10",
+    5: "Grinding disc 4",
+    6: "Claw hammer",
+    7: "Wire 2.5mm",
+}
+
+@pytest.fixture(autouse=True)
+def index():
+    searchService.index(ITEMS.items())
+
+def test_tokenize_keeps_sizes_together():
+    assert searchService.tokenize("  PVC  Elbow 1/2, 2.5mm ") == ["pvc", "elbow", "1/2", "2.5mm"]
+
+def test_tokens_match_in_any_order():
+    assert searchService.findItemIds("galv pipe 3/4") == [3]
+    assert searchService.findItemIds("3/4 pipe galv") == [3]
+
+def test_every_token_must_match():
+    assert sorted(searchService.findItemIds("pvc elb")) == [1, 2]
+    assert searchService.findItemIds("pvc hammer") == []
+
+def test_short_tokens_only_match_word_starts():
+    assert searchService.findItemIds("sc") == [4]
+    assert searchService.findItemIds("disc") == [5]
+
+def test_longer_tokens_match_inside_words():
+    assert searchService.findItemIds("ammer") == [6]
+
+def test_whole_words_rank_before_word_starts_before_the_rest():
+    searchService.addItem(8, "Ball hammerhead")
+    searchService.addItem(9, "Anvil sledgehammer")
+    assert searchService.findItemIds("hammer") == [6, 8, 9]
+
+def test_ties_rank_by_name():
+    assert searchService.findItemIds("pipe") == [3, 1]
+    assert searchService.findItemIds("pvc elb") == [2, 1]
+
+def test_results_are_not_capped():
+    searchService.index((itemId, f"Common nail {itemId}") for itemId in range(1, 2001))
+    assert len(searchService.findItemIds("nail")) == 2000
+
+def test_punctuation_only_text_is_not_searchable():
+    assert searchService.findItemIds("--") is None
+
+def test_add_and_remove_item():
+    searchService.addItem(8, "Claw bar")
+    assert searchService.findItemIds("claw") == [8, 6]
+
+    searchService.addItem(8, "Pry bar")
+    assert searchService.findItemIds("claw") == [6]
+
+    searchService.removeItem(6)
+    assert searchService.findItemIds("claw") == []
+    assert "claw" not in searchService._vocabulary
+
+def test_page_ids_seek_through_every_tier():
+    searchService.addItem(8, "Ball hammerhead")
+    searchService.addItem(9, "Anvil sledgehammer")
+    tiers = searchService.matchItems("hammer")
+    first = searchService.pageIds(tiers, 2)
+    assert first == [(0, "claw hammer", 6), (1, "ball hammerhead", 8)]
+    assert searchService.pageIds(tiers, 2, after=first[-1]) == [(2, "anvil sledgehammer", 9)]
+    assert searchService.pageIds(tiers, 2, offset=2) == [(2, "anvil sledgehammer", 9)]
+
+def test_page_ids_order_large_tiers_by_name():
+    searchService.index((itemId, f"Common nail {3000 - itemId}") for itemId in range(1, 2001))
+    tiers = searchService.matchItems("nail")
+    page = searchService.pageIds(tiers, 3, after=(0, "common nail 1500", 1500))
+    assert page == [(0, "common nail 1501", 1499), (0, "common nail 1502", 1498), (0, "common nail 1503", 1497)]
+
+def test_index_updates_keep_name_order():
+    searchService.addItem(10, "Pipe wrench")
+    searchService.addItem(1, "Zinc pipe")
+    searchService.removeItem(3)
+    assert searchService.findItemIds("pipe") == [10, 1]
+
+    searchService.index([(10, "Pipe wrench"), (1, "Zinc pipe"), *((itemId, name) for itemId, name in ITEMS.items() if itemId not in (1, 3))])
+    assert searchService.findItemIds("pipe") == [10, 1]
+
+def test_one_edit_away():
+    assert searchService.isOneEditAway("nial", "nail")
+    assert searchService.isOneEditAway("hamer", "hammer")
+    assert searchService.isOneEditAway("elbw", "elbow")
+    assert searchService.isOneEditAway("wira", "wire")
+    assert not searchService.isOneEditAway("wire", "wire")
+    assert not searchService.isOneEditAway("nail", "lain")
+
+def test_fuzzy_finds_misspellings():
+    assert searchService.findItemIds("hamer") == []
+    assert searchService.findSimilarItemIds("hamer") == [6]
+    assert searchService.findSimilarItemIds("galvanised pipe") == [3]
+
+def test_fuzzy_never_corrects_sizes():
+    assert searchService.findSimilarItemIds("elbow 1/4") == []
+
+def test_fuzzy_ranks_by_score_then_name():
+    searchService.addItem(8, "Adjustable hammer")
+    searchService.addItem(9, "Hammock hook")
+    assert searchService.findSimilarItemIds("hammer") == [8, 6, 9]
+
+def test_fuzzy_results_are_not_capped():
+    searchService.index((itemId, f"Common nail {itemId}") for itemId in range(1, 2001))
+    assert len(searchService.findSimilarItemIds("nial")) == 2000
+
+def test_fuzzy_tiers_rank_by_score():
+    searchService.addItem(8, "Adjustable hammer")
+    searchService.addItem(9, "Hammock hook")
+    tiers = searchService.matchSimilarItems("hammok")
+    assert [sorted(ids) for ids, _ in tiers] == [[9], [6, 8]]
+    assert searchService.pageIds(tiers, 2, offset=1) == [(1, "adjustable hammer", 8), (1, "claw hammer", 6)]
+
+def test_rank_tiers_needs_a_built_index(monkeypatch):
+    monkeypatch.setattr(searchService, "_built", False)
+    assert searchService.rankTiers("pipe") is None
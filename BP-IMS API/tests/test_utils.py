@@ -0,0 +1,26 @@
+from datetime import date, datetime
+import pytest
+from utils import day_range, days_range, work_week_range, month_range, year_range
+
+def test_day_range_is_half_open():
+    assert day_range(date(2024, 2, 28)) == (datetime(2024, 2, 28), datetime(2024, 2, 29))
+    assert day_range(date(2024, 12, 31)) == (datetime(2024, 12, 31), datetime(2025, 1, 1))
+
+def test_days_range_includes_the_last_day():
+    assert days_range(date(2024, 3, 1), date(2024, 3, 31)) == (datetime(2024, 3, 1), datetime(2024, 4, 1))
+    assert days_range(date(2024, 3, 5), date(2024, 3, 5)) == day_range(date(2024, 3, 5))
+
+@pytest.mark.parametrize("day", [date(2024, 4, 29), date(2024, 5, 1), date(2024, 5, 3), date(2024, 5, 4)])
+def test_work_week_range_runs_sunday_to_friday(day):
+    assert work_week_range(day) == (datetime(2024, 4, 28), datetime(2024, 5, 4))
+
+def test_work_week_range_on_sunday_is_the_week_before():
+    # WEEKDAY() counts from Monday, so the query this replaced also treated Sunday as the end of a week.
+    assert work_week_range(date(2024, 5, 5)) == (datetime(2024, 4, 28), datetime(2024, 5, 4))
+
+def test_month_range():
+    assert month_range(2024, 2) == (datetime(2024, 2, 1), datetime(2024, 3, 1))
+    assert month_range(2024, 12) == (datetime(2024, 12, 1), datetime(2025, 1, 1))
+
+def test_year_range():
+    assert year_range(2024) == (datetime(2024, 1, 1), datetime(2025, 1, 1))
@@ -5,50 +5,30 @@ from decimal import Decimal
 from tortoise import Tortoise
 import pytz
 import customerService
+import eventService
+import rollupService
+import checkoutService
+import cartService
+import codeService
+import stockService
+import pagination
 from tortoise.transactions import in_transaction
 
 sgt = pytz.timezone('Asia/Singapore')
 
 """ GET METHODS """
 async def getCartandItems(userId):
-    cart = await getCartforUser(userId)
-    user = await User.get_or_none(id = userId)
-    totalCount = await getTotalItemCount(cart.id);    
-    cartItems = await getCartItems(cart.id, user.branchId)
-
-    cart_data = cart.__dict__  
-    cart_data.pop('userId', None)
-    customer = None
-    if(cart_data["customerId"]):
-        customer = await Customer.get_or_none(id = cart_data["customerId"])
+    snapshot = await cartService.getCart(userId)
+    if not snapshot:
+        await createCartforUser(userId)
+        snapshot = await cartService.getCart(userId)
 
     cartDto = {
-            "cart": {
-                "id": cart_data["id"],
-                "discount": cart_data["discount"],
-                "deliveryFee": cart_data["deliveryFee"],
-                "subTotal": str(cart_data["subTotal"]),
-                "customerName": customer.name if customer else None 
-            },
-            "cartItems": cartItems
+            "cart": snapshot["cart"],
+            "cartItems": snapshot["cartItems"]
         }
 
-    return create_response(True, "Successfully retrieved cart and items", cartDto, None, totalCount), 200
-
-
-async def getTotalItemCount(cartId):
-    query = """
-        SELECT SUM(CASE 
-                    WHEN i.sellbyUnit = 1 THEN ci.quantity 
-                    ELSE 1 
-                   END) AS total_count
-        FROM cartitems ci
-        INNER JOIN branchitem bi ON ci.branchItemId = bi.id
-        INNER JOIN items i on i.id = bi.itemId
-        WHERE ci.cartId = %s
-    """
-    result = await Tortoise.get_connection("default").execute_query(query, [cartId])
-    return int(result[1][0]["total_count"]) if result[1][0]["total_count"] else 0
+    return create_response(True, "Successfully retrieved cart and items", cartDto, None, snapshot["totalCount"]), 200
 
 
 async def getCartforUser(userId):
@@ -60,28 +40,6 @@ async def getCartforUser(userId):
     return cart
 
 
-async def getCartItems(cartId, branchId):
-    cartItems = await CartItems.all().filter(cartId=cartId)
-    result = []
-
-    if cartItems:
-        for cartItem in cartItems:
-            branchItem = await BranchItem.get_or_none(id=cartItem.branchItemId)
-            item = await Item.get_or_none(id=branchItem.itemId)
-            if item:
-                result.append({
-                    "id": cartItem.id,
-                    "itemId": item.id,
-                    "name": item.name,
-                    "price": item.price,
-                    "quantity": cartItem.quantity,
-                    "sellByUnit": item.sellByUnit,
-                    "branchQty": branchItem.quantity
-                })
-
-    return result
-
-
 """POST AND PUT METHODS"""
 
 async def createCartforUser(userId):
@@ -111,6 +69,7 @@ async def deleteAllCartItems(cartId):
         cart.deliveryFee = None
         cart.customerId = None
         await cart.save()
+        cartService.invalidate(cartId)
         
     else:
         message = 'No items in the cart'
@@ -124,47 +83,97 @@ async def addItemToCart(cartId, itemId, quantity):
     if not item:
         return create_response(False, 'Item not found', None, None), 200
 
-    async with in_transaction():
-        cart = await Cart.select_for_update().get_or_none(id=cartId)
-        if not cart:
-            return create_response(False, 'Cart not found', None, None), 200
+    cart = await Cart.get_or_none(id=cartId)
+    if not cart:
+        return create_response(False, 'Cart not found', None, None), 200
+
+    user = await User.get_or_none(id=cart.userId)
+    branch_item = await BranchItem.get_or_none(itemId=itemId, branchId=user.branchId)
 
-        user = await User.get_or_none(id=cart.userId)
-        branch_item = await BranchItem.get_or_none(itemId=itemId, branchId=user.branchId)
+    if not branch_item or branch_item.quantity < quantity_decimal:
+        return create_response(False, 'Not enough stock available for this item', None, None), 200
 
-        if not branch_item or branch_item.quantity < quantity_decimal:
-            return create_response(False, 'Not enough stock available for this item', None, None), 200
+    message = await addCartLine(cartId, branch_item.id, item.price, quantity_decimal)
+    return create_response(True, message, None, None), 200
 
-        existing_cart_item = await CartItems.get_or_none(cartId=cart.id, branchItemId=branch_item.id)
+async def addCartLine(cartId, branchItemId, price, quantity):
+    """Adds quantity of a branch item to a cart, topping up its line when it is already there."""
+    async with in_transaction() as connection:
+        # Cart first, then its line, in the order checkout locks them, so the two cannot deadlock.
+        await checkoutService.lockCart(cartId)
+        # MySQL reports 1 affected row for a new line and 2 when an existing line was topped up.
+        rowcount, _ = await connection.execute_query("""
+            INSERT INTO cartitems (cartId, branchItemId, quantity) VALUES (%s, %s, %s)
+            ON DUPLICATE KEY UPDATE quantity = quantity + VALUES(quantity)
+        """, [cartId, branchItemId, quantity])
+        await connection.execute_query(
+            "UPDATE carts SET subTotal = subTotal + %s WHERE id = %s",
+            [price * quantity, cartId]
+        )
+
+    cartService.invalidate(cartId)
+    return 'Item successfully added to the cart' if rowcount == 1 else 'Item quantity updated in the cart'
+
+async def scanItemToCart(cartId, code, quantity=1):
+    """Adds the item with a scanned SKU or barcode to a cart.
+
+    The code is resolved in memory; the cart's branch row, stock and price then come from one query."""
+    itemId = codeService.resolve(code)
+    if itemId is None:
+        return create_response(False, 'No item has this code', None, None), 200
 
-        if existing_cart_item:
-            existing_cart_item.quantity += quantity_decimal
-            await existing_cart_item.save()
-            message = 'Item quantity updated in the cart'
-        else:
-            await CartItems.create(cartId=cart.id, branchItemId=branch_item.id, quantity=quantity_decimal)
-            message = 'Item successfully added to the cart'
+    quantity_decimal = Decimal(str(quantity))
+    rows = await Tortoise.get_connection('default').execute_query_dict("""
+        SELECT bi.id AS branchItemId, bi.quantity, i.name, i.price
+        FROM carts c
+        INNER JOIN users u ON u.id = c.userId
+        INNER JOIN branchitem bi ON bi.branchId = u.branchId AND bi.itemId = %s
+        INNER JOIN items i ON i.id = bi.itemId
+        WHERE c.id = %s AND i.isManaged = 1
+    """, [itemId, cartId])
+
+    if not rows:
+        return create_response(False, 'Item not found', None, None), 200
 
-        cart.subTotal += item.price * quantity_decimal
-        await cart.save()
+    line = rows[0]
+    if line['quantity'] < quantity_decimal:
+        return create_response(False, 'Not enough stock available for this item', None, None), 200
 
-    return create_response(True, message, None, None), 200
+    message = await addCartLine(cartId, line['branchItemId'], line['price'], quantity_decimal)
+    return create_response(True, message, {"itemId": itemId, "name": line['name']}, None), 200
+
+async def getCartLine(connection, cartItemId):
+    """Locks a cart line's cart and then the line, in the order checkout locks them, and returns the
+    line's cartId, quantity and current item price, or None."""
+    rows = await connection.execute_query_dict("SELECT cartId FROM cartitems WHERE id = %s", [cartItemId])
+    if not rows or not await checkoutService.lockCart(rows[0]['cartId']):
+        return None
+
+    rows = await connection.execute_query_dict("""
+        SELECT ci.cartId, ci.quantity, i.price
+        FROM cartitems ci
+        INNER JOIN branchitem bi ON bi.id = ci.branchItemId
+        INNER JOIN items i ON i.id = bi.itemId
+        WHERE ci.id = %s AND ci.cartId = %s
+        FOR UPDATE OF ci
+    """, [cartItemId, rows[0]['cartId']])
+    return rows[0] if rows else None
 
 async def updateItemQuantity(cartItemId, quantity):
-    cartItem = await CartItems.get_or_none(id = cartItemId)
-    cart = await Cart.get_or_none(id=cartItem.cartId)
     quantity_decimal = Decimal(str(quantity))
-    user = await User.get_or_none(id = cart.userId)
-    branchItem = await BranchItem.get_or_none(id = cartItem.branchItemId)
-    item = await Item.get_or_none(id = branchItem.itemId)
-
-    if cartItem:
-        totalToAdd = (item.price * quantity_decimal) - (cartItem.quantity * item.price)
-        cartItem.quantity = quantity_decimal
-        cart.subTotal += totalToAdd
-        await cartItem.save()
-        await cart.save()
-        await branchItem.save()
+
+    async with in_transaction() as connection:
+        line = await getCartLine(connection, cartItemId)
+
+        if line:
+            await connection.execute_query("UPDATE cartitems SET quantity = %s WHERE id = %s", [quantity_decimal, cartItemId])
+            await connection.execute_query(
+                "UPDATE carts SET subTotal = subTotal + %s WHERE id = %s",
+                [line['price'] * (quantity_decimal - line['quantity']), line['cartId']]
+            )
+
+    if line:
+        cartService.invalidate(line['cartId'])
         message = 'Item quantity and price updated'
     else:
         message = 'No item found in the cart'
@@ -172,27 +181,24 @@ async def updateItemQuantity(cartItemId, quantity):
     return create_response(True, message), 200
 
 async def removeCartItem(cartItemId):
-    cartItem = await CartItems.get_or_none(id=cartItemId)
-    cart = await Cart.get_or_none(id=cartItem.cartId)
-    user = await User.get_or_none(id = cart.userId)
-    branchItem = await BranchItem.get_or_none(id = cartItem.branchItemId)
-    if cartItem:
-        item = await Item.get_or_none(id=branchItem.itemId)
-        cart = await Cart.get_or_none(id=cartItem.cartId)
-        
-        if cart and item:
-            cart.subTotal -= item.price * cartItem.quantity
-            if cart.subTotal < 0:
-                cart.subTotal = 0
-                cart.deliveryFee = 0
-                cart.discount = 0
-
-            await cart.save()
-            await cartItem.delete()
-
-            message = 'Item removed from the cart successfully'
-        else:
-            message = 'Cart or item not found'
+    async with in_transaction() as connection:
+        line = await getCartLine(connection, cartItemId)
+
+        if line:
+            amount = line['price'] * line['quantity']
+            await connection.execute_query("DELETE FROM cartitems WHERE id = %s", [cartItemId])
+            # Assignments run left to right, so the fee and discount reset sees the old subTotal.
+            await connection.execute_query("""
+                UPDATE carts
+                SET deliveryFee = IF(subTotal < %s, 0, deliveryFee),
+                    discount = IF(subTotal < %s, 0, discount),
+                    subTotal = GREATEST(subTotal - %s, 0)
+                WHERE id = %s
+            """, [amount, amount, amount, line['cartId']])
+
+    if line:
+        cartService.invalidate(line['cartId'])
+        message = 'Item removed from the cart successfully'
     else:
         message = 'No item found in the cart'
 
@@ -205,6 +211,7 @@ async def updateDeliveryFee(cartId, deliveryFee):
     if cart:
         cart.deliveryFee = deliveryFee
         await cart.save()
+        cartService.invalidate(cartId)
 
         message = 'Successful'
     else:
@@ -222,6 +229,7 @@ async def updateDiscount(cartId, discount):
     if cart:
         cart.discount = discount
         await cart.save()
+        cartService.invalidate(cartId)
 
         message = 'Successful'
     else:
@@ -235,6 +243,7 @@ async def updateCustomer(cartId, custId):
     if cart:
         cart.customerId = custId
         await cart.save()
+        cartService.invalidate(cartId)
 
         message = 'Successful'
     else:
@@ -261,71 +270,24 @@ async def processPayment(cartId, amountReceived):
     
     user = await User.get_or_none(id=cart.userId)
     branch = await Branch.get_or_none(id=user.branchId)
-    customer = await Customer.get_or_none(id=cart.customerId) if cart.customerId else None
-    cartItems = await CartItems.filter(cartId=cartId)
-    transactionItems = []
-
-    total_amount = cart.subTotal
-    if cart.discount:
-        total_amount -= cart.discount  
-    if cart.deliveryFee:
-        total_amount += cart.deliveryFee  
-
-    if total_amount > float(amountReceived):
-        return create_response(False, 'Transaction Error. Please Try Again!'), 404
-
-    slip_no = await generate_slip_no(branch.id)
-    total_profit = 0 
-
-    total_cogs = 0
-    for cItem in cartItems:
-        branchItem = await BranchItem.get_or_none(id=cItem.branchItemId)
-        item = await Item.get_or_none(id=branchItem.itemId)
-        if item:
-            total_cogs += item.cost * cItem.quantity  
-
-    total_profit = total_amount - total_cogs
     current_time = datetime.now(timezone.utc) + timedelta(hours=8)
     adjusted_time = adjust_transaction_time(current_time)
 
-    transaction = await Transaction.create(
-        amountReceived=float(amountReceived),
-        totalAmount=total_amount,
-        cashierId=cart.userId,
-        slipNo=slip_no,
-        transactionDate = adjusted_time,
-        customerId=cart.customerId,
-        branchId=user.branchId,
-        profit=total_profit,
-        discount=cart.discount,
-        deliveryFee=cart.deliveryFee
-    )
-
-    for cItem in cartItems:
-        branchItem = await BranchItem.get_or_none(id=cItem.branchItemId)
-        item = await Item.get_or_none(id=branchItem.itemId)
-        if item:    
-            branchItem.quantity -= cItem.quantity
-            itemAmount = item.price * cItem.quantity
-
-            tItem = await TransactionItem.create(
-                transactionId=transaction.id,
-                itemId=branchItem.itemId,
-                quantity=cItem.quantity,
-                amount=itemAmount,
-                isVoided=False
-            )
-            transactionItems.append({
-                "id": tItem.id,
-                "itemId": item.id,
-                "name": item.name,
-                "price": item.price,
-                "quantity": tItem.quantity,
-                "amount": tItem.amount,
-                "sellByUnit": item.sellByUnit
-            })
-
-    await branchItem.save()
+    try:
+        result = await checkoutService.checkout(
+            cartId,
+            amountReceived,
+            transactionDate = adjusted_time,
+            branchId=user.branchId
+        )
+    except checkoutService.CheckoutError as e:
+        return create_response(False, str(e)), e.status
+    except stockService.StockConflict as e:
+        return create_response(False, 'Insufficient stock for some items', e.conflicts), 409
+
+    transaction = result['transaction']
+    total_amount = transaction.totalAmount
+    customer = await Customer.get_or_none(id=result['customerId']) if result['customerId'] else None
 
     loyaltyItem = {}
     done = False
@@ -369,51 +331,24 @@ async def processPayment(cartId, amountReceived):
             "slipNo": transaction.slipNo,
             "transactionDate": transaction.transactionDate,
             "branch": branch.name,
-            "deliveryFee": cart.deliveryFee,
-            "discount": cart.discount,
-            "subTotal": cart.subTotal,
+            "deliveryFee": transaction.deliveryFee,
+            "discount": transaction.discount,
+            "subTotal": result['subTotal'],
             "customerName": customer.name if customer else None
         },
-        "transactionItems": transactionItems,
+        "transactionItems": result['transactionItems'],
         "loyaltyItemDto": loyaltyItem
     }
 
-    await CartItems.filter(cartId=cartId).delete()
-    cart.subTotal = 0
-    cart.deliveryFee = None
-    cart.discount = None
-    cart.customerId = None
-    await cart.save()
-
     if customer:
         customer.totalOrderAmount += total_amount
         await customer.save()
 
+    eventService.publish(eventService.TRANSACTION_CREATED, user.branchId)
+
     message = 'Payment Successful'
     return create_response(True, message, transactionRequest), 200
 
-async def generate_slip_no(branchId: int) -> str:
-    now_sg = datetime.now(timezone.utc) + timedelta(hours=8)
-    
-    dateToday = now_sg.strftime('%m%d%y')
-    store_code = f"{branchId:02d}"
-    today_date = now_sg.date()
-
-    start_of_day = datetime.combine(today_date, time.min, timezone.utc) + timedelta(hours=8)
-    end_of_day = datetime.combine(today_date, time.max, timezone.utc) + timedelta(hours=8)
-
-    transaction_count = await Transaction.filter(
-        transactionDate__gte=start_of_day, 
-        transactionDate__lte=end_of_day
-    ).count()
-
-    slip_count = transaction_count + 1
-    slip_count_str = f"{slip_count:03d}"
-
-    slip_no = f"CC{store_code}-{dateToday}-{slip_count_str}"
-
-    return slip_no
-
 async def getTransactionHistory(transactionId):
     transaction = await Transaction.get_or_none(id=transactionId)
     
@@ -459,7 +394,28 @@ async def getTransactionHistory(transactionId):
     
     return create_response(True, 'Transaction retrieved successfully', transactionData), 200
 
-async def getAllTransactionsAsync(branchId, page=1, search=""):
+async def getTransactionItemsByIds(transactionIds):
+    itemsByTransaction = {transactionId: [] for transactionId in transactionIds}
+
+    if not itemsByTransaction:
+        return itemsByTransaction
+
+    placeholders = ', '.join(['%s'] * len(itemsByTransaction))
+    itemsQuery = f"""
+        SELECT ti.id, i.name as itemName, i.id as itemId, ti.quantity, ti.transactionId
+        FROM transactionitems ti
+        INNER JOIN items i ON i.id = ti.itemId
+        WHERE ti.transactionId IN ({placeholders})
+        ORDER BY ti.transactionId, ti.id
+    """
+    rows = await Tortoise.get_connection("default").execute_query_dict(itemsQuery, tuple(itemsByTransaction))
+
+    for row in rows:
+        itemsByTransaction[row.pop('transactionId')].append(row)
+
+    return itemsByTransaction
+
+async def getAllTransactionsAsync(branchId, page=1, search="", cursor=None):
     pageSize = 30
     offset = (page - 1) * pageSize
 
@@ -475,22 +431,30 @@ async def getAllTransactionsAsync(branchId, page=1, search=""):
     if search:
         dailyTransactsDto += " AND tr.slipNo LIKE %s"
         params.append(f'%{search}%')
-    dailyTransactsDto += " ORDER BY tr.transactionDate DESC"
+
+    if cursor:
+        try:
+            seek, seekParams = pagination.beforeDate(cursor, 'tr.transactionDate', 'tr.id')
+        except pagination.CursorError:
+            return create_response(False, 'Invalid cursor'), 400
+        dailyTransactsDto += f" AND {seek}"
+        params.extend(seekParams)
+        offset = 0
+
+    dailyTransactsDto += " ORDER BY tr.transactionDate DESC, tr.id DESC"
     dailyTransactsDto += " LIMIT %s OFFSET %s"
-    params.extend([pageSize, offset])
+    # One extra row tells whether there is another page, so a last page that is exactly full gets no cursor.
+    params.extend([pageSize + 1, offset])
 
     dailyTransactions = await Tortoise.get_connection("default").execute_query_dict(dailyTransactsDto, tuple(params))
+    hasMore = len(dailyTransactions) > pageSize
+    dailyTransactions = dailyTransactions[:pageSize]
 
     transactionsDto = []
+    itemsByTransaction = await getTransactionItemsByIds([tr['id'] for tr in dailyTransactions])
 
     for tr in dailyTransactions:
-        itemsQuery = """
-            SELECT ti.id, i.name as itemName, i.id as itemId, ti.quantity 
-            FROM transactionitems ti
-            INNER JOIN items i ON i.id = ti.itemId
-            WHERE ti.transactionId = %s
-        """
-        items = await Tortoise.get_connection("default").execute_query_dict(itemsQuery, (tr['id'],))
+        items = itemsByTransaction[tr['id']]
         transactionsDto.append({
             "id": tr["id"],
             "totalAmount": float(tr["totalAmount"]),
@@ -506,9 +470,9 @@ async def getAllTransactionsAsync(branchId, page=1, search=""):
     total_count_result = await Tortoise.get_connection("default").execute_query_dict(total_count_query, (branchId,))  # Exclude LIMIT & OFFSET params
     total_count = total_count_result[0]["total"] if total_count_result else 0
 
-    return create_response(True, "Successfully Retrieved", transactions, None, total_count), 200
+    return create_response(True, "Successfully Retrieved", transactions, None, total_count, pagination.nextCursor(dailyTransactions, hasMore, 'transactionDate', 'id'), hasMore), 200
 
-async def getAllTransactionsAsyncHQ(branchId=None, page=1, search=""):
+async def getAllTransactionsAsyncHQ(branchId=None, page=1, search="", cursor=None):
     pageSize = 30
     offset = (page - 1) * pageSize
     params = []
@@ -521,31 +485,42 @@ async def getAllTransactionsAsyncHQ(branchId=None, page=1, search=""):
         INNER JOIN branches b ON b.id = tr.branchId
     """
 
+    conditions = []
+
     if branchId is not None:
-        dailyTransactsDto += " WHERE tr.branchId = %s"
+        conditions.append("tr.branchId = %s")
         params.append(branchId)
 
     if search:
-        dailyTransactsDto += " AND" if branchId is not None else " WHERE"
-        dailyTransactsDto += " tr.slipNo LIKE %s"
+        conditions.append("tr.slipNo LIKE %s")
         params.append(f'%{search}%')
 
-    dailyTransactsDto += " ORDER BY tr.transactionDate DESC"
+    if cursor:
+        try:
+            seek, seekParams = pagination.beforeDate(cursor, 'tr.transactionDate', 'tr.id')
+        except pagination.CursorError:
+            return create_response(False, 'Invalid cursor'), 400
+        conditions.append(seek)
+        params.extend(seekParams)
+        offset = 0
+
+    if conditions:
+        dailyTransactsDto += " WHERE " + " AND ".join(conditions)
+
+    dailyTransactsDto += " ORDER BY tr.transactionDate DESC, tr.id DESC"
     dailyTransactsDto += " LIMIT %s OFFSET %s"
-    params.extend([pageSize, offset])
+    # One extra row tells whether there is another page, so a last page that is exactly full gets no cursor.
+    params.extend([pageSize + 1, offset])
 
     dailyTransactions = await Tortoise.get_connection("default").execute_query_dict(dailyTransactsDto, tuple(params))
+    hasMore = len(dailyTransactions) > pageSize
+    dailyTransactions = dailyTransactions[:pageSize]
 
     transactionsDto = []
+    itemsByTransaction = await getTransactionItemsByIds([tr['id'] for tr in dailyTransactions])
 
     for tr in dailyTransactions:
-        itemsQuery = """
-            SELECT ti.id, i.name as itemName, i.id as itemId, ti.quantity 
-            FROM transactionitems ti
-            INNER JOIN items i ON i.id = ti.itemId
-            WHERE ti.transactionId = %s
-        """
-        items = await Tortoise.get_connection("default").execute_query_dict(itemsQuery, (tr['id'],))
+        items = itemsByTransaction[tr['id']]
 
         transactionsDto.append({
             "id": tr["id"],
@@ -568,35 +543,41 @@ async def getAllTransactionsAsyncHQ(branchId=None, page=1, search=""):
     total_count_result = await Tortoise.get_connection("default").execute_query_dict(total_count_query, tuple(count_params))
     total_count = total_count_result[0]["total"] if total_count_result else 0
 
-    return create_response(True, "Successfully Retrieved", transactionsDto, None, total_count), 200
+    return create_response(True, "Successfully Retrieved", transactionsDto, None, total_count, pagination.nextCursor(dailyTransactions, hasMore, 'transactionDate', 'id'), hasMore), 200
 
 async def voidTransaction(transactionId):
-    transaction = await Transaction.get_or_none(id=transactionId)
-
-    if not transaction:
-        return create_response(False, 'Transaction not found!'), 404
+    async with in_transaction() as connection:
+        # Locking the row makes a second void of the same transaction wait, then see isVoided and stop,
+        # so the rollups and the stock are only given back once.
+        transaction = await Transaction.select_for_update().get_or_none(id=transactionId)
+
+        if not transaction:
+            return create_response(False, 'Transaction not found!'), 404
+        if transaction.isVoided:
+            return create_response(False, 'Transaction already voided'), 409
+
+        if transaction.isPaid:
+            await rollupService.removeTransaction(transaction)
+        transaction.isVoided = True
+        await transaction.save()
+
+        lines = await connection.execute_query_dict("""
+            SELECT bi.id AS branchItemId, ti.quantity
+            FROM transactionitems ti
+            INNER JOIN branchitem bi ON bi.itemId = ti.itemId AND bi.branchId = %s
+            WHERE ti.transactionId = %s
+        """, [transaction.branchId, transaction.id])
+        deltas = stockService.stockDeltas(lines, sign=1)
+        await stockService.lockStock(connection, list(deltas))
+        await stockService.applyStockDeltas(connection, deltas)
 
-    transactionItems = await TransactionItem.filter(transactionId=transactionId)
     customer = await Customer.get_or_none(id=transaction.customerId) if transaction.customerId else None
-
-    transaction.isVoided = True
-    await transaction.save()
-
-    updatedBranchItems = []
-    for tItem in transactionItems:
-        branchItem = await BranchItem.get_or_none(branchId=transaction.branchId, itemId=tItem.itemId)
-        if branchItem:
-            branchItem.quantity += tItem.quantity
-            await branchItem.save()
-            updatedBranchItems.append({
-                "itemId": tItem.itemId,
-                "quantity": branchItem.quantity
-            })
-
     if customer:
         customer.totalOrderAmount -= transaction.totalAmount
         await customer.save()
 
+    eventService.publish(eventService.TRANSACTION_VOIDED, transaction.branchId)
+
     return create_response(True, "Transaction voided successfully", None), 200
 
 async def getOldestTransaction(branchId):
@@ -1,9 +1,12 @@
 import jwt
 from config import SECRET_KEY  
 from utils import create_response, hash_password_md5
-from models import User, Branch, Department, Cart, Item, BranchItem
+from models import User, Branch, Department, Cart
 from tortoise import Tortoise
-from decimal import Decimal
+from tortoise.transactions import in_transaction
+import provisionService
+import cacheService
+import eventService
 
 async def login_user(email, encryptedPassword):
     if not email or not encryptedPassword:
@@ -165,6 +168,14 @@ async def getBranches():
     branches = await Branch.filter(isActive=True).order_by("name")
     return [{"id": b.id, "name": b.name} for b in branches]
 
+async def getActiveBranchList():
+    """Active branches ordered by id, cached until a branch is added, renamed or deactivated."""
+    return await cacheService.getOrLoad(cacheService.cacheKey('activeBranches'), loadActiveBranches, cacheService.BRANCH_TTL_SECONDS)
+
+async def loadActiveBranches():
+    branches = await Branch.filter(isActive=True).order_by("id")
+    return [{"id": b.id, "name": b.name} for b in branches]
+
 async def setInactiveUser(id):
     existing_user = await User.get(id=id)
     
@@ -182,21 +193,17 @@ async def setBranchInactive(branchId):
     if branch:
         branch.isActive = False
         await branch.save()
+        eventService.publish(eventService.BRANCH_CHANGED, branch.id)
         return create_response(True, "Branch deleted successfully.", None, None), 200
     return create_response(False, "An error occured unable to delete branch.", None, None), 200
 
 async def saveBranch(branchId, name):
     if branchId == 0:
-        branch = await Branch.create(name=name, isActive=True)
-        
-        active_items = await Item.filter(isManaged=1)
-
-        branch_items = [
-            BranchItem(itemId=item.id, branchId=branch.id, quantity=Decimal(0.00)) 
-            for item in active_items
-        ]
+        async with in_transaction() as connection:
+            branch = await Branch.create(name=name, isActive=True)
+            await provisionService.provisionBranch(connection, branch.id)
 
-        await BranchItem.bulk_create(branch_items)
+        eventService.publish(eventService.BRANCH_CHANGED, branch.id)
 
         return create_response(True, "Branch saved successfully.", None, None), 200    
     else:
@@ -204,6 +211,7 @@ async def saveBranch(branchId, name):
         if branch:
             branch.name = name
             await branch.save()
+            eventService.publish(eventService.BRANCH_CHANGED, branch.id)
             return create_response(True, "Branch updated successfully.", None, None), 200
         return create_response(False, "An error occurred, unable to update branch.", None, None), 200
 
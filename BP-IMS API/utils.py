@@ -3,6 +3,7 @@ from functools import wraps
 import jwt
 from config import SECRET_KEY, CLOUD_NAME, CLOUD_API_KEY, CLOUD_API_SECRET
 import hashlib
+from datetime import datetime, time, timedelta
 import re
 import cloudinary
 import cloudinary.uploader
@@ -13,13 +14,15 @@ cloudinary.config(
     api_secret = CLOUD_API_SECRET
 )
 
-def create_response(is_success, message, data=None, data2=0, total_count=0):
+def create_response(is_success, message, data=None, data2=0, total_count=0, next_cursor=None, has_more=None):
     return jsonify({
         'isSuccess': is_success,
         'message': message,
         'data': data or [],
         'data2': data2,
-        'totalCount': total_count
+        'totalCount': total_count,
+        'nextCursor': next_cursor,
+        'hasMore': has_more
     })
 
 def token_required(f):
@@ -51,6 +54,27 @@ def token_required(f):
     return decorator
 
 
+def day_range(day):
+    start = datetime.combine(day, time.min)
+    return start, start + timedelta(days=1)
+
+def days_range(from_day, to_day):
+    return datetime.combine(from_day, time.min), datetime.combine(to_day + timedelta(days=1), time.min)
+
+def work_week_range(day):
+    # Sunday to Friday of the week containing day, matching the analytics "Week" view.
+    start = datetime.combine(day - timedelta(days=day.weekday() + 1), time.min)
+    return start, start + timedelta(days=6)
+
+def month_range(year, month):
+    start = datetime(year, month, 1)
+    end = datetime(year + 1, 1, 1) if month == 12 else datetime(year, month + 1, 1)
+    return start, end
+
+def year_range(year):
+    return datetime(year, 1, 1), datetime(year + 1, 1, 1)
+
+
 def hash_password_md5(password: str) -> str:
     return hashlib.md5(password.encode('utf-8')).hexdigest()
 
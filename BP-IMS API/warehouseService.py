@@ -1,46 +1,47 @@
 from utils import create_response
 from tortoise import Tortoise
-from models import WHStockInput, WareHouseItem, Item, Supplier, SupplierReturn
+import eventService
+import pagination
+import cacheService
+import stockService
+from tortoise.transactions import in_transaction
+from models import WHStockInput, WareHouseItem, Supplier, SupplierReturn
 from decimal import Decimal
 from tortoise.queryset import Q 
 from datetime import datetime
 
-async def getWHStocks(categoryId, page=1, search=""):
+async def getWHStocks(categoryId, page=1, search="", cursor=None, countMode=pagination.COUNT_EXACT):
     pageSize = 30
     offset = (page - 1) * pageSize
+    seek = None
 
-    sqlQuery = """
-       SELECT wh.id, i.name, wh.quantity, i.unitOfMeasure, i.storeCriticalValue, i.sellByUnit, i.whCriticalValue, i.imagePath
-       FROM items i
+    select = "wh.id, i.name, wh.quantity, i.unitOfMeasure, i.storeCriticalValue, i.sellByUnit, i.whCriticalValue, i.imagePath"
+    fromWhere = """
+        FROM items i
         INNER JOIN warehouseitems wh ON wh.itemId = i.id
         WHERE i.isManaged = 1
     """
     params = []
 
     if int(categoryId) == 1:
-        sqlQuery += " AND wh.quantity < i.whCriticalValue"
-
-    if search:
-        sqlQuery += " AND i.name LIKE %s"
-        params.append(f'%{search}%')
+        fromWhere += " AND wh.quantity < i.whCriticalValue"
 
-    sqlQuery += " ORDER BY i.name"
-    sqlQuery += " LIMIT %s OFFSET %s"
-    params.extend([pageSize, offset])
+    countKey = cacheService.cacheKey('getWHStocks', int(categoryId), None, 'count', search)
 
     connection = Tortoise.get_connection('default')
-    result = await connection.execute_query(sqlQuery, tuple(params))
-
-    countQuery = """
-        SELECT COUNT(*) 
-        FROM items i
-        INNER JOIN warehouseitems wh ON wh.itemId = i.id
-        WHERE i.isManaged = 1
-    """
-    totalCountResult = await connection.execute_query(countQuery)
-    totalCount = totalCountResult[1][0]['COUNT(*)']
-
-    items = result[1]
+    try:
+        if search:
+            idsKey = cacheService.cacheKey('getWHStocks', int(categoryId), None, 'ids')
+            items, totalCount, hasMore, nextCursor = await pagination.fetchSearchPage(
+                connection, select, fromWhere, params, search, pageSize, offset, cursor, countMode, idsKey, rowIdColumn='wh.id')
+        else:
+            if cursor:
+                seek = pagination.afterName(cursor, 'i.name', 'wh.id')
+                offset = 0
+            items, totalCount, hasMore = await pagination.fetchPage(connection, select, fromWhere, params, "i.name, wh.id", pageSize, offset, seek, countMode, countKey)
+            nextCursor = pagination.nextCursor(items, hasMore, 'name')
+    except pagination.CursorError:
+        return create_response(False, 'Invalid cursor'), 400
 
     itemList = [
         {
@@ -56,7 +57,7 @@ async def getWHStocks(categoryId, page=1, search=""):
         for item in items
     ]
 
-    return create_response(True, 'Items Successfully Retrieved', itemList, None, totalCount), 200
+    return create_response(True, 'Items Successfully Retrieved', itemList, None, totalCount, nextCursor, hasMore), 200
 
 async def getStockHistory(itemId):
     sqlQuery = """
@@ -98,23 +99,43 @@ async def getStockHistory(itemId):
     return create_response(True, 'Items Successfully Retrieved', itemList, None, totalCount), 200
 
 async def createStockInput(stockInput):
-    whItem = await WareHouseItem.get_or_none(id=stockInput['id'])
-    item = await Item.get_or_none(id = whItem.itemId)
+    return await createStockInputs([stockInput])
 
-    if not whItem:
-        return create_response(False, 'Item not found', None, None), 400
-    delivered_by = None if stockInput['deliveredBy'] == 0 else stockInput['deliveredBy']
-    await WHStockInput.create(
-        qty=stockInput['qty'],
-        deliveryDate=stockInput['deliveryDate'],
-        deliveredBy=delivered_by,
-        expectedQty=stockInput['expectedTotalQty'],
-        actualQty=stockInput['actualTotalQty'],
-        itemId=whItem.itemId
-    )
-    whItem.quantity += Decimal(str(stockInput['qty']))
+async def createStockInputs(stockInputs):
+    """Receives a warehouse delivery manifest in one transaction, all lines or none."""
+    if not stockInputs:
+        return create_response(False, 'No stock inputs', None, None), 400
 
-    await whItem.save()
+    lines = [{**stockInput, "id": int(stockInput['id']), "qty": Decimal(str(stockInput['qty']))} for stockInput in stockInputs]
+    whItemIds = sorted({line['id'] for line in lines})
+    placeholders = ", ".join(["%s"] * len(whItemIds))
+
+    async with in_transaction() as connection:
+        rows = await connection.execute_query_dict(f"SELECT id, itemId FROM warehouseitems WHERE id IN ({placeholders})", whItemIds)
+        itemIds = {row['id']: row['itemId'] for row in rows}
+
+        missing = [whItemId for whItemId in whItemIds if whItemId not in itemIds]
+        if missing:
+            return create_response(False, 'Item not found', missing, None), 400
+
+        deltas = stockService.stockDeltas(lines, 1, 'id', 'qty')
+        await stockService.lockStock(connection, list(deltas), "warehouseitems")
+
+        await WHStockInput.bulk_create([
+            WHStockInput(
+                qty=line['qty'],
+                deliveryDate=line['deliveryDate'],
+                deliveredBy=None if line['deliveredBy'] == 0 else line['deliveredBy'],
+                expectedQty=line['expectedTotalQty'],
+                actualQty=line['actualTotalQty'],
+                itemId=itemIds[line['id']]
+            )
+            for line in lines
+        ])
+
+        await stockService.applyStockDeltas(connection, deltas, table="warehouseitems")
+
+    eventService.publish(eventService.STOCK_CHANGED)
 
     return create_response(True, "Success", None, None), 200
 
@@ -238,25 +259,37 @@ async def editWHStock(id, qty):
 
     whItem.quantity = Decimal(str(qty))
     await whItem.save()
+
+    eventService.publish(eventService.STOCK_CHANGED)
     
     return create_response(True, "Success", None, None), 200
 
 async def returnToSupplier(returnStock):
-    whItem = await WareHouseItem.get_or_none(id=returnStock['whItemId'])
+    return await returnStocksToSupplier([returnStock])
 
-    if not whItem:
-        return create_response(False, 'Item not found', None, None), 200
+async def returnStocksToSupplier(returnStocks):
+    """Returns a list of warehouse items to their suppliers in one transaction, all lines or none."""
+    if not returnStocks:
+        return create_response(False, 'No returns', None, None), 400
 
-    await SupplierReturn.create(
-        supplierId=returnStock['supplierId'],
-        whItemId=returnStock['whItemId'],
-        reason=returnStock['reason'],
-        quantity=Decimal(str(returnStock['quantity'])),
-        date=datetime.now()
-    )
+    lines = [{**returnStock, "whItemId": int(returnStock['whItemId']), "quantity": Decimal(str(returnStock['quantity']))} for returnStock in returnStocks]
+    whItemIds = sorted({line['whItemId'] for line in lines})
 
-    whItem.quantity -= Decimal(str(returnStock['quantity']))
-    await whItem.save()
+    async with in_transaction() as connection:
+        stock = await stockService.lockStock(connection, whItemIds, "warehouseitems")
+
+        missing = [whItemId for whItemId in whItemIds if whItemId not in stock]
+        if missing:
+            return create_response(False, 'Item not found', missing, None), 200
+
+        now = datetime.now()
+        await SupplierReturn.bulk_create([
+            SupplierReturn(supplierId=line['supplierId'], whItemId=line['whItemId'], reason=line['reason'], quantity=line['quantity'], date=now)
+            for line in lines
+        ])
+        await stockService.applyStockDeltas(connection, stockService.stockDeltas(lines, -1, 'whItemId'), table="warehouseitems")
+
+    eventService.publish(eventService.STOCK_CHANGED)
 
     return create_response(True, "Success", None, None), 200
 